@@ -1,4 +1,17 @@
 #include "chunk_handle.hpp"
+#include "history.hpp"
+
+// Spread the bits of a 32 bit integer into the even bits of a 64 bit integer.
+static std::uint64_t spread_bits(std::uint64_t value)
+{
+    value &= 0xFFFFFFFF;
+    value = (value | (value << 16)) & 0x0000FFFF0000FFFF;
+    value = (value | (value << 8)) & 0x00FF00FF00FF00FF;
+    value = (value | (value << 4)) & 0x0F0F0F0F0F0F0F0F;
+    value = (value | (value << 2)) & 0x3333333333333333;
+    value = (value | (value << 1)) & 0x5555555555555555;
+    return value;
+}
 
 namespace Amulet {
 
@@ -23,9 +36,15 @@ namespace detail {
 
     ChunkKey::operator std::string() const
     {
-        std::string str(2 * sizeof(std::int64_t) + 1, '/');
-        *reinterpret_cast<std::int64_t*>(str.data()) = cx;
-        *reinterpret_cast<std::int64_t*>(str.data() + sizeof(std::int64_t) + 1) = cz;
+        // Flip the sign bit so that negative coordinates sort before positive coordinates.
+        auto x = static_cast<std::uint64_t>(cx) ^ 0x8000000000000000;
+        auto z = static_cast<std::uint64_t>(cz) ^ 0x8000000000000000;
+        // Interleave the bits of x and z (Morton order) so that nearby chunks have nearby keys.
+        // The 128 bit result is stored in big endian byte order.
+        std::string str;
+        str.reserve(2 * sizeof(std::uint64_t));
+        append_big_endian<std::uint64_t>(str, spread_bits(x >> 32) | (spread_bits(z >> 32) << 1));
+        append_big_endian<std::uint64_t>(str, spread_bits(x) | (spread_bits(z) << 1));
         return str;
     }
 } // namespace detail
@@ -1,6 +1,7 @@
 #pragma once
 
 #include <cstdint>
+#include <functional>
 #include <memory>
 #include <string>
 
@@ -34,6 +35,20 @@ namespace detail {
 
 } // namespace detail
 
+} // namespace Amulet
+
+template <>
+struct std::hash<Amulet::detail::ChunkKey> {
+    size_t operator()(const Amulet::detail::ChunkKey& key) const noexcept
+    {
+        return static_cast<size_t>(
+            static_cast<std::uint64_t>(key.get_cx()) * 0x9E3779B97F4A7C15
+            + static_cast<std::uint64_t>(key.get_cz()));
+    }
+};
+
+namespace Amulet {
+
 class ChunkHandle {
 private:
     OrderedMutex _public_mutex;
@@ -0,0 +1,193 @@
+#pragma once
+
+#include <pybind11/pybind11.h>
+
+#include <atomic>
+#include <exception>
+#include <memory>
+#include <mutex>
+#include <optional>
+#include <type_traits>
+#include <utility>
+#include <vector>
+
+#include <amulet/utils/python.hpp>
+#include <amulet/utils/task_manager/cancel_manager.hpp>
+
+#include "worker_pool.hpp"
+
+namespace py = pybind11;
+
+namespace Amulet {
+
+namespace detail {
+    // The state shared by the jobs that resolve one asyncio future.
+    template <typename ResultT>
+    class AsyncJob {
+    public:
+        std::shared_ptr<bool> py_valid;
+        py::object loop;
+        py::object future;
+
+        // Cancelled when the future is cancelled.
+        CancelManager cancel_manager;
+
+        // The result of each job.
+        std::vector<std::optional<ResultT>> results;
+        // The number of jobs that have not finished.
+        std::atomic<size_t> remaining;
+        // Mutex to lock error.
+        std::mutex error_mutex;
+        std::exception_ptr error;
+
+        AsyncJob(size_t count)
+            : py_valid(get_py_valid())
+            , results(count)
+            , remaining(count)
+        {
+        }
+
+        ~AsyncJob()
+        {
+            // The python references must be released with the GIL held.
+            if (*py_valid) {
+                py::gil_scoped_acquire gil;
+                loop = py::object();
+                future = py::object();
+            } else {
+                // The interpreter has shut down. Leak the references.
+                loop.release();
+                future.release();
+            }
+        }
+    };
+
+    // Resolve the future from the loop thread.
+    // It may have been cancelled in the mean time.
+    // The GIL must be held.
+    inline void resolve_future(const py::object& loop, const py::object& future, const char* method, py::object value)
+    {
+        try {
+            loop.attr("call_soon_threadsafe")(
+                py::cpp_function([method](py::object future, py::object value) {
+                    if (!future.attr("done")().cast<bool>()) {
+                        future.attr(method)(value);
+                    }
+                }),
+                future,
+                value);
+        } catch (const py::error_already_set&) {
+            // The loop has been closed. Nothing is waiting for the result.
+        }
+    }
+
+    // Convert a C++ exception to the Python exception pybind11 would raise.
+    // The GIL must be held.
+    inline py::object to_python_exception(std::exception_ptr error)
+    {
+        try {
+            py::cpp_function([error] { std::rethrow_exception(error); })();
+        } catch (py::error_already_set& e) {
+            return e.value();
+        }
+        return py::none();
+    }
+} // namespace detail
+
+// Run count jobs on the worker pool and return an asyncio future resolved with their results.
+// func(index, cancel_manager) is called for each index without the GIL and must return a value.
+// It may be called from several threads at once.
+// The cancel manager is cancelled when the future is cancelled. Jobs that have not started are then skipped.
+// to_python converts the vector of results to a Python object with the GIL held.
+// If a job throws the future is resolved with the exception.
+// The GIL must be held and an asyncio event loop must be running in this thread.
+template <typename FuncT, typename ConvertT>
+py::object run_async_many(size_t count, FuncT func, ConvertT to_python)
+{
+    using ResultT = std::invoke_result_t<FuncT&, size_t, AbstractCancelManager&>;
+    auto job = std::make_shared<detail::AsyncJob<ResultT>>(count);
+    job->loop = py::module::import("asyncio").attr("get_running_loop")();
+    job->future = job->loop.attr("create_future")();
+    auto future = job->future;
+
+    // Cancel the jobs when the future is cancelled.
+    std::weak_ptr<detail::AsyncJob<ResultT>> weak_job = job;
+    future.attr("add_done_callback")(py::cpp_function([weak_job](py::object future) {
+        if (future.attr("cancelled")().cast<bool>()) {
+            if (auto job = weak_job.lock()) {
+                py::gil_scoped_release nogil;
+                job->cancel_manager.cancel();
+            }
+        }
+    }));
+
+    if (count == 0) {
+        future.attr("set_result")(to_python(std::vector<ResultT>()));
+        return future;
+    }
+
+    auto shared_func = std::make_shared<FuncT>(std::move(func));
+    auto shared_to_python = std::make_shared<ConvertT>(std::move(to_python));
+    for (size_t index = 0; index < count; index++) {
+        get_worker_pool().submit([job, index, shared_func, shared_to_python] {
+            if (!job->cancel_manager.is_cancel_requested()) {
+                try {
+                    job->results[index].emplace((*shared_func)(index, job->cancel_manager));
+                } catch (...) {
+                    std::lock_guard lock(job->error_mutex);
+                    if (!job->error) {
+                        job->error = std::current_exception();
+                    }
+                    // Skip the remaining jobs.
+                    job->cancel_manager.cancel();
+                }
+            }
+            if (--job->remaining != 0 || !*job->py_valid) {
+                return;
+            }
+            // This is the last job.
+            // The future must only be inspected on the loop thread.
+            // resolve_future checks if it is done in the callback posted to the loop.
+            py::gil_scoped_acquire gil;
+            try {
+                if (job->error) {
+                    detail::resolve_future(job->loop, job->future, "set_exception", detail::to_python_exception(job->error));
+                    return;
+                }
+                if (job->cancel_manager.is_cancel_requested()) {
+                    // The future was cancelled. Some results may be missing.
+                    return;
+                }
+                std::vector<ResultT> results;
+                results.reserve(job->results.size());
+                for (auto& result : job->results) {
+                    results.push_back(std::move(*result));
+                }
+                detail::resolve_future(job->loop, job->future, "set_result", (*shared_to_python)(std::move(results)));
+            } catch (...) {
+                detail::resolve_future(job->loop, job->future, "set_exception", detail::to_python_exception(std::current_exception()));
+            }
+        });
+    }
+    return future;
+}
+
+// Run a job on the worker pool and return an asyncio future resolved with its result.
+// func(cancel_manager) is called without the GIL and must return a value.
+// to_python converts the result to a Python object with the GIL held.
+// The GIL must be held and an asyncio event loop must be running in this thread.
+template <typename FuncT, typename ConvertT>
+py::object run_async(FuncT func, ConvertT to_python)
+{
+    using ResultT = std::invoke_result_t<FuncT&, AbstractCancelManager&>;
+    return run_async_many(
+        1,
+        [func = std::move(func)](size_t, AbstractCancelManager& cancel_manager) mutable {
+            return func(cancel_manager);
+        },
+        [to_python = std::move(to_python)](std::vector<ResultT> results) mutable {
+            return to_python(std::move(results[0]));
+        });
+}
+
+} // namespace Amulet
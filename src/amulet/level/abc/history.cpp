@@ -1,98 +1,837 @@
-#include <leveldb/cache.h>
-#include <leveldb/db.h>
-#include <leveldb/decompress_allocator.h>
-#include <leveldb/env.h>
-#include <leveldb/filter_policy.h>
-#include <leveldb/options.h>
-#include <leveldb/write_batch.h>
+#include <algorithm>
+#include <cstdint>
+#include <functional>
+#include <string_view>
+#include <utility>
 
 #include <amulet/utils/weak.hpp>
 
 #include "history.hpp"
 
-class NullLogger : public leveldb::Logger {
-public:
-    void Logv(const char*, va_list) override { }
-};
+// The default number of bytes of values kept in the value cache.
+static const size_t DefaultCacheSize = 64 * 1024 * 1024;
 
-class LevelDBOptions : public Amulet::LevelDBOptions {
-public:
-    NullLogger logger;
-    leveldb::DecompressAllocator decompress_allocator;
-};
+// The maximum number of keys deleted in one write batch.
+static const size_t ReclaimBatchSize = 1024;
 
-static std::unique_ptr<Amulet::LevelDB> create_leveldb(const std::string& path_str)
+// The maximum number of bytes the writer thread writes in one batch.
+static const size_t WriteBatchSize = 4 * 1024 * 1024;
+
+// The last byte of each record identifies how the value is stored.
+static const char FullRecord = 'f';
+static const char DeltaRecord = 'd';
+static const char SharedRecord = 's';
+
+// Full values at least this large may be stored in the shared value store.
+// Smaller values are cheaper to store inline than to look up.
+static const size_t MinSharedValueSize = 1024;
+
+// The key prefix of values in the shared value store.
+// Resource keys always have '/' as the third byte so these cannot clash.
+static const std::string SharedValuePrefix("\xFF\xFF#", 3);
+
+// The key storing the key layout version of the database.
+static const std::string VersionKey("\xFF\xFFv", 3);
+
+// Equal runs shorter than this are included in the surrounding literal.
+static const size_t MinDeltaCopy = 8;
+
+static void write_varint(std::string& out, size_t value)
+{
+    while (0x80 <= value) {
+        out.push_back(static_cast<char>((value & 0x7F) | 0x80));
+        value >>= 7;
+    }
+    out.push_back(static_cast<char>(value));
+}
+
+static size_t read_varint(std::string_view& data)
 {
-    // Expand dots and symbolic links
-    auto path = std::filesystem::absolute(path_str);
-    // If there is not a directory at the path
-    if (!std::filesystem::is_directory(path)) {
-        throw std::runtime_error("leveldb directory does not exist.");
+    size_t value = 0;
+    for (size_t shift = 0; shift < 64; shift += 7) {
+        if (data.empty()) {
+            throw std::runtime_error("Truncated history delta.");
+        }
+        auto byte = static_cast<std::uint8_t>(data.front());
+        data.remove_prefix(1);
+        value |= static_cast<size_t>(byte & 0x7F) << shift;
+        if (!(byte & 0x80)) {
+            return value;
+        }
     }
+    throw std::runtime_error("Invalid varint in history delta.");
+}
 
-    // Make a db directory in the directory
-    path /= "db";
-    std::filesystem::create_directory(path);
+static void write_delta_op(std::string& delta, size_t copy, std::string_view literal)
+{
+    write_varint(delta, copy);
+    write_varint(delta, literal.size());
+    delta.append(literal);
+}
 
-    auto options = std::make_unique<LevelDBOptions>();
-    options->options.create_if_missing = true;
-    options->options.filter_policy = leveldb::NewBloomFilterPolicy(10);
-    options->options.block_cache = leveldb::NewLRUCache(40 * 1024 * 1024);
-    options->options.write_buffer_size = 4 * 1024 * 1024;
-    options->options.info_log = &options->logger;
-    options->options.compression = leveldb::CompressionType::kZlibRawCompression;
-    options->options.block_size = 163840;
+// Encode target as a delta from source.
+// The delta stores the length of the common prefix and suffix followed by a list of operations for the middle.
+// Each operation copies bytes from the source and then appends a literal.
+// If the middles are the same length, the literals overwrite the source so only the changed runs are stored.
+static std::string encode_delta(std::string_view source, std::string_view target)
+{
+    size_t max_common = std::min(source.size(), target.size());
+    size_t prefix = 0;
+    while (prefix < max_common && source[prefix] == target[prefix]) {
+        prefix++;
+    }
+    size_t suffix = 0;
+    while (suffix < max_common - prefix && source[source.size() - suffix - 1] == target[target.size() - suffix - 1]) {
+        suffix++;
+    }
+    auto source_middle = source.substr(prefix, source.size() - prefix - suffix);
+    auto target_middle = target.substr(prefix, target.size() - prefix - suffix);
 
-    options->read_options.decompress_allocator = &options->decompress_allocator;
+    std::string delta;
+    write_varint(delta, prefix);
+    write_varint(delta, suffix);
+    if (source_middle.size() == target_middle.size()) {
+        size_t copy_start = 0;
+        size_t index = 0;
+        while (index < target_middle.size()) {
+            if (source_middle[index] == target_middle[index]) {
+                index++;
+                continue;
+            }
+            // Find the end of the changed run.
+            size_t literal_stop = index;
+            size_t equal_run = 0;
+            while (literal_stop < target_middle.size() && equal_run < MinDeltaCopy) {
+                if (source_middle[literal_stop] == target_middle[literal_stop]) {
+                    equal_run++;
+                } else {
+                    equal_run = 0;
+                }
+                literal_stop++;
+            }
+            literal_stop -= equal_run;
+            write_delta_op(delta, index - copy_start, target_middle.substr(index, literal_stop - index));
+            copy_start = index = literal_stop;
+        }
+    } else {
+        write_delta_op(delta, 0, target_middle);
+    }
+    return delta;
+}
 
-    leveldb::DB* _db = NULL;
-    auto status = leveldb::DB::Open(options->options, path.string(), &_db);
-    if (status.ok()) {
-        return std::make_unique<Amulet::LevelDB>(
-            std::unique_ptr<leveldb::DB>(_db),
-            std::move(options));
+// Rebuild the target from the source and a delta created by encode_delta.
+static std::string apply_delta(std::string_view source, std::string_view delta)
+{
+    size_t prefix = read_varint(delta);
+    size_t suffix = read_varint(delta);
+    if (source.size() < prefix + suffix) {
+        throw std::runtime_error("History delta does not match the source.");
+    }
+    auto source_middle = source.substr(prefix, source.size() - prefix - suffix);
+    std::string target;
+    target.reserve(source.size());
+    target.append(source.substr(0, prefix));
+    size_t source_index = 0;
+    while (!delta.empty()) {
+        size_t copy = read_varint(delta);
+        size_t literal = read_varint(delta);
+        if (source_middle.size() < source_index + copy || delta.size() < literal) {
+            throw std::runtime_error("History delta does not match the source.");
+        }
+        target.append(source_middle.substr(source_index, copy));
+        target.append(delta.substr(0, literal));
+        delta.remove_prefix(literal);
+        source_index += copy + literal;
     }
-    throw std::runtime_error("Could not create temporary leveldb database at \"" + path_str + "\" " + status.ToString());
+    target.append(source.substr(source.size() - suffix));
+    return target;
 }
 
 namespace Amulet {
 
-// HistoryManagerPrivate
-
 namespace detail {
 
-    HistoryManagerPrivate::HistoryManagerPrivate()
-        : db_path("level_data")
-        , db(create_leveldb(db_path.get_path().string()))
+    // HistoryValueCache
+
+    void HistoryValueCache::Shard::erase(const std::string& key)
+    {
+        auto it = index.find(key);
+        if (it != index.end()) {
+            size -= it->second->second.size();
+            values.erase(it->second);
+            index.erase(it);
+        }
+    }
+
+    void HistoryValueCache::Shard::evict(size_t max_size)
+    {
+        while (max_size < size) {
+            auto& [key, value] = values.back();
+            size -= value.size();
+            index.erase(key);
+            values.pop_back();
+        }
+    }
+
+    HistoryValueCache::HistoryValueCache(size_t max_size)
+        : _max_size(max_size)
+    {
+    }
+
+    std::optional<std::string> HistoryValueCache::get(const std::string& key)
+    {
+        auto& shard = _shards[get_shard_index(key)];
+        std::lock_guard lock(shard.mutex);
+        auto it = shard.index.find(key);
+        if (it == shard.index.end()) {
+            _misses++;
+            return std::nullopt;
+        }
+        _hits++;
+        // Move the value to the front.
+        shard.values.splice(shard.values.begin(), shard.values, it->second);
+        return it->second->second;
+    }
+
+    void HistoryValueCache::set(const std::string& key, const std::string& value)
+    {
+        auto& shard = _shards[get_shard_index(key)];
+        auto max_size = _max_size / HistoryShardCount;
+        std::lock_guard lock(shard.mutex);
+        shard.erase(key);
+        if (max_size < value.size()) {
+            return;
+        }
+        shard.values.emplace_front(key, value);
+        shard.index.emplace(key, shard.values.begin());
+        shard.size += value.size();
+        shard.evict(max_size);
+    }
+
+    void HistoryValueCache::erase(const std::string& key)
+    {
+        auto& shard = _shards[get_shard_index(key)];
+        std::lock_guard lock(shard.mutex);
+        shard.erase(key);
+    }
+
+    void HistoryValueCache::clear()
+    {
+        for (auto& shard : _shards) {
+            std::lock_guard lock(shard.mutex);
+            shard.values.clear();
+            shard.index.clear();
+            shard.size = 0;
+        }
+    }
+
+    size_t HistoryValueCache::get_max_size()
+    {
+        return _max_size;
+    }
+
+    void HistoryValueCache::set_max_size(size_t max_size)
+    {
+        _max_size = max_size;
+        for (auto& shard : _shards) {
+            std::lock_guard lock(shard.mutex);
+            shard.evict(max_size / HistoryShardCount);
+        }
+    }
+
+    size_t HistoryValueCache::get_hits()
+    {
+        return _hits;
+    }
+
+    size_t HistoryValueCache::get_misses()
+    {
+        return _misses;
+    }
+
+    // HistoryManagerPrivate
+
+    HistoryManagerPrivate::HistoryManagerPrivate(const HistoryStorageOptions& options)
+        : storage_options(options)
+        , cache(DefaultCacheSize)
     {
         // Add an initial bin.
         history_bins.emplace_back();
+        // The storage is not created until it is needed.
+        // Many levels are opened to read a few chunks and never written to.
+    }
+
+    HistoryManagerPrivate::~HistoryManagerPrivate()
+    {
+        if (reclaim_thread.joinable()) {
+            {
+                std::lock_guard lock(reclaim_mutex);
+                reclaim_stop = true;
+            }
+            reclaim_condition.notify_all();
+            reclaim_thread.join();
+        }
+        if (writer_thread.joinable()) {
+            // The database is temporary so the pending writes are not needed.
+            {
+                std::lock_guard lock(pending_mutex);
+                writer_stop = true;
+            }
+            pending_condition.notify_all();
+            writer_thread.join();
+        }
+    }
+
+    HistoryStorage& HistoryManagerPrivate::get_storage()
+    {
+        std::call_once(storage_flag, [this] {
+            auto new_storage = create_history_storage(storage_options);
+            // Check the key layout version.
+            std::string version;
+            detail::append_big_endian(version, HistoryKeyVersion);
+            auto stored_version = new_storage->get(VersionKey);
+            if (!stored_version) {
+                new_storage->write({ { VersionKey, version } });
+            } else if (*stored_version != version) {
+                throw std::runtime_error("The history database uses an unsupported key layout.");
+            }
+            storage = std::move(new_storage);
+            // Start the reclaim thread.
+            reclaim_thread = std::thread(&HistoryManagerPrivate::reclaim_loop, this);
+            // Start the writer thread.
+            writer_thread = std::thread(&HistoryManagerPrivate::writer_loop, this);
+            storage_created = true;
+        });
+        return *storage;
+    }
+
+    HistoryBin& HistoryManagerPrivate::get_bin(size_t index)
+    {
+        return history_bins.at(index - history_start);
     }
 
     void HistoryManagerPrivate::invalidate_future()
     {
-        // If there are future bins to invalidate.
-        if (has_redo()) {
+        // Only one writer may destroy the future bins.
+        // Bins cannot be added while the shared lock is held so other writers wait here until this is finished.
+        std::lock_guard invalidate_lock(invalidate_mutex);
+        {
+            std::lock_guard bin_lock(bin_mutex);
+            // If there are future bins to invalidate.
+            if (!has_redo()) {
+                return;
+            }
             // Destroy future bins
-            history_bins.resize(history_index + 1);
-            // Call invalidate_future for each layer
+            size_t bin_count = history_index - history_start + 1;
+            for (size_t i = bin_count; i < history_bins.size(); i++) {
+                history_size -= history_bins[i].size;
+            }
+            history_bins.resize(bin_count);
+        }
+        // Call invalidate_future for each layer
+        for_each(
+            layers,
+            [](AbstractHistoryManagerLayer& layer) { layer.invalidate_future(); });
+    }
+
+    void HistoryManagerPrivate::add_to_bin(LayerId layer_id, const std::vector<size_t>& handles, size_t size)
+    {
+        if (history_index == history_start) {
+            // Changes to the base bin cannot be undone.
+            return;
+        }
+        std::lock_guard bin_lock(bin_mutex);
+        auto& bin = get_bin(history_index);
+        auto& bin_resources = bin.resources[layer_id];
+        bin_resources.insert(handles.begin(), handles.end());
+        bin.size += size;
+        history_size += size;
+    }
+
+    bool HistoryManagerPrivate::has_redo()
+    {
+        return history_index + 1 < history_start + history_bins.size();
+    }
+
+    void HistoryManagerPrivate::trim()
+    {
+        auto exceeds_limit = [this] {
+            auto undo_count = history_index - history_start;
+            return max_undo_count < undo_count || (1 < undo_count && max_undo_size < history_size);
+        };
+        while (exceeds_limit()) {
+            // The oldest undo bin becomes the new base state.
+            auto& bin = history_bins.at(1);
             for_each(
                 layers,
-                [](AbstractHistoryManagerLayer& layer) { layer.invalidate_future(); });
+                [&bin](AbstractHistoryManagerLayer& layer) { layer.trim_bin(bin); });
+            bin.resources.clear();
+            history_size -= bin.size;
+            history_bins.pop_front();
+            history_start++;
         }
     }
 
-    bool HistoryManagerPrivate::has_redo()
+    void HistoryManagerPrivate::rebase(const std::string& prefix, HistoryResource& resource)
+    {
+        auto base_index = resource.base_index + 1;
+        // The new base revision may not depend on the old one.
+        auto key = get_revision_key(prefix, base_index);
+        auto record = get_record(key);
+        if (!record.empty() && record.back() == DeltaRecord) {
+            size_t stored_size;
+            record = encode_revision(prefix, resource, base_index, read_revision(prefix, resource, base_index), 1, stored_size);
+            write({ { key, std::move(record) } });
+        }
+        // The revision before this bin can no longer be reached.
+        discard(get_revision_key(prefix, resource.base_index));
+        resource.base_index = base_index;
+    }
+
+    void HistoryManagerPrivate::discard(std::string key)
+    {
+        set_shared_record(key, "");
+        cache.erase(key);
+        {
+            std::lock_guard lock(reclaim_mutex);
+            reclaim_keys.emplace(std::move(key));
+        }
+        reclaim_condition.notify_one();
+    }
+
+    void HistoryManagerPrivate::retain(const std::string& key)
+    {
+        std::unique_lock lock(reclaim_mutex);
+        reclaim_keys.erase(key);
+        // The delete must not be written after the caller writes the key.
+        reclaimed_condition.wait(lock, [this, &key] { return !reclaiming_keys.contains(key); });
+    }
+
+    size_t HistoryManagerPrivate::reclaim(size_t count)
+    {
+        std::vector<std::string> keys;
+        {
+            // The keys are moved to reclaiming_keys so that the lock can be released while they are deleted.
+            // Only a writer retaining one of these keys waits for the delete.
+            std::lock_guard lock(reclaim_mutex);
+            while (keys.size() < count && !reclaim_keys.empty()) {
+                auto node = reclaim_keys.extract(reclaim_keys.begin());
+                keys.push_back(node.value());
+                reclaiming_keys.insert(std::move(node));
+            }
+        }
+        if (keys.empty()) {
+            return 0;
+        }
+        auto release_keys = [this, &keys] {
+            {
+                std::lock_guard lock(reclaim_mutex);
+                for (const auto& key : keys) {
+                    reclaiming_keys.erase(key);
+                }
+            }
+            reclaimed_condition.notify_all();
+        };
+        size_t key_count = keys.size();
+        try {
+            std::unique_lock pending_lock(pending_mutex);
+            if (max_pending_size || !pending_writes.empty()) {
+                // The deletes must be ordered with the pending writes.
+                for (const auto& key : keys) {
+                    queue_write(key, std::nullopt);
+                }
+                pending_condition.notify_one();
+            } else {
+                pending_lock.unlock();
+                HistoryStorageBatch batch;
+                batch.reserve(keys.size());
+                for (const auto& key : keys) {
+                    batch.emplace_back(key, std::nullopt);
+                }
+                get_storage().write(std::move(batch));
+            }
+        } catch (...) {
+            release_keys();
+            throw;
+        }
+        release_keys();
+        return key_count;
+    }
+
+    void HistoryManagerPrivate::queue_write(std::string key, std::optional<std::string> record)
     {
-        return history_index + 1 < history_bins.size();
+        if (!writer_error.empty()) {
+            throw std::runtime_error(writer_error);
+        }
+        size_t size = key.size() + (record ? record->size() : 0);
+        auto [it, inserted] = pending_writes.try_emplace(std::move(key));
+        if (!inserted) {
+            pending_size -= it->first.size() + (it->second.record ? it->second.record->size() : 0);
+        }
+        it->second.record = std::move(record);
+        it->second.sequence = ++pending_sequence;
+        pending_size += size;
+    }
+
+    void HistoryManagerPrivate::write(std::vector<std::pair<std::string, std::string>> records)
+    {
+        // Create the storage and start the writer thread if this is the first write.
+        auto& history_storage = get_storage();
+        {
+            std::unique_lock lock(pending_mutex);
+            if (max_pending_size || !pending_writes.empty()) {
+                // Wait for the writer thread to catch up.
+                written_condition.wait(lock, [this] {
+                    return pending_size < max_pending_size || pending_writes.empty() || !writer_error.empty();
+                });
+                for (auto& [key, record] : records) {
+                    queue_write(std::move(key), std::move(record));
+                }
+                pending_condition.notify_one();
+                return;
+            }
+        }
+        HistoryStorageBatch batch;
+        batch.reserve(records.size());
+        for (auto& [key, record] : records) {
+            batch.emplace_back(std::move(key), std::move(record));
+        }
+        history_storage.write(std::move(batch));
+    }
+
+    std::string HistoryManagerPrivate::get_record(const std::string& key)
+    {
+        {
+            std::lock_guard lock(pending_mutex);
+            auto it = pending_writes.find(key);
+            if (it != pending_writes.end()) {
+                if (!it->second.record) {
+                    throw std::runtime_error("History record does not exist.");
+                }
+                return *it->second.record;
+            }
+        }
+        // The writer thread removes a pending write after it has been written
+        // so if it is not pending it is in the database.
+        auto record = get_storage().get(key);
+        if (!record) {
+            throw std::runtime_error("History record does not exist.");
+        }
+        return std::move(*record);
+    }
+
+    void HistoryManagerPrivate::flush()
+    {
+        std::unique_lock lock(pending_mutex);
+        written_condition.wait(lock, [this] { return pending_writes.empty() || !writer_error.empty(); });
+        if (!writer_error.empty()) {
+            throw std::runtime_error(writer_error);
+        }
+    }
+
+    std::string HistoryManagerPrivate::read_revision(
+        const std::string& prefix,
+        const HistoryResource& resource,
+        size_t revision)
+    {
+        auto key = get_revision_key(prefix, revision);
+        if (auto cached_value = cache.get(key)) {
+            return std::move(*cached_value);
+        }
+        auto value = decode_record(prefix, resource, revision, get_record(key));
+        cache.set(key, value);
+        return value;
+    }
+
+    std::vector<std::string> HistoryManagerPrivate::read_revisions(
+        const std::vector<std::tuple<std::string, const HistoryResource*, size_t>>& revisions)
+    {
+        std::vector<std::string> values(revisions.size());
+
+        // Find the values that are not cached.
+        std::vector<std::pair<std::string, size_t>> missing;
+        for (size_t i = 0; i < revisions.size(); i++) {
+            const auto& [prefix, resource, revision] = revisions[i];
+            auto key = get_revision_key(prefix, revision);
+            if (auto cached_value = cache.get(key)) {
+                values[i] = std::move(*cached_value);
+            } else {
+                missing.emplace_back(std::move(key), i);
+            }
+        }
+        if (missing.empty()) {
+            return values;
+        }
+
+        // Find the records that have not been written to the database yet.
+        // This must be done before the database is read because the writer thread
+        // removes the pending write after it has been written.
+        std::vector<std::pair<size_t, std::string>> pending;
+        {
+            std::lock_guard lock(pending_mutex);
+            if (!pending_writes.empty()) {
+                std::erase_if(missing, [&](const std::pair<std::string, size_t>& item) {
+                    auto it = pending_writes.find(item.first);
+                    if (it == pending_writes.end() || !it->second.record) {
+                        return false;
+                    }
+                    pending.emplace_back(item.second, *it->second.record);
+                    return true;
+                });
+            }
+        }
+        for (auto& [i, record] : pending) {
+            const auto& [prefix, resource, revision] = revisions[i];
+            values[i] = decode_record(prefix, *resource, revision, std::move(record));
+            cache.set(get_revision_key(prefix, revision), values[i]);
+        }
+        if (missing.empty()) {
+            return values;
+        }
+        std::sort(missing.begin(), missing.end());
+
+        // Read the records in key order.
+        std::vector<std::string> keys;
+        keys.reserve(missing.size());
+        for (const auto& [key, i] : missing) {
+            keys.push_back(key);
+        }
+        auto records = get_storage().get_many(keys);
+        for (size_t j = 0; j < missing.size(); j++) {
+            const auto& [key, i] = missing[j];
+            const auto& [prefix, resource, revision] = revisions[i];
+            values[i] = decode_record(prefix, *resource, revision, std::move(records[j]));
+            cache.set(key, values[i]);
+        }
+        return values;
+    }
+
+    std::string HistoryManagerPrivate::decode_record(
+        const std::string& prefix,
+        const HistoryResource& resource,
+        size_t revision,
+        std::string record)
+    {
+        // Walk back to the most recent full record or cached value.
+        std::vector<std::string> deltas;
+        std::string value = std::move(record);
+        while (true) {
+            if (value.empty()) {
+                throw std::runtime_error("History record is empty.");
+            }
+            auto record_type = value.back();
+            value.pop_back();
+            if (record_type == FullRecord) {
+                break;
+            } else if (record_type == SharedRecord) {
+                value = get_record(value);
+                break;
+            } else if (record_type == DeltaRecord && resource.base_index < revision) {
+                deltas.push_back(std::move(value));
+                revision--;
+                auto record_key = get_revision_key(prefix, revision);
+                if (auto cached_value = cache.get(record_key)) {
+                    value = std::move(*cached_value);
+                    break;
+                }
+                value = get_record(record_key);
+            } else {
+                throw std::runtime_error("Invalid history record.");
+            }
+        }
+        // Apply the deltas in order.
+        for (auto it = deltas.rbegin(); it != deltas.rend(); it++) {
+            value = apply_delta(value, *it);
+        }
+        return value;
+    }
+
+    std::string HistoryManagerPrivate::encode_revision(
+        const std::string& prefix,
+        const HistoryResource& resource,
+        size_t revision,
+        const std::string& value,
+        size_t keyframe_interval,
+        size_t& stored_size)
+    {
+        auto key = get_revision_key(prefix, revision);
+        std::string record;
+        if (1 < keyframe_interval && resource.base_index < revision && revision % keyframe_interval) {
+            record = encode_delta(read_revision(prefix, resource, revision - 1), value);
+            if (record.size() < value.size()) {
+                record.push_back(DeltaRecord);
+                set_shared_record(key, "");
+                stored_size = record.size();
+                return record;
+            }
+        }
+        if (MinSharedValueSize <= value.size()) {
+            auto value_key = share_value(value, stored_size);
+            if (value_key) {
+                record.reserve(value_key->size() + 1);
+                record.assign(*value_key);
+                record.push_back(SharedRecord);
+                set_shared_record(key, std::move(*value_key));
+                stored_size += record.size();
+                return record;
+            }
+        }
+        record.reserve(value.size() + 1);
+        record.assign(value);
+        record.push_back(FullRecord);
+        set_shared_record(key, "");
+        stored_size = record.size();
+        return record;
+    }
+
+    std::optional<std::string> HistoryManagerPrivate::share_value(const std::string& value, size_t& stored_size)
+    {
+        std::string value_key;
+        value_key.reserve(SharedValuePrefix.size() + 3 * sizeof(std::uint64_t));
+        value_key.append(SharedValuePrefix);
+        detail::append_big_endian<std::uint64_t>(value_key, std::hash<std::string> {}(value));
+        detail::append_big_endian<std::uint64_t>(value_key, value.size());
+        // All collision indexes of a hash are in the same shard.
+        auto& shard = shared_values[get_shard_index(value_key)];
+        std::lock_guard lock(shard.mutex);
+        // Most values are only stored once.
+        // Storing them inline avoids the extra record and reference count.
+        // A value is shared from the second time it is seen.
+        if (shard.seen.insert(value_key).second) {
+            return std::nullopt;
+        }
+        // Different values with the same hash are stored under a different collision index.
+        for (std::uint64_t collision = 0;; collision++) {
+            auto key = value_key;
+            detail::append_big_endian(key, collision);
+            auto it = shard.values.find(key);
+            if (it == shard.values.end()) {
+                // The value is not stored yet.
+                retain(key);
+                write({ { key, value } });
+                shard.values.emplace(key, 1);
+                stored_size = value.size();
+                return key;
+            }
+            if (get_record(key) == value) {
+                it->second++;
+                stored_size = 0;
+                return key;
+            }
+        }
+    }
+
+    void HistoryManagerPrivate::set_shared_record(const std::string& key, std::string value_key)
+    {
+        std::string old_value_key;
+        {
+            auto& shard = shared_records[get_shard_index(key)];
+            std::lock_guard lock(shard.mutex);
+            if (value_key.empty()) {
+                auto node = shard.records.extract(key);
+                if (node.empty()) {
+                    return;
+                }
+                old_value_key = std::move(node.mapped());
+            } else {
+                auto [it, inserted] = shard.records.try_emplace(key, std::move(value_key));
+                if (inserted) {
+                    return;
+                }
+                old_value_key = std::exchange(it->second, std::move(value_key));
+            }
+        }
+        // Release the old value.
+        // The value key without the collision index selects the shard.
+        auto& shard = shared_values[get_shard_index(old_value_key.substr(0, old_value_key.size() - sizeof(std::uint64_t)))];
+        std::lock_guard lock(shard.mutex);
+        auto it = shard.values.find(old_value_key);
+        if (it == shard.values.end()) {
+            throw std::runtime_error("Shared history value is not referenced.");
+        }
+        if (--it->second == 0) {
+            // Nothing references the value. Queue it for deletion.
+            shard.values.erase(it);
+            discard(std::move(old_value_key));
+        }
+    }
+
+    void HistoryManagerPrivate::reclaim_loop()
+    {
+        std::unique_lock reclaim_lock(reclaim_mutex);
+        while (true) {
+            reclaim_condition.wait(reclaim_lock, [this] { return reclaim_stop || !reclaim_keys.empty(); });
+            if (reclaim_stop) {
+                return;
+            }
+            reclaim_lock.unlock();
+            try {
+                // Writers remove keys from the queue before using them
+                // so the queued keys are not in use.
+                reclaim(ReclaimBatchSize);
+            } catch (const std::exception&) {
+                // The database is in an invalid state.
+                // The remaining data will be deleted with the temporary directory.
+                return;
+            }
+            reclaim_lock.lock();
+        }
+    }
+
+    void HistoryManagerPrivate::writer_loop()
+    {
+        std::unique_lock lock(pending_mutex);
+        while (true) {
+            pending_condition.wait(lock, [this] { return writer_stop || !pending_writes.empty(); });
+            if (writer_stop) {
+                return;
+            }
+            // Group the pending writes into a batch.
+            HistoryStorageBatch batch;
+            size_t batch_size = 0;
+            std::vector<std::pair<std::string, size_t>> written;
+            for (const auto& [key, pending] : pending_writes) {
+                if (WriteBatchSize <= batch_size) {
+                    break;
+                }
+                batch.emplace_back(key, pending.record);
+                batch_size += key.size() + (pending.record ? pending.record->size() : 0);
+                written.emplace_back(key, pending.sequence);
+            }
+            lock.unlock();
+            std::string error;
+            try {
+                get_storage().write(std::move(batch));
+            } catch (const std::exception& e) {
+                error = e.what();
+                if (error.empty()) {
+                    error = "Failed to write the history.";
+                }
+            }
+            lock.lock();
+            if (!error.empty()) {
+                writer_error = std::move(error);
+                written_condition.notify_all();
+                return;
+            }
+            // Remove the writes that have not been written again since the batch was created.
+            for (const auto& [key, sequence] : written) {
+                auto it = pending_writes.find(key);
+                if (it->second.sequence == sequence) {
+                    pending_size -= key.size() + (it->second.record ? it->second.record->size() : 0);
+                    pending_writes.erase(it);
+                }
+            }
+            written_condition.notify_all();
+        }
     }
 
 } // namespace detail
 
 // HistoryManager
 
-HistoryManager::HistoryManager()
-    : _h(std::make_shared<detail::HistoryManagerPrivate>())
+HistoryManager::HistoryManager(const HistoryStorageOptions& options)
+    : _h(std::make_shared<detail::HistoryManagerPrivate>(options))
 {
 }
 
@@ -112,11 +851,112 @@ void HistoryManager::reset()
     // Add the initial bin.
     _h->history_bins.emplace_back();
     // Update the index to the initial bin.
+    _h->history_start = 0;
     _h->history_index = 0;
+    _h->history_size = 0;
+}
+
+void HistoryManager::emit_changes()
+{
+    // Get the layers without removing expired layers from the list.
+    std::vector<std::shared_ptr<AbstractHistoryManagerLayer>> layers;
+    {
+        std::shared_lock lock(_h->mutex);
+        std::lock_guard invalidate_lock(_h->invalidate_mutex);
+        for (const auto& weak_layer : _h->layers) {
+            if (auto layer = weak_layer.lock()) {
+                layers.push_back(std::move(layer));
+            }
+        }
+    }
+    // Emit the changes without the lock so that the callbacks can access the history.
+    for (const auto& layer : layers) {
+        layer->emit_changes();
+    }
+}
+
+size_t HistoryManager::get_max_undo_count()
+{
+    return _h->max_undo_count;
+}
+
+void HistoryManager::set_max_undo_count(size_t max_undo_count)
+{
+    _h->max_undo_count = max_undo_count;
+    _h->trim();
+}
+
+size_t HistoryManager::get_max_undo_size()
+{
+    return _h->max_undo_size;
+}
+
+void HistoryManager::set_max_undo_size(size_t max_undo_size)
+{
+    _h->max_undo_size = max_undo_size;
+    _h->trim();
+}
+
+size_t HistoryManager::get_max_cache_size()
+{
+    return _h->cache.get_max_size();
+}
+
+void HistoryManager::set_max_cache_size(size_t max_cache_size)
+{
+    _h->cache.set_max_size(max_cache_size);
+}
+
+size_t HistoryManager::get_cache_hits()
+{
+    return _h->cache.get_hits();
+}
+
+size_t HistoryManager::get_cache_misses()
+{
+    return _h->cache.get_misses();
+}
+
+size_t HistoryManager::get_max_pending_size()
+{
+    std::lock_guard lock(_h->pending_mutex);
+    return _h->max_pending_size;
+}
+
+void HistoryManager::set_max_pending_size(size_t max_pending_size)
+{
+    {
+        std::lock_guard lock(_h->pending_mutex);
+        _h->max_pending_size = max_pending_size;
+    }
+    // Let writers waiting for the old limit continue.
+    _h->written_condition.notify_all();
+    if (max_pending_size == 0) {
+        // Writes must not be reordered with the pending writes.
+        _h->flush();
+    }
+}
+
+void HistoryManager::flush()
+{
+    _h->flush();
+}
+
+bool HistoryManager::has_storage()
+{
+    return _h->storage_created;
+}
+
+void HistoryManager::reclaim()
+{
+    while (_h->reclaim(ReclaimBatchSize)) { }
+    _h->flush();
 }
 
 void HistoryManager::mark_saved()
 {
+    // Make sure the saved state is in the database.
+    _h->flush();
     for_each(
         _h->layers,
         [](AbstractHistoryManagerLayer& layer) { layer.mark_saved(); });
@@ -129,37 +969,37 @@ void HistoryManager::create_undo_bin()
     // Add a new bin
     _h->history_bins.emplace_back();
     _h->history_index++;
+    // Drop the oldest bins if the limits have been exceeded.
+    _h->trim();
 }
 
 size_t HistoryManager::get_undo_count()
 {
-    return _h->history_index;
+    return _h->history_index - _h->history_start;
 }
 
 void HistoryManager::undo()
 {
     // Check if there is anything to undo.
-    if (_h->history_index == 0) {
+    if (_h->history_index == _h->history_start) {
         throw std::runtime_error("There is nothing to undo.");
     }
+    // Write the changes being undone before moving away from them.
+    _h->flush();
     // Decrement the history index.
     auto old_index = _h->history_index;
     auto new_index = --_h->history_index;
     // For all resources in the bin.
+    auto& bin = _h->get_bin(old_index);
     for_each(
-        _h->history_bins.at(old_index),
-        [&new_index](HistoryResource& resource) {
-            // Decrement the indexes.
-            resource.index--;
-            resource.global_index = new_index;
-            // Notify listeners that it has changed.
-            resource.changed->emit();
-        });
+        _h->layers,
+        [&bin, &new_index](AbstractHistoryManagerLayer& layer) { layer.undo_bin(bin, new_index); });
 }
 
 size_t HistoryManager::get_redo_count()
 {
-    return _h->history_bins.size() - _h->history_index - 1;
+    std::lock_guard bin_lock(_h->bin_mutex);
+    return _h->history_start + _h->history_bins.size() - _h->history_index - 1;
 }
 
 void HistoryManager::redo()
@@ -168,18 +1008,15 @@ void HistoryManager::redo()
     if (!_h->has_redo()) {
         throw std::runtime_error("There is nothing to redo.");
     }
+    // Write the pending changes before moving away from them.
+    _h->flush();
     // Increment the history index.
     auto new_index = ++_h->history_index;
     // For all resources in the bin.
+    auto& bin = _h->get_bin(new_index);
     for_each(
-        _h->history_bins.at(new_index),
-        [&new_index](HistoryResource& resource) {
-            // Increment the index
-            resource.index++;
-            resource.global_index = new_index;
-            // Notify listeners that it has changed.
-            resource.changed->emit();
-        });
+        _h->layers,
+        [&bin, &new_index](AbstractHistoryManagerLayer& layer) { layer.redo_bin(bin, new_index); });
 }
 
 } // namespace Amulet
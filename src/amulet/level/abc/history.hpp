@@ -1,28 +1,59 @@
 #pragma once
 
+#include <algorithm>
+#include <array>
+#include <atomic>
 #include <concepts>
+#include <condition_variable>
+#include <cstdint>
+#include <deque>
 #include <filesystem>
 #include <functional>
 #include <limits>
+#include <list>
 #include <map>
 #include <memory>
+#include <mutex>
+#include <optional>
 #include <ranges>
 #include <set>
 #include <shared_mutex>
+#include <stdexcept>
+#include <string>
+#include <thread>
+#include <tuple>
+#include <unordered_map>
+#include <unordered_set>
+#include <utility>
 #include <vector>
 
-#include <amulet/leveldb.hpp>
-#include <leveldb/write_batch.h>
-
 #include <amulet/utils/signal.hpp>
-#include <amulet/utils/temp.hpp>
 #include <amulet/utils/weak.hpp>
 
 #include <amulet/level/dll.hpp>
 
+#include "history_storage.hpp"
+
 namespace Amulet {
 
-class HistoryResource {
+namespace detail {
+    // Append an unsigned integer to a string in big endian byte order.
+    // Keys encoded like this sort in numerical order.
+    template <std::unsigned_integral T>
+    void append_big_endian(std::string& str, T value)
+    {
+        for (size_t i = sizeof(T); i--;) {
+            str.push_back(static_cast<char>(value >> (8 * i)));
+        }
+    }
+} // namespace detail
+
+// The type of the layer identifier.
+// 2^16 should be large enough but this can be increased if needed.
+using LayerId = std::uint16_t;
+
+// The revision indexes of a resource.
+class HistoryResourceState {
 public:
     // The local index of the currently active revision.
     size_t index = 0;
@@ -34,29 +65,180 @@ public:
     // The global history index the current state equates to.
     size_t global_index = 0;
 
-    // Emitted when index changes during undo and redo.
-    std::unique_ptr<Signal<>> changed;
+    // The lowest local index that is still reachable.
+    // Revisions below this have been dropped from the undo history.
+    size_t base_index = 0;
+
+    // The highest local index that has been written to the database.
+    size_t max_index = 0;
 
     // Has the resource been changed since last save.
     bool has_changed() const
     {
         return index != saved_index;
     }
+};
+
+class HistoryResource : public HistoryResourceState {
+private:
+    // Emitted when index changes during undo and redo.
+    // This is only created if it is requested.
+    std::shared_ptr<Signal<>> _changed;
 
-    HistoryResource()
-        : changed(std::make_unique<Signal<>>())
+public:
+    // Get the signal emitted when index changes during undo and redo.
+    // The signal is created the first time this is called.
+    // Unique lock required.
+    Signal<>& get_changed()
     {
+        if (!_changed) {
+            _changed = std::make_shared<Signal<>>();
+        }
+        return *_changed;
+    }
+
+    // Get the changed signal if it has been created.
+    // Null if nothing has requested it.
+    std::shared_ptr<Signal<>> get_changed_ptr() const
+    {
+        return _changed;
     }
 };
 
 class AbstractHistoryManagerLayer;
 
 namespace detail {
+    // Get the database key for a revision of a resource.
+    inline std::string get_revision_key(const std::string& prefix, size_t revision)
+    {
+        std::string key;
+        key.reserve(prefix.size() + sizeof(std::uint64_t));
+        key.append(prefix);
+        append_big_endian<std::uint64_t>(key, revision);
+        return key;
+    }
+
+    class HistoryBin {
+    public:
+        // The handles of the resources that were changed in this bin, grouped by layer id.
+        std::map<LayerId, std::set<size_t>> resources;
+
+        // The number of bytes written to the database in this bin.
+        size_t size = 0;
+    };
+
+    // The number of shards used to split up locks that many threads contend for.
+    static constexpr size_t HistoryShardCount = 64;
+
+    // Get the shard a key belongs to.
+    inline size_t get_shard_index(const std::string& key)
+    {
+        return std::hash<std::string> {}(key) % HistoryShardCount;
+    }
+
+    // A least recently used cache of decoded revision values.
+    // Values are keyed by the database key of the revision.
+    // The cache is split into shards with their own lock and an equal share of the size limit.
+    // Thread safe.
+    class HistoryValueCache {
+    private:
+        class Shard {
+        public:
+            std::mutex mutex;
+            std::list<std::pair<std::string, std::string>> values;
+            std::unordered_map<std::string, std::list<std::pair<std::string, std::string>>::iterator> index;
+            size_t size = 0;
+
+            // Remove a value if it is in the shard.
+            // Mutex required.
+            void erase(const std::string& key);
+
+            // Remove the least recently used values until the size is within the limit.
+            // Mutex required.
+            void evict(size_t max_size);
+        };
+
+        std::array<Shard, HistoryShardCount> _shards;
+        std::atomic<size_t> _max_size;
+        std::atomic<size_t> _hits = 0;
+        std::atomic<size_t> _misses = 0;
+
+    public:
+        AMULET_LEVEL_EXPORT HistoryValueCache(size_t max_size);
+
+        // Get a value if it is in the cache.
+        AMULET_LEVEL_EXPORT std::optional<std::string> get(const std::string& key);
+
+        // Add or replace a value.
+        // Values larger than the size limit of a shard are not cached.
+        AMULET_LEVEL_EXPORT void set(const std::string& key, const std::string& value);
+
+        // Remove a value if it is in the cache.
+        AMULET_LEVEL_EXPORT void erase(const std::string& key);
+
+        // Remove all values.
+        AMULET_LEVEL_EXPORT void clear();
+
+        // Get the maximum number of bytes of values to keep.
+        AMULET_LEVEL_EXPORT size_t get_max_size();
+
+        // Set the maximum number of bytes of values to keep.
+        AMULET_LEVEL_EXPORT void set_max_size(size_t max_size);
+
+        // The number of times get found a value.
+        AMULET_LEVEL_EXPORT size_t get_hits();
+
+        // The number of times get did not find a value.
+        AMULET_LEVEL_EXPORT size_t get_misses();
+    };
+
+    // The shared value keys referenced by a shard of revision keys.
+    class SharedRecordShard {
+    public:
+        std::mutex mutex;
+        std::unordered_map<std::string, std::string> records;
+    };
+
+    // The reference counts of a shard of shared value keys.
+    class SharedValueShard {
+    public:
+        std::mutex mutex;
+        std::unordered_map<std::string, size_t> values;
+        // The value keys, without the collision index, of values that have been stored.
+        std::unordered_set<std::string> seen;
+    };
+
+    // A database write waiting to be written by the writer thread.
+    class PendingWrite {
+    public:
+        // The record to write or nullopt to delete the key.
+        std::optional<std::string> record;
+
+        // Incremented each time the key is written.
+        // The writer thread only removes the entry if it has not been written again.
+        size_t sequence;
+    };
+
+    // The shared state of the history system.
+    //
+    // Locking:
+    // mutex is held in unique mode to create undo bins, undo, redo, reset and trim the history.
+    // It is held in shared mode to read and write resources.
+    // Each layer splits its resources into shards with their own mutex so that
+    // different resources can be written from many threads at once.
+    // The remaining state that writers share has its own mutex.
     class HistoryManagerPrivate {
     public:
         // Mutex to lock the state across multiple threads
         std::shared_mutex mutex;
 
+        // Mutex held while destroying future bins from a writer with a shared lock.
+        // This is also held to iterate layers while the shared lock is held.
+        std::mutex invalidate_mutex;
+
+        // Mutex to lock history_bins and history_size while mutex is held in shared mode.
+        std::mutex bin_mutex;
+
         // The history layers that are part of this manager.
         WeakList<AbstractHistoryManagerLayer> layers;
 
@@ -64,22 +246,381 @@ namespace detail {
         size_t layer_count = 0;
 
         // A container tracking which resources have changed in each bin.
-        std::vector<WeakSet<HistoryResource>> history_bins;
+        // The first bin is the base state and cannot be undone.
+        std::deque<HistoryBin> history_bins;
+
+        // The global index of the first bin in history_bins.
+        // This is incremented when the oldest undo bin is dropped.
+        size_t history_start = 0;
 
         // Which index is the current bin.
         size_t history_index = 0;
 
-        TempDir db_path;
+        // The total size of all bins excluding the base bin.
+        size_t history_size = 0;
+
+        // The maximum number of undo bins to keep.
+        size_t max_undo_count = std::numeric_limits<size_t>::max();
+
+        // The maximum number of bytes the undo bins may use.
+        size_t max_undo_size = std::numeric_limits<size_t>::max();
+
+        // The options the storage is created with.
+        HistoryStorageOptions storage_options;
+
+        // Used to create the storage once.
+        std::once_flag storage_flag;
+
+        // Set when the storage has been created.
+        std::atomic<bool> storage_created = false;
+
+        // The storage the records are written to.
+        // This is created when the first record is written. Use get_storage to access it.
+        std::unique_ptr<HistoryStorage> storage;
+
+        // Recently read and written values.
+        HistoryValueCache cache;
+
+        // The shared value key referenced by each revision key.
+        // Values that are stored many times are only written once under a key derived from their content.
+        std::array<SharedRecordShard, HistoryShardCount> shared_records;
+
+        // The number of revision keys referencing each shared value key.
+        std::array<SharedValueShard, HistoryShardCount> shared_values;
+
+        // Database keys that are no longer reachable and are waiting to be deleted.
+        std::set<std::string> reclaim_keys;
+
+        // Keys that have been taken from reclaim_keys and are being deleted.
+        std::set<std::string> reclaiming_keys;
+
+        // Mutex to lock reclaim_keys, reclaiming_keys and reclaim_stop.
+        std::mutex reclaim_mutex;
+
+        // Notified when there are keys to reclaim or the thread should stop.
+        std::condition_variable reclaim_condition;
+
+        // Notified when a batch of keys has been deleted.
+        std::condition_variable reclaimed_condition;
+
+        // Set to stop the reclaim thread.
+        bool reclaim_stop = false;
+
+        // Background thread that deletes unreachable keys.
+        std::thread reclaim_thread;
+
+        // Writes waiting to be written to the database.
+        // Reads check this before reading from the database.
+        std::unordered_map<std::string, PendingWrite> pending_writes;
+
+        // The number of bytes of keys and records in pending_writes.
+        size_t pending_size = 0;
+
+        // The sequence number of the last pending write.
+        size_t pending_sequence = 0;
+
+        // The maximum number of bytes of pending writes.
+        // Writers wait when this is exceeded.
+        // 0 writes to the database before returning.
+        size_t max_pending_size = 0;
+
+        // Mutex to lock the pending write state.
+        std::mutex pending_mutex;
+
+        // Notified when there are writes pending or the thread should stop.
+        std::condition_variable pending_condition;
 
-        std::unique_ptr<Amulet::LevelDB> db;
+        // Notified when the writer thread has written a batch.
+        std::condition_variable written_condition;
 
-        AMULET_LEVEL_EXPORT HistoryManagerPrivate();
+        // Set to stop the writer thread.
+        bool writer_stop = false;
+
+        // The error raised by the writer thread.
+        // If this is set the pending writes will never be written.
+        std::string writer_error;
+
+        // Background thread that writes the pending writes.
+        std::thread writer_thread;
+
+        AMULET_LEVEL_EXPORT HistoryManagerPrivate(const HistoryStorageOptions& options);
+        AMULET_LEVEL_EXPORT ~HistoryManagerPrivate();
+
+        // Get the bin with the given global index.
+        AMULET_LEVEL_EXPORT HistoryBin& get_bin(size_t index);
 
         // Destroy all future redo bins.
+        // Shared or unique mutex required.
+        // The caller must not hold any layer shard locks.
         AMULET_LEVEL_EXPORT void invalidate_future();
 
         // Are there bins ahead of the history index.
+        // Unique mutex or bin_mutex required.
         AMULET_LEVEL_EXPORT bool has_redo();
+
+        // Add resources to the current bin if it is not the base bin.
+        // Shared or unique mutex required.
+        AMULET_LEVEL_EXPORT void add_to_bin(LayerId layer_id, const std::vector<size_t>& handles, size_t size);
+
+        // Drop the oldest undo bins until the undo limits are satisfied.
+        // Unique mutex required.
+        AMULET_LEVEL_EXPORT void trim();
+
+        // Make the next revision of a resource its base revision.
+        // This is called when the oldest undo bin is dropped.
+        // Unique mutex required.
+        AMULET_LEVEL_EXPORT void rebase(const std::string& prefix, HistoryResource& resource);
+
+        // Queue a database key to be deleted by the reclaim thread.
+        // If the key references a shared value, the reference is released.
+        // Unique mutex or the lock of the resource the key belongs to required.
+        AMULET_LEVEL_EXPORT void discard(std::string key);
+
+        // Remove a key from the reclaim queue.
+        // If the key is being deleted this waits until the delete has finished.
+        // This must be called before writing to a key.
+        // Unique mutex or the lock of the resource the key belongs to required.
+        AMULET_LEVEL_EXPORT void retain(const std::string& key);
+
+        // Get the storage.
+        // The storage is created and the background threads are started on the first call.
+        // Thread safe.
+        AMULET_LEVEL_EXPORT HistoryStorage& get_storage();
+
+        // Delete up to count queued keys from the database.
+        // Returns the number of keys deleted.
+        // Thread safe.
+        AMULET_LEVEL_EXPORT size_t reclaim(size_t count);
+
+        // Write records to the database.
+        // If max_pending_size is not zero the records are written by the writer thread.
+        // This waits if the pending writes exceed max_pending_size.
+        // The caller must have called retain for each key.
+        // Thread safe.
+        AMULET_LEVEL_EXPORT void write(std::vector<std::pair<std::string, std::string>> records);
+
+        // Read a record from the pending writes or the database.
+        // Throws std::runtime_error if the record does not exist.
+        // Thread safe.
+        AMULET_LEVEL_EXPORT std::string get_record(const std::string& key);
+
+        // Wait until all pending writes have been written.
+        // Throws std::runtime_error if the writer thread failed.
+        // Thread safe.
+        AMULET_LEVEL_EXPORT void flush();
+
+        // Read the value of a revision.
+        // If the revision is stored as a delta, it is rebuilt from the previous revisions.
+        // The value is served from and added to the value cache.
+        // Shared or unique mutex required.
+        AMULET_LEVEL_EXPORT std::string read_revision(
+            const std::string& prefix,
+            const HistoryResource& resource,
+            size_t revision);
+
+        // Read the values of multiple revisions.
+        // Values not in the cache are read in key order from one database snapshot.
+        // The values are returned in the order of the revisions.
+        // Shared or unique mutex required.
+        AMULET_LEVEL_EXPORT std::vector<std::string> read_revisions(
+            const std::vector<std::tuple<std::string, const HistoryResource*, size_t>>& revisions);
+
+        // Encode a value to be stored at the given revision.
+        // If keyframe_interval is greater than 1 and the revision is not a keyframe,
+        // the value is stored as a delta from the previous revision.
+        // Large values are written once to the shared value store and the record references them.
+        // Any shared value referenced by the previous record of this revision is released.
+        // stored_size is set to the number of bytes this adds to the database.
+        // The caller must write the returned record to the key of the revision.
+        // Unique mutex or the unique lock of the resource required.
+        AMULET_LEVEL_EXPORT std::string encode_revision(
+            const std::string& prefix,
+            const HistoryResource& resource,
+            size_t revision,
+            const std::string& value,
+            size_t keyframe_interval,
+            size_t& stored_size);
+
+    private:
+        // Decode a record read from the database.
+        // Delta records are rebuilt from the previous revisions.
+        // Shared or unique mutex required.
+        std::string decode_record(
+            const std::string& prefix,
+            const HistoryResource& resource,
+            size_t revision,
+            std::string record);
+
+        // Add a write to the pending writes.
+        // nullopt deletes the key.
+        // The caller must hold pending_mutex and notify pending_condition.
+        void queue_write(std::string key, std::optional<std::string> record);
+
+        // Get the shared value key for a value, writing the value if it is not already stored.
+        // This adds a reference to the value.
+        // Returns nullopt the first time a value is seen. The caller should store it inline.
+        std::optional<std::string> share_value(const std::string& value, size_t& stored_size);
+
+        // Set the shared value key referenced by a revision key.
+        // An empty value_key removes the reference.
+        // The previously referenced value is released.
+        void set_shared_record(const std::string& key, std::string value_key);
+
+        void reclaim_loop();
+
+        void writer_loop();
+    };
+
+    // A hash table mapping resource ids to resources.
+    // Resources are stored contiguously in insertion order and are referred to by their slot index (handle).
+    // Resources cannot be removed individually so handles are valid until the table is cleared.
+    // References to resources are invalidated when a resource is added.
+    template <typename ResourceIdT>
+    class HistoryResourceTable {
+    public:
+        using value_type = std::pair<ResourceIdT, HistoryResource>;
+
+        // The handle returned by find if the resource does not exist.
+        static constexpr size_t npos = std::numeric_limits<size_t>::max();
+
+    private:
+        // The resources in insertion order.
+        std::vector<value_type> _slots;
+
+        // The slot index plus one for each bucket. 0 is an empty bucket.
+        // The number of buckets is a power of two and at least twice the number of slots.
+        std::vector<std::uint32_t> _buckets;
+
+    public:
+        // Hash a resource id.
+        // The result is less than 2^32.
+        static size_t hash(const ResourceIdT& resource_id)
+        {
+            size_t hash;
+            if constexpr (requires { std::hash<ResourceIdT> {}(resource_id); }) {
+                hash = std::hash<ResourceIdT> {}(resource_id);
+            } else {
+                hash = std::hash<std::string> {}(std::string(resource_id));
+            }
+            // std::hash may be the identity function. Mix the bits so that linear probing works.
+            return static_cast<size_t>((static_cast<std::uint64_t>(hash) * 0x9E3779B97F4A7C15) >> 32);
+        }
+
+    private:
+        // Find the bucket containing the resource id or the empty bucket it would be added to.
+        size_t _find_bucket(const ResourceIdT& resource_id) const
+        {
+            size_t mask = _buckets.size() - 1;
+            for (size_t bucket = hash(resource_id) & mask;; bucket = (bucket + 1) & mask) {
+                auto slot = _buckets[bucket];
+                if (slot == 0 || _slots[slot - 1].first == resource_id) {
+                    return bucket;
+                }
+            }
+        }
+
+        void _rehash(size_t bucket_count)
+        {
+            _buckets.assign(bucket_count, 0);
+            size_t mask = bucket_count - 1;
+            for (size_t slot = 0; slot < _slots.size(); slot++) {
+                size_t bucket = hash(_slots[slot].first) & mask;
+                while (_buckets[bucket]) {
+                    bucket = (bucket + 1) & mask;
+                }
+                _buckets[bucket] = static_cast<std::uint32_t>(slot + 1);
+            }
+        }
+
+    public:
+        // The number of resources.
+        size_t size() const
+        {
+            return _slots.size();
+        }
+
+        // Get the handle of a resource or npos if it does not exist.
+        size_t find(const ResourceIdT& resource_id) const
+        {
+            if (_buckets.empty()) {
+                return npos;
+            }
+            auto slot = _buckets[_find_bucket(resource_id)];
+            return slot ? slot - 1 : npos;
+        }
+
+        // Check if a resource exists.
+        bool contains(const ResourceIdT& resource_id) const
+        {
+            return find(resource_id) != npos;
+        }
+
+        // Add a new resource and return its handle.
+        // The resource id must not already exist.
+        size_t emplace(const ResourceIdT& resource_id)
+        {
+            if (std::numeric_limits<std::uint32_t>::max() <= _slots.size()) {
+                throw std::runtime_error("Exceeded the maximum number of resources in a layer (2^32)");
+            }
+            if (_buckets.size() < 2 * (_slots.size() + 1)) {
+                _rehash(std::max<size_t>(16, 2 * _buckets.size()));
+            }
+            auto bucket = _find_bucket(resource_id);
+            _slots.emplace_back(
+                std::piecewise_construct,
+                std::forward_as_tuple(resource_id),
+                std::forward_as_tuple());
+            _buckets[bucket] = static_cast<std::uint32_t>(_slots.size());
+            return _slots.size() - 1;
+        }
+
+        // Get the resource id of a handle.
+        const ResourceIdT& get_id(size_t handle) const
+        {
+            return _slots[handle].first;
+        }
+
+        // Get the resource of a handle.
+        HistoryResource& get(size_t handle)
+        {
+            return _slots[handle].second;
+        }
+
+        // Get the resource of a handle.
+        const HistoryResource& get(size_t handle) const
+        {
+            return _slots[handle].second;
+        }
+
+        // Get the resource with the given id.
+        // Throws std::out_of_range if it does not exist.
+        HistoryResource& at(const ResourceIdT& resource_id)
+        {
+            return const_cast<HistoryResource&>(std::as_const(*this).at(resource_id));
+        }
+
+        // Get the resource with the given id.
+        // Throws std::out_of_range if it does not exist.
+        const HistoryResource& at(const ResourceIdT& resource_id) const
+        {
+            auto handle = find(resource_id);
+            if (handle == npos) {
+                throw std::out_of_range("Resource does not exist. " + std::string(resource_id));
+            }
+            return get(handle);
+        }
+
+        // Remove all resources and release the memory.
+        void clear()
+        {
+            _slots = std::vector<value_type>();
+            _buckets = std::vector<std::uint32_t>();
+        }
+
+        auto begin() { return _slots.begin(); }
+        auto end() { return _slots.end(); }
+        auto begin() const { return _slots.begin(); }
+        auto end() const { return _slots.end(); }
     };
 
 } // namespace
@@ -89,7 +630,8 @@ class HistoryManager;
 class AbstractHistoryManagerLayer {
 protected:
     // Destroy all future redo bins.
-    // Unique mutex required.
+    // Shared or unique mutex required.
+    // This locks each shard of the layer.
     virtual void invalidate_future() = 0;
 
     // Reset all history data.
@@ -100,27 +642,54 @@ protected:
     // Unique mutex required.
     virtual void mark_saved() = 0;
 
+    // Move the resources changed in the bin back to the previous revision.
+    // Unique mutex required.
+    virtual void undo_bin(const detail::HistoryBin& bin, size_t history_index) = 0;
+
+    // Move the resources changed in the bin forward to the next revision.
+    // Unique mutex required.
+    virtual void redo_bin(const detail::HistoryBin& bin, size_t history_index) = 0;
+
+    // Make the revisions in the oldest undo bin the base revisions.
+    // Unique mutex required.
+    virtual void trim_bin(const detail::HistoryBin& bin) = 0;
+
     friend detail::HistoryManagerPrivate;
     friend HistoryManager;
+
+public:
+    // Emit the resources changed since the last call in one event.
+    // The mutex must not be held.
+    virtual void emit_changes() = 0;
 };
 
 template <typename T>
 concept ResourceId = std::totally_ordered<T> && std::convertible_to<T, std::string>;
 
-// The type of the layer identifier.
-// 2^16 should be large enough but this can be increased if needed.
-using LayerId = std::uint16_t;
+// The version of the history database key layout.
+// This is stored in the database and checked when it is opened.
+// Version 1 stores all integers in big endian byte order and chunk keys in Morton order.
+static const std::uint32_t HistoryKeyVersion = 1;
 
+// Get the database key prefix shared by all revisions of a resource.
+// Integers are big endian so that all keys of a layer, and all revisions of a resource, are stored next to each other.
 template <ResourceId ResourceIdT>
-std::string get_resource_key(LayerId id, const ResourceIdT& resource_id, size_t index)
+std::string get_resource_prefix(LayerId id, const ResourceIdT& resource_id)
 {
     std::string key;
     key.reserve(32);
-    key.append(reinterpret_cast<char*>(&id), sizeof(LayerId));
+    detail::append_big_endian(key, id);
     key.push_back('/');
     key.append(resource_id);
     key.push_back('/');
-    key.append(reinterpret_cast<char*>(&index), sizeof(size_t));
+    return key;
+}
+
+template <ResourceId ResourceIdT>
+std::string get_resource_key(LayerId id, const ResourceIdT& resource_id, size_t index)
+{
+    std::string key = get_resource_prefix(id, resource_id);
+    detail::append_big_endian<std::uint64_t>(key, index);
     return key;
 }
 
@@ -132,36 +701,108 @@ enum class HistoryInitialisationMode {
 };
 
 // A group of resources in the history system.
+// The resources are split into shards with their own lock so that
+// different resources can be read and written from multiple threads at once.
 template <ResourceId ResourceIdT>
 class HistoryManagerLayer : public AbstractHistoryManagerLayer {
 private:
+    // A group of resources sharing a lock.
+    class Shard {
+    public:
+        // Locked in shared mode to read and unique mode to write the resources.
+        std::shared_mutex mutex;
+
+        // The resources in this shard.
+        detail::HistoryResourceTable<ResourceIdT> resources;
+    };
+
     // Shared state.
     std::shared_ptr<detail::HistoryManagerPrivate> _h;
 
     // A unique identifier for this layer.
     LayerId _id;
 
+    // The number of revisions between full copies of a value.
+    size_t _keyframe_interval;
+
     // The resources in this layer.
-    std::map<ResourceIdT, std::shared_ptr<HistoryResource>> _resources;
+    // The handle of a resource is its slot index multiplied by the shard count plus the shard index.
+    mutable std::array<Shard, detail::HistoryShardCount> _shards;
+
+    // Mutex to lock _changed_resources and _changed_signals.
+    std::mutex _changed_mutex;
+
+    // The resources changed since emit_changes was last called.
+    std::set<ResourceIdT> _changed_resources;
+
+    // The changed signals of the resources moved by undo and redo since emit_changes was last called.
+    std::vector<std::shared_ptr<Signal<>>> _changed_signals;
 
     HistoryManagerLayer(
         std::shared_ptr<detail::HistoryManagerPrivate> h,
-        LayerId id)
+        LayerId id,
+        size_t keyframe_interval)
         : _h(h)
         , _id(id)
+        , _keyframe_interval(keyframe_interval)
     {
     }
 
     friend HistoryManager;
 
+    // Get the index of the shard a resource belongs to.
+    // This uses the high bits of the hash because the resource table uses the low bits.
+    static size_t _get_shard_index(const ResourceIdT& resource_id)
+    {
+        return detail::HistoryResourceTable<ResourceIdT>::hash(resource_id) * detail::HistoryShardCount >> 32;
+    }
+
+    // Get the resource of a handle.
+    // The lock of the shard or the unique lock is required.
+    HistoryResource& _get_resource(size_t handle) const
+    {
+        return _shards[handle % detail::HistoryShardCount].resources.get(handle / detail::HistoryShardCount);
+    }
+
+    // Get the resource id of a handle.
+    // The lock of the shard or the unique lock is required.
+    const ResourceIdT& _get_resource_id(size_t handle) const
+    {
+        return _shards[handle % detail::HistoryShardCount].resources.get_id(handle / detail::HistoryShardCount);
+    }
+
+    // Lock the used shards in ascending order so that threads locking multiple shards cannot deadlock.
+    template <typename LockT>
+    std::vector<LockT> _lock_shards(const std::array<bool, detail::HistoryShardCount>& used) const
+    {
+        std::vector<LockT> locks;
+        for (size_t shard_index = 0; shard_index < detail::HistoryShardCount; shard_index++) {
+            if (used[shard_index]) {
+                locks.emplace_back(_shards[shard_index].mutex);
+            }
+        }
+        return locks;
+    }
+
 protected:
     // Invalidate all future data.
-    // Unique lock required.
+    // Shared or unique lock required.
     void invalidate_future() override
     {
-        for (auto& [_, resource] : _resources) {
-            if (resource->index < resource->saved_index) {
-                resource->saved_index = -1;
+        for (auto& shard : _shards) {
+            std::lock_guard shard_lock(shard.mutex);
+            for (auto& [resource_id, resource] : shard.resources) {
+                if (resource.index < resource.saved_index) {
+                    resource.saved_index = -1;
+                }
+                if (resource.index < resource.max_index) {
+                    // Queue the future revisions for deletion.
+                    auto prefix = get_resource_prefix(_id, resource_id);
+                    for (auto revision = resource.index + 1; revision <= resource.max_index; revision++) {
+                        _h->discard(detail::get_revision_key(prefix, revision));
+                    }
+                    resource.max_index = resource.index;
+                }
             }
         }
     }
@@ -170,19 +811,91 @@ protected:
     // Unique lock required.
     void reset() override
     {
-        _resources.clear();
+        for (auto& shard : _shards) {
+            for (auto& [resource_id, resource] : shard.resources) {
+                // Queue all revisions for deletion.
+                auto prefix = get_resource_prefix(_id, resource_id);
+                for (auto revision = resource.base_index; revision <= resource.max_index; revision++) {
+                    _h->discard(detail::get_revision_key(prefix, revision));
+                }
+            }
+            shard.resources.clear();
+        }
     }
 
     // Mark all resources as saved.
     // Unique lock required.
     void mark_saved() override
     {
-        for (auto& [_, resource] : _resources) {
-            resource->saved_index = resource->index;
+        for (auto& shard : _shards) {
+            for (auto& [_, resource] : shard.resources) {
+                resource.saved_index = resource.index;
+            }
+        }
+    }
+
+    // Move the resources changed in the bin back to the previous revision.
+    // Unique lock required.
+    void undo_bin(const detail::HistoryBin& bin, size_t history_index) override
+    {
+        auto it = bin.resources.find(_id);
+        if (it == bin.resources.end()) {
+            return;
+        }
+        std::lock_guard changed_lock(_changed_mutex);
+        for (auto handle : it->second) {
+            _changed_resources.insert(_get_resource_id(handle));
+            auto& resource = _get_resource(handle);
+            // Decrement the indexes.
+            resource.index--;
+            resource.global_index = history_index;
+            // Listeners are notified by emit_changes once the lock is released.
+            if (auto changed = resource.get_changed_ptr()) {
+                _changed_signals.push_back(std::move(changed));
+            }
+        }
+    }
+
+    // Move the resources changed in the bin forward to the next revision.
+    // Unique lock required.
+    void redo_bin(const detail::HistoryBin& bin, size_t history_index) override
+    {
+        auto it = bin.resources.find(_id);
+        if (it == bin.resources.end()) {
+            return;
+        }
+        std::lock_guard changed_lock(_changed_mutex);
+        for (auto handle : it->second) {
+            _changed_resources.insert(_get_resource_id(handle));
+            auto& resource = _get_resource(handle);
+            // Increment the index
+            resource.index++;
+            resource.global_index = history_index;
+            // Listeners are notified by emit_changes once the lock is released.
+            if (auto changed = resource.get_changed_ptr()) {
+                _changed_signals.push_back(std::move(changed));
+            }
+        }
+    }
+
+    // Make the revisions in the bin the base revisions.
+    // Unique lock required.
+    void trim_bin(const detail::HistoryBin& bin) override
+    {
+        auto it = bin.resources.find(_id);
+        if (it == bin.resources.end()) {
+            return;
+        }
+        for (auto handle : it->second) {
+            _h->rebase(get_resource_prefix(_id, _get_resource_id(handle)), _get_resource(handle));
         }
     }
 
 public:
+    // Emitted by emit_changes with the resources changed by writes, undo and redo since the previous call.
+    // Many changes are delivered in one event so that listeners can process them in one pass.
+    Signal<std::vector<ResourceIdT>> resources_changed;
+
     // The public mutex.
     // Note the mutex is shared with the HistoryManager class.
     // Thread safe.
@@ -191,12 +904,38 @@ public:
         return _h->mutex;
     }
 
-    // View the resource data.
-    // The caller must not modify the HistoryResource state.
-    // Shared or unique lock required while accessing the returned object.
-    const std::map<ResourceIdT, std::shared_ptr<HistoryResource>>& get_resources()
+    // Emit the changed signal of each resource moved by undo and redo
+    // and resources_changed if any resources have changed since the last call.
+    // The mutex must not be held so that the callbacks can access the history.
+    // Thread safe.
+    void emit_changes() override
     {
-        return _resources;
+        std::vector<ResourceIdT> resource_ids;
+        std::vector<std::shared_ptr<Signal<>>> changed_signals;
+        {
+            std::lock_guard changed_lock(_changed_mutex);
+            resource_ids.assign(_changed_resources.begin(), _changed_resources.end());
+            _changed_resources.clear();
+            changed_signals.swap(_changed_signals);
+        }
+        for (const auto& changed : changed_signals) {
+            changed->emit();
+        }
+        if (!resource_ids.empty()) {
+            resources_changed.emit(std::move(resource_ids));
+        }
+    }
+
+    // Get the number of resources in the layer.
+    // Shared or unique lock required.
+    size_t get_resource_count() const
+    {
+        size_t count = 0;
+        for (auto& shard : _shards) {
+            std::shared_lock shard_lock(shard.mutex);
+            count += shard.resources.size();
+        }
+        return count;
     }
 
     // Check if a resource entry exists.
@@ -204,123 +943,241 @@ public:
     // Shared or unique lock required.
     bool has_resource(const ResourceIdT& resource_id) const
     {
-        return _resources.contains(resource_id);
+        auto& shard = _shards[_get_shard_index(resource_id)];
+        std::shared_lock shard_lock(shard.mutex);
+        return shard.resources.contains(resource_id);
     }
 
-    // Get the HistoryResource instance for this resource.
-    // External shared lock required.
-    const HistoryResource& get_resource(const ResourceIdT& resource_id) const
+    // Get a copy of the revision indexes of this resource.
+    // Shared or unique lock required.
+    HistoryResourceState get_resource(const ResourceIdT& resource_id) const
+    {
+        auto& shard = _shards[_get_shard_index(resource_id)];
+        std::shared_lock shard_lock(shard.mutex);
+        return shard.resources.at(resource_id);
+    }
+
+    // Get the signal emitted when the resource changes during undo and redo.
+    // The signal is emitted by emit_changes after the lock is released.
+    // The signal is created the first time this is called for the resource.
+    // Shared or unique lock required.
+    Signal<>& get_resource_changed(const ResourceIdT& resource_id)
     {
-        return *_resources.at(resource_id);
+        auto& shard = _shards[_get_shard_index(resource_id)];
+        std::lock_guard shard_lock(shard.mutex);
+        return shard.resources.at(resource_id).get_changed();
     }
 
     // Get the current data for the resource.
     // Shared or unique lock required.
     std::string get_value(const ResourceIdT& resource_id) const
     {
+        auto& shard = _shards[_get_shard_index(resource_id)];
+        std::shared_lock shard_lock(shard.mutex);
         // Get the resource
-        const auto& resource = *_resources.at(resource_id);
+        const auto& resource = shard.resources.at(resource_id);
         // Get the value
-        std::string value;
-        auto& db = *_h->db;
-        auto status = db->Get(
-            db.get_read_options(),
-            get_resource_key(_id, resource_id, resource.index),
-            &value);
-        if (!status.ok()) {
-            throw std::runtime_error(status.ToString());
+        return _h->read_revision(get_resource_prefix(_id, resource_id), resource, resource.index);
+    }
+
+    // Get the current data for multiple resources.
+    // This is faster than calling get_value for each resource.
+    // The values are returned in the order of the resource ids.
+    // Shared or unique lock required.
+    template <typename T>
+        requires std::ranges::forward_range<T>
+        && std::convertible_to<std::ranges::range_value_t<T>, const ResourceIdT&>
+    std::vector<std::string> get_values(const T& resource_ids) const
+    {
+        std::array<bool, detail::HistoryShardCount> used_shards {};
+        for (const auto& resource_id : resource_ids) {
+            used_shards[_get_shard_index(resource_id)] = true;
         }
-        return value;
+        auto shard_locks = _lock_shards<std::shared_lock<std::shared_mutex>>(used_shards);
+        std::vector<std::tuple<std::string, const HistoryResource*, size_t>> revisions;
+        for (const auto& resource_id : resource_ids) {
+            const auto& resource = _shards[_get_shard_index(resource_id)].resources.at(resource_id);
+            revisions.emplace_back(get_resource_prefix(_id, resource_id), &resource, resource.index);
+        }
+        return _h->read_revisions(revisions);
+    }
+
+    std::vector<std::string> get_values(std::initializer_list<ResourceIdT> resource_ids) const
+    {
+        return get_values<std::initializer_list<ResourceIdT>>(resource_ids);
     }
 
 private:
-    std::map<ResourceIdT, std::shared_ptr<HistoryResource>>::iterator _set_initial_value(const ResourceIdT& resource_id, const std::string& value)
+    // Create the resource and write the initial value.
+    // Returns the handle of the resource.
+    // The unique lock of the shard required.
+    size_t _set_initial_value(const ResourceIdT& resource_id, const std::string& value)
     {
+        HistoryResource resource;
+        auto prefix = get_resource_prefix(_id, resource_id);
+        auto key = detail::get_revision_key(prefix, 0);
         // Write the value to the database
-        auto& db = *_h->db;
-        auto status = db->Put(
-            db.get_write_options(),
-            get_resource_key(_id, resource_id, 0),
-            value);
-        if (!status.ok()) {
-            throw std::runtime_error(status.ToString());
-        }
+        _h->retain(key);
+        size_t stored_size;
+        auto record = _h->encode_revision(prefix, resource, 0, value, _keyframe_interval, stored_size);
+        _h->write({ { key, std::move(record) } });
+        _h->cache.set(key, value);
         // Create the resource
-        return _resources.emplace(resource_id, std::make_shared<HistoryResource>()).first;
+        auto shard_index = _get_shard_index(resource_id);
+        return _shards[shard_index].resources.emplace(resource_id) * detail::HistoryShardCount + shard_index;
+    }
+
+    // Record that a resource has changed.
+    // Thread safe.
+    void _add_changed(const ResourceIdT& resource_id)
+    {
+        std::lock_guard changed_lock(_changed_mutex);
+        _changed_resources.insert(resource_id);
+    }
+
+    // Update the resource state before a new value is written.
+    // The unique lock of the shard required.
+    void _update_resource(HistoryResource& resource)
+    {
+        if (resource.global_index != _h->history_index && _h->history_index != _h->history_start) {
+            // A new global bin has been created since this was last changed.
+            // Create a new local bin.
+            resource.index++;
+            resource.max_index = resource.index;
+            resource.global_index = _h->history_index;
+        }
+        if (resource.index == resource.saved_index) {
+            // We are modifying the saved bin.
+            // The saved index is invalid.
+            resource.saved_index = -1;
+        }
     }
 
 public:
     // Set the initial state for the resource.
     // If has_resource returns false this must be called.
-    // Unique lock required.
+    // Shared or unique lock required.
     void set_initial_value(const ResourceIdT& resource_id, const std::string& value)
     {
+        auto& shard = _shards[_get_shard_index(resource_id)];
+        std::lock_guard shard_lock(shard.mutex);
         // Check that it doesn't already exist.
-        if (_resources.contains(resource_id)) {
+        if (shard.resources.contains(resource_id)) {
             throw std::runtime_error("Resource already exists. " + std::string(resource_id));
         }
         _set_initial_value(resource_id, value);
     }
 
+    // Set the initial state for multiple resources.
+    // The records are written in one batch.
+    // Supports any range of pair-like elements.
+    // Shared or unique lock required.
+    template <typename T>
+        requires std::ranges::forward_range<T>
+        && std::convertible_to<
+            std::ranges::range_value_t<T>,
+            const std::pair<ResourceIdT, std::string>>
+    void set_initial_values(const T& resources)
+    {
+        std::array<bool, detail::HistoryShardCount> used_shards {};
+        for (const auto& [resource_id, _] : resources) {
+            used_shards[_get_shard_index(resource_id)] = true;
+        }
+        auto shard_locks = _lock_shards<std::unique_lock<std::shared_mutex>>(used_shards);
+
+        // Check that they don't already exist before changing the state.
+        std::set<ResourceIdT> resource_ids;
+        for (const auto& [resource_id, _] : resources) {
+            if (_shards[_get_shard_index(resource_id)].resources.contains(resource_id) || !resource_ids.insert(resource_id).second) {
+                throw std::runtime_error("Resource already exists. " + std::string(resource_id));
+            }
+        }
+
+        // Encode the records
+        std::vector<std::pair<std::string, std::string>> records;
+        std::vector<std::string> keys;
+        for (const auto& [resource_id, value] : resources) {
+            HistoryResource resource;
+            auto prefix = get_resource_prefix(_id, resource_id);
+            auto key = detail::get_revision_key(prefix, 0);
+            _h->retain(key);
+            size_t stored_size;
+            auto record = _h->encode_revision(prefix, resource, 0, value, _keyframe_interval, stored_size);
+            keys.push_back(key);
+            records.emplace_back(std::move(key), std::move(record));
+        }
+        if (records.empty()) {
+            return;
+        }
+
+        // Write to the database.
+        _h->write(std::move(records));
+        auto key_it = keys.begin();
+        for (const auto& [resource_id, value] : resources) {
+            _h->cache.set(*key_it++, value);
+            // Create the resource
+            _shards[_get_shard_index(resource_id)].resources.emplace(resource_id);
+        }
+    }
+
+    void set_initial_values(std::initializer_list<std::pair<ResourceIdT, std::string>> resources)
+    {
+        set_initial_values<std::initializer_list<std::pair<ResourceIdT, std::string>>>(resources);
+    }
+
     // Set the data for the resource.
     // init_mode can be set to configure what happens if set_initial_value has not been called for this resource.
-    // Unique lock required.
+    // Shared or unique lock required.
     template <HistoryInitialisationMode init_mode = HistoryInitialisationMode::Error>
     void set_value(const ResourceIdT& resource_id, const std::string& value)
     {
         // A change has been made. Invalidate all future undo points.
         _h->invalidate_future();
 
+        auto& shard = _shards[_get_shard_index(resource_id)];
+        std::lock_guard shard_lock(shard.mutex);
+
         // Get the resource
-        auto it = _resources.find(resource_id);
-        if (it == _resources.end()) {
+        auto handle = shard.resources.find(resource_id);
+        if (handle == shard.resources.npos) {
             // Resource does not exist.
             if constexpr (init_mode == HistoryInitialisationMode::Error) {
                 throw std::runtime_error("Initial value has not been set for resource: " + std::string(resource_id));
             } else if constexpr (init_mode == HistoryInitialisationMode::Empty) {
-                it = _set_initial_value(resource_id, "");
-                it->second->saved_index = -1;
+                handle = _set_initial_value(resource_id, "");
+                _get_resource(handle).saved_index = -1;
             } else {
                 static_assert(init_mode == HistoryInitialisationMode::Value);
-                it = _set_initial_value(resource_id, value);
-                it->second->saved_index = -1;
+                handle = _set_initial_value(resource_id, value);
+                _get_resource(handle).saved_index = -1;
+                _add_changed(resource_id);
                 return; // There is no point setting it again.
             }
+        } else {
+            handle = handle * detail::HistoryShardCount + _get_shard_index(resource_id);
         }
-        auto resource_ptr = it->second;
-        auto& resource = *resource_ptr;
+        auto& resource = _get_resource(handle);
 
         // Update the resource state
-        if (resource.global_index != _h->history_index) {
-            // A new global bin has been created since this was last changed.
-            // Create a new local bin.
-            resource.index++;
-            resource.global_index = _h->history_index;
-        }
-        if (resource.index == resource.saved_index) {
-            // We are modifying the saved bin.
-            // The saved index is invalid.
-            resource.saved_index = -1;
-        }
+        _update_resource(resource);
+
         // Write to the database.
-        auto& db = *_h->db;
-        auto status = db->Put(
-            db.get_write_options(),
-            get_resource_key(_id, resource_id, resource.index),
-            value);
-        if (!status.ok()) {
-            throw std::runtime_error(status.ToString());
-        }
-        if (_h->history_index != 0) {
-            // Add the resource to the global bin
-            _h->history_bins.at(_h->history_index).emplace(resource_ptr);
-        }
+        auto prefix = get_resource_prefix(_id, resource_id);
+        auto key = detail::get_revision_key(prefix, resource.index);
+        _h->retain(key);
+        size_t stored_size;
+        auto record = _h->encode_revision(prefix, resource, resource.index, value, _keyframe_interval, stored_size);
+        _h->write({ { key, std::move(record) } });
+        _h->cache.set(key, value);
+        // Add the resource to the global bin
+        _h->add_to_bin(_id, { handle }, stored_size);
+        _add_changed(resource_id);
     }
 
     // Set the data for multiple resources.
     // Supports any range of pair-like elements. Elements must remain valid beyond the life of the iterator.
     // init_mode can be set to configure what happens if set_initial_value has not been called for this resource.
-    // Unique lock required.
+    // Shared or unique lock required.
     template <HistoryInitialisationMode init_mode = HistoryInitialisationMode::Error, typename T>
         requires std::ranges::forward_range<T>
         && std::convertible_to<
@@ -331,27 +1188,35 @@ public:
         // A change has been made. Invalidate all future undo points.
         _h->invalidate_future();
 
+        std::array<bool, detail::HistoryShardCount> used_shards {};
+        for (const auto& [resource_id, _] : resources) {
+            used_shards[_get_shard_index(resource_id)] = true;
+        }
+        auto shard_locks = _lock_shards<std::unique_lock<std::shared_mutex>>(used_shards);
+
         // Get all resources.
         // If a resource doesn't exist we should error before changing the state.
-        std::list<std::tuple<const ResourceIdT&, const std::string&, std::shared_ptr<HistoryResource>>> resource_data;
+        std::list<std::tuple<const ResourceIdT&, const std::string&, size_t>> resource_data;
         for (const auto& [resource_id, value] : resources) {
-            auto it = _resources.find(resource_id);
-            if (it == _resources.end()) {
+            auto shard_index = _get_shard_index(resource_id);
+            auto handle = _shards[shard_index].resources.find(resource_id);
+            if (handle == detail::HistoryResourceTable<ResourceIdT>::npos) {
                 // Resource does not exist.
                 if constexpr (init_mode == HistoryInitialisationMode::Error) {
                     throw std::runtime_error("Initial value has not been set for resource: " + std::string(resource_id));
                 } else if constexpr (init_mode == HistoryInitialisationMode::Empty) {
-                    const auto& resource_ptr = _set_initial_value(resource_id, "")->second;
-                    resource_ptr->saved_index = -1;
-                    resource_data.emplace_back(resource_id, value, resource_ptr);
+                    handle = _set_initial_value(resource_id, "");
+                    _get_resource(handle).saved_index = -1;
+                    resource_data.emplace_back(resource_id, value, handle);
                 } else {
                     static_assert(init_mode == HistoryInitialisationMode::Value);
                     // Set the original state and don't add it to resource_data.
-                    it = _set_initial_value(resource_id, value);
-                    it->second->saved_index = -1;
+                    handle = _set_initial_value(resource_id, value);
+                    _get_resource(handle).saved_index = -1;
+                    _add_changed(resource_id);
                 }
             } else {
-                resource_data.emplace_back(resource_id, value, it->second);
+                resource_data.emplace_back(resource_id, value, handle * detail::HistoryShardCount + shard_index);
             }
         }
 
@@ -360,45 +1225,48 @@ public:
             return;
         }
 
-        // Create the write batch
-        leveldb::WriteBatch batch;
+        // Encode the records
+        std::vector<std::pair<std::string, std::string>> records;
+        records.reserve(resource_data.size());
+        size_t batch_size = 0;
+        std::vector<size_t> handles;
+        handles.reserve(resource_data.size());
 
-        for (const auto& [resource_id, value, resource_ptr] : resource_data) {
+        for (const auto& [resource_id, value, handle] : resource_data) {
             // Get the resource
-            auto& resource = *resource_ptr;
+            auto& resource = _get_resource(handle);
 
             // Update the resource state
-            if (resource.global_index != _h->history_index) {
-                // A new global bin has been created since this was last changed.
-                // Create a new local bin.
-                resource.index++;
-                resource.global_index = _h->history_index;
-            }
-            if (resource.index == resource.saved_index) {
-                // We are modifying the saved bin.
-                // The saved index is invalid.
-                resource.saved_index = -1;
-            }
-
-            // Add to the batch
-            batch.Put(
-                get_resource_key(_id, resource_id, resource.index),
-                value);
+            _update_resource(resource);
+
+            // Encode the record
+            auto prefix = get_resource_prefix(_id, resource_id);
+            auto key = detail::get_revision_key(prefix, resource.index);
+            _h->retain(key);
+            size_t stored_size;
+            auto record = _h->encode_revision(prefix, resource, resource.index, value, _keyframe_interval, stored_size);
+            records.emplace_back(std::move(key), std::move(record));
+            batch_size += stored_size;
+            handles.push_back(handle);
         }
 
         // Write to the database.
-        auto& db = *_h->db;
-        auto status = db->Write(
-            db.get_write_options(),
-            &batch);
-        if (!status.ok()) {
-            throw std::runtime_error(status.ToString());
-        }
-        if (_h->history_index != 0) {
-            // Add the resources to the global bin
-            auto& bin = _h->history_bins.at(_h->history_index);
+        std::vector<std::string> keys;
+        keys.reserve(records.size());
+        for (const auto& [key, _] : records) {
+            keys.push_back(key);
+        }
+        _h->write(std::move(records));
+        auto key_it = keys.begin();
+        for (const auto& data : resource_data) {
+            _h->cache.set(*key_it++, std::get<1>(data));
+        }
+        // Add the resources to the global bin
+        _h->add_to_bin(_id, handles, batch_size);
+        {
+            std::lock_guard changed_lock(_changed_mutex);
             for (const auto& data : resource_data) {
-                bin.emplace(std::get<2>(data));
+                _changed_resources.insert(std::get<0>(data));
             }
         }
     }
@@ -417,7 +1285,7 @@ private:
     std::shared_ptr<detail::HistoryManagerPrivate> _h;
 
 public:
-    AMULET_LEVEL_EXPORT HistoryManager();
+    AMULET_LEVEL_EXPORT HistoryManager(const HistoryStorageOptions& options = HistoryStorageOptions());
 
     // The public mutex.
     // Note the mutex is shared with the HistoryManagerLayer class.
@@ -425,16 +1293,22 @@ public:
     AMULET_LEVEL_EXPORT std::shared_mutex& get_mutex();
 
     // Get a new history layer.
+    // keyframe_interval is the number of revisions between full copies of each value.
+    // Revisions between keyframes are stored as a delta from the previous revision.
+    // 1 stores every revision in full.
     // Unique lock required.
     template <ResourceId ResourceIdT>
-    std::shared_ptr<HistoryManagerLayer<ResourceIdT>> new_layer()
+    std::shared_ptr<HistoryManagerLayer<ResourceIdT>> new_layer(size_t keyframe_interval = 1)
     {
         auto& layer_id = _h->layer_count;
         if (std::numeric_limits<LayerId>::max() < layer_id) {
             throw std::runtime_error("Exceeded the maximum number of layers (2^16)");
         }
+        if (keyframe_interval == 0) {
+            throw std::invalid_argument("keyframe_interval must be at least 1.");
+        }
         auto layer = std::shared_ptr<HistoryManagerLayer<ResourceIdT>>(
-            new HistoryManagerLayer<ResourceIdT>(_h, static_cast<LayerId>(layer_id)));
+            new HistoryManagerLayer<ResourceIdT>(_h, static_cast<LayerId>(layer_id), keyframe_interval));
         _h->layers.push_back(layer);
         layer_id++;
         return layer;
@@ -444,6 +1318,72 @@ public:
     // Unique lock required.
     AMULET_LEVEL_EXPORT void reset();
 
+    // Call emit_changes on every layer.
+    // This should be called after undo, redo and bulk writes once the lock has been released.
+    // The lock must not be held.
+    AMULET_LEVEL_EXPORT void emit_changes();
+
+    // Get the maximum number of undo bins that are kept.
+    // Shared or unique lock required.
+    AMULET_LEVEL_EXPORT size_t get_max_undo_count();
+
+    // Set the maximum number of undo bins that are kept.
+    // The oldest bins are destroyed when this is exceeded.
+    // Unique lock required.
+    AMULET_LEVEL_EXPORT void set_max_undo_count(size_t max_undo_count);
+
+    // Get the maximum number of bytes the undo bins may use.
+    // Shared or unique lock required.
+    AMULET_LEVEL_EXPORT size_t get_max_undo_size();
+
+    // Set the maximum number of bytes the undo bins may use.
+    // The oldest bins are destroyed when this is exceeded.
+    // The current bin is never destroyed.
+    // Unique lock required.
+    AMULET_LEVEL_EXPORT void set_max_undo_size(size_t max_undo_size);
+
+    // Get the maximum number of bytes of values kept in the in-memory cache.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT size_t get_max_cache_size();
+
+    // Set the maximum number of bytes of values kept in the in-memory cache.
+    // 0 disables the cache.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT void set_max_cache_size(size_t max_cache_size);
+
+    // The number of value reads served by the cache.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT size_t get_cache_hits();
+
+    // The number of value reads that were not in the cache.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT size_t get_cache_misses();
+
+    // Get the maximum number of bytes of writes that may wait to be written to the database.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT size_t get_max_pending_size();
+
+    // Set the maximum number of bytes of writes that may wait to be written to the database.
+    // Writes are grouped together and written by a background thread.
+    // Writers wait if this is exceeded.
+    // 0 disables this and values are written before set_value returns.
+    // Unique lock required.
+    AMULET_LEVEL_EXPORT void set_max_pending_size(size_t max_pending_size);
+
+    // Wait until all pending writes have been written to the database.
+    // Shared or unique lock required.
+    AMULET_LEVEL_EXPORT void flush();
+
+    // Has the storage been created.
+    // The storage is created when the first value is written.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT bool has_storage();
+
+    // Delete all unreachable data from the database.
+    // This is done in the background so this only needs to be called to wait for it to finish.
+    // Shared or unique lock required.
+    AMULET_LEVEL_EXPORT void reclaim();
+
     // Mark the current state as the saved state.
     // Unique lock required.
     AMULET_LEVEL_EXPORT void mark_saved();
@@ -0,0 +1,309 @@
+#include <chrono>
+#include <mutex>
+#include <stdexcept>
+
+#include <leveldb/cache.h>
+#include <leveldb/db.h>
+#include <leveldb/decompress_allocator.h>
+#include <leveldb/env.h>
+#include <leveldb/filter_policy.h>
+#include <leveldb/iterator.h>
+#include <leveldb/options.h>
+#include <leveldb/write_batch.h>
+
+#include "history_storage.hpp"
+
+class NullLogger : public leveldb::Logger {
+public:
+    void Logv(const char*, va_list) override { }
+};
+
+class LevelDBOptions : public Amulet::LevelDBOptions {
+public:
+    NullLogger logger;
+    leveldb::DecompressAllocator decompress_allocator;
+};
+
+static std::unique_ptr<Amulet::LevelDB> create_leveldb(const std::string& path_str, const Amulet::HistoryStorageOptions& storage_options)
+{
+    // Expand dots and symbolic links
+    auto path = std::filesystem::absolute(path_str);
+    // If there is not a directory at the path
+    if (!std::filesystem::is_directory(path)) {
+        throw std::runtime_error("leveldb directory does not exist.");
+    }
+
+    // Make a db directory in the directory
+    path /= "db";
+    std::filesystem::create_directory(path);
+
+    auto options = std::make_unique<LevelDBOptions>();
+    options->options.create_if_missing = true;
+    if (storage_options.bloom_bits > 0) {
+        options->options.filter_policy = leveldb::NewBloomFilterPolicy(storage_options.bloom_bits);
+    }
+    options->options.block_cache = leveldb::NewLRUCache(storage_options.cache_size);
+    options->options.write_buffer_size = storage_options.write_buffer_size;
+    options->options.info_log = &options->logger;
+    switch (storage_options.compression) {
+    case Amulet::HistoryCompression::None:
+        options->options.compression = leveldb::CompressionType::kNoCompression;
+        break;
+    case Amulet::HistoryCompression::Zlib:
+        options->options.compression = leveldb::CompressionType::kZlibCompression;
+        break;
+    case Amulet::HistoryCompression::ZlibRaw:
+        options->options.compression = leveldb::CompressionType::kZlibRawCompression;
+        break;
+    default:
+        throw std::invalid_argument("Unknown history compression.");
+    }
+    options->options.block_size = storage_options.block_size;
+
+    options->read_options.decompress_allocator = &options->decompress_allocator;
+
+    leveldb::DB* _db = NULL;
+    auto status = leveldb::DB::Open(options->options, path.string(), &_db);
+    if (status.ok()) {
+        return std::make_unique<Amulet::LevelDB>(
+            std::unique_ptr<leveldb::DB>(_db),
+            std::move(options));
+    }
+    throw std::runtime_error("Could not create temporary leveldb database at \"" + path_str + "\" " + status.ToString());
+}
+
+// The maximum number of bytes written in one batch when records are moved to disk.
+static const size_t SpillBatchSize = 4 * 1024 * 1024;
+
+namespace Amulet {
+
+namespace detail {
+    // HistoryDirectory
+
+    HistoryDirectory::HistoryDirectory(const std::filesystem::path& parent_dir)
+    {
+        if (parent_dir.empty()) {
+            _temp_dir.emplace("level_data");
+            _path = _temp_dir->get_path();
+            return;
+        }
+        std::filesystem::create_directories(parent_dir);
+        // Find an unused name. create_directory returns false if the directory already exists.
+        auto time = std::chrono::system_clock::now().time_since_epoch().count();
+        for (size_t i = 0;; i++) {
+            auto path = parent_dir / ("level_data-" + std::to_string(time) + "-" + std::to_string(i));
+            if (std::filesystem::create_directory(path)) {
+                _path = std::filesystem::absolute(path);
+                return;
+            }
+        }
+    }
+
+    HistoryDirectory::~HistoryDirectory()
+    {
+        if (!_temp_dir) {
+            std::error_code error;
+            std::filesystem::remove_all(_path, error);
+        }
+    }
+
+    const std::filesystem::path& HistoryDirectory::get_path() const
+    {
+        return _path;
+    }
+} // namespace detail
+
+// LevelDBHistoryStorage
+
+LevelDBHistoryStorage::LevelDBHistoryStorage(const HistoryStorageOptions& options)
+    : _path(options.temp_dir)
+    , _db(create_leveldb(_path.get_path().string(), options))
+{
+}
+
+std::optional<std::string> LevelDBHistoryStorage::get(const std::string& key)
+{
+    std::string record;
+    auto status = (*_db)->Get(_db->get_read_options(), key, &record);
+    if (status.IsNotFound()) {
+        return std::nullopt;
+    } else if (!status.ok()) {
+        throw std::runtime_error(status.ToString());
+    }
+    return record;
+}
+
+std::vector<std::string> LevelDBHistoryStorage::get_many(const std::vector<std::string>& keys)
+{
+    std::vector<std::string> records;
+    records.reserve(keys.size());
+    // Read the records in key order.
+    std::unique_ptr<leveldb::Iterator> it((*_db)->NewIterator(_db->get_read_options()));
+    for (const auto& key : keys) {
+        // Only seek if the key is not the next key.
+        if (it->Valid()) {
+            it->Next();
+        }
+        if (!it->Valid() || it->key() != key) {
+            it->Seek(key);
+        }
+        if (!it->Valid() || it->key() != key) {
+            if (!it->status().ok()) {
+                throw std::runtime_error(it->status().ToString());
+            }
+            throw std::runtime_error("History record does not exist.");
+        }
+        records.push_back(it->value().ToString());
+    }
+    return records;
+}
+
+void LevelDBHistoryStorage::write(HistoryStorageBatch batch)
+{
+    leveldb::Status status;
+    if (batch.size() == 1 && batch[0].second) {
+        status = (*_db)->Put(_db->get_write_options(), batch[0].first, *batch[0].second);
+    } else {
+        leveldb::WriteBatch write_batch;
+        for (const auto& [key, record] : batch) {
+            if (record) {
+                write_batch.Put(key, *record);
+            } else {
+                write_batch.Delete(key);
+            }
+        }
+        status = (*_db)->Write(_db->get_write_options(), &write_batch);
+    }
+    if (!status.ok()) {
+        throw std::runtime_error(status.ToString());
+    }
+}
+
+// MemoryHistoryStorage
+
+MemoryHistoryStorage::MemoryHistoryStorage(const HistoryStorageOptions& options)
+    : _options(options)
+{
+}
+
+std::shared_ptr<LevelDBHistoryStorage> MemoryHistoryStorage::_get_disk()
+{
+    std::shared_lock lock(_mutex);
+    return _disk;
+}
+
+size_t MemoryHistoryStorage::get_memory_size()
+{
+    std::shared_lock lock(_mutex);
+    return _size;
+}
+
+bool MemoryHistoryStorage::is_on_disk()
+{
+    return static_cast<bool>(_get_disk());
+}
+
+std::optional<std::string> MemoryHistoryStorage::get(const std::string& key)
+{
+    std::shared_ptr<LevelDBHistoryStorage> disk;
+    {
+        std::shared_lock lock(_mutex);
+        if (!_disk) {
+            auto it = _records.find(key);
+            if (it == _records.end()) {
+                return std::nullopt;
+            }
+            return it->second;
+        }
+        disk = _disk;
+    }
+    return disk->get(key);
+}
+
+std::vector<std::string> MemoryHistoryStorage::get_many(const std::vector<std::string>& keys)
+{
+    std::shared_ptr<LevelDBHistoryStorage> disk;
+    {
+        std::shared_lock lock(_mutex);
+        if (!_disk) {
+            std::vector<std::string> records;
+            records.reserve(keys.size());
+            for (const auto& key : keys) {
+                auto it = _records.find(key);
+                if (it == _records.end()) {
+                    throw std::runtime_error("History record does not exist.");
+                }
+                records.push_back(it->second);
+            }
+            return records;
+        }
+        disk = _disk;
+    }
+    return disk->get_many(keys);
+}
+
+void MemoryHistoryStorage::write(HistoryStorageBatch batch)
+{
+    std::shared_ptr<LevelDBHistoryStorage> disk;
+    {
+        std::lock_guard lock(_mutex);
+        if (!_disk) {
+            for (auto& [key, record] : batch) {
+                auto it = _records.find(key);
+                if (it != _records.end()) {
+                    _size -= it->first.size() + it->second.size();
+                    if (record) {
+                        it->second = std::move(*record);
+                        _size += it->first.size() + it->second.size();
+                    } else {
+                        _records.erase(it);
+                    }
+                } else if (record) {
+                    _size += key.size() + record->size();
+                    _records.emplace(std::move(key), std::move(*record));
+                }
+            }
+            if (_size <= _options.memory_limit) {
+                return;
+            }
+            // Move the records to disk.
+            // Readers wait until this is finished.
+            auto new_disk = std::make_shared<LevelDBHistoryStorage>(_options);
+            HistoryStorageBatch spill_batch;
+            size_t spill_size = 0;
+            // The records are copied so that nothing is lost if a write fails.
+            for (const auto& [key, record] : _records) {
+                spill_size += key.size() + record.size();
+                spill_batch.emplace_back(key, record);
+                if (SpillBatchSize <= spill_size) {
+                    new_disk->write(std::move(spill_batch));
+                    spill_batch.clear();
+                    spill_size = 0;
+                }
+            }
+            if (!spill_batch.empty()) {
+                new_disk->write(std::move(spill_batch));
+            }
+            _records.clear();
+            _size = 0;
+            _disk = std::move(new_disk);
+            return;
+        }
+        disk = _disk;
+    }
+    disk->write(std::move(batch));
+}
+
+std::unique_ptr<HistoryStorage> create_history_storage(const HistoryStorageOptions& options)
+{
+    switch (options.backend) {
+    case HistoryStorageBackend::LevelDB:
+        return std::make_unique<LevelDBHistoryStorage>(options);
+    case HistoryStorageBackend::Memory:
+        return std::make_unique<MemoryHistoryStorage>(options);
+    default:
+        throw std::invalid_argument("Unknown history storage backend.");
+    }
+}
+
+} // namespace Amulet
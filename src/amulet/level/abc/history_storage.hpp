@@ -0,0 +1,163 @@
+#pragma once
+
+#include <cstddef>
+#include <filesystem>
+#include <memory>
+#include <optional>
+#include <shared_mutex>
+#include <string>
+#include <unordered_map>
+#include <utility>
+#include <vector>
+
+#include <amulet/leveldb.hpp>
+
+#include <amulet/utils/temp.hpp>
+
+#include <amulet/level/dll.hpp>
+
+namespace Amulet {
+
+// The compression applied to the blocks of the history database.
+enum class HistoryCompression {
+    None,
+    Zlib,
+    ZlibRaw
+};
+
+// Where the history records are stored.
+enum class HistoryStorageBackend {
+    // A LevelDB database in a temporary directory.
+    LevelDB,
+    // In memory until memory_limit is exceeded and then in a LevelDB database.
+    Memory
+};
+
+// Options for the database the history is stored in.
+// The defaults suit most levels.
+// A larger cache and no compression trades memory and disk space for speed.
+class HistoryStorageOptions {
+public:
+    // Where the records are stored.
+    HistoryStorageBackend backend = HistoryStorageBackend::LevelDB;
+
+    // The number of bytes of records the memory backend stores before moving them to disk.
+    size_t memory_limit = 256 * 1024 * 1024;
+
+    // The compression applied to database blocks.
+    HistoryCompression compression = HistoryCompression::ZlibRaw;
+
+    // The number of bytes of uncompressed blocks cached in memory.
+    size_t cache_size = 40 * 1024 * 1024;
+
+    // The number of bytes buffered in memory before they are written to a sorted file.
+    size_t write_buffer_size = 4 * 1024 * 1024;
+
+    // The approximate number of bytes of data in each block.
+    size_t block_size = 160 * 1024;
+
+    // The number of bloom filter bits stored for each key.
+    // 0 disables the bloom filter.
+    int bloom_bits = 10;
+
+    // The directory to create the database in.
+    // A uniquely named directory is created in this directory and deleted when the history is destroyed.
+    // If empty the default temporary directory is used.
+    std::filesystem::path temp_dir;
+};
+
+// Changes written to the storage in one operation.
+// A record of nullopt deletes the key.
+using HistoryStorageBatch = std::vector<std::pair<std::string, std::optional<std::string>>>;
+
+// The storage the history records are written to.
+// Subclass this to store the history somewhere else.
+// All methods must be thread safe.
+class HistoryStorage {
+public:
+    virtual ~HistoryStorage() = default;
+
+    // Get the record stored under a key.
+    // Returns nullopt if the key does not exist.
+    virtual std::optional<std::string> get(const std::string& key) = 0;
+
+    // Get the records stored under many keys.
+    // The keys must be sorted.
+    // Throws std::runtime_error if a key does not exist.
+    virtual std::vector<std::string> get_many(const std::vector<std::string>& keys) = 0;
+
+    // Write a batch of changes.
+    virtual void write(HistoryStorageBatch batch) = 0;
+};
+
+namespace detail {
+    // The directory the history database is stored in.
+    // This is deleted when destroyed.
+    class HistoryDirectory {
+    private:
+        std::optional<TempDir> _temp_dir;
+        std::filesystem::path _path;
+
+    public:
+        // Create a directory in parent_dir.
+        // If parent_dir is empty the default temporary directory is used.
+        AMULET_LEVEL_EXPORT HistoryDirectory(const std::filesystem::path& parent_dir);
+        HistoryDirectory(const HistoryDirectory&) = delete;
+        HistoryDirectory& operator=(const HistoryDirectory&) = delete;
+        AMULET_LEVEL_EXPORT ~HistoryDirectory();
+
+        AMULET_LEVEL_EXPORT const std::filesystem::path& get_path() const;
+    };
+} // namespace detail
+
+// Stores the records in a LevelDB database in a temporary directory.
+class LevelDBHistoryStorage : public HistoryStorage {
+private:
+    detail::HistoryDirectory _path;
+    std::unique_ptr<LevelDB> _db;
+
+public:
+    AMULET_LEVEL_EXPORT LevelDBHistoryStorage(const HistoryStorageOptions& options);
+
+    AMULET_LEVEL_EXPORT std::optional<std::string> get(const std::string& key) override;
+    AMULET_LEVEL_EXPORT std::vector<std::string> get_many(const std::vector<std::string>& keys) override;
+    AMULET_LEVEL_EXPORT void write(HistoryStorageBatch batch) override;
+};
+
+// Stores the records in memory.
+// When the records exceed the memory limit they are moved to a LevelDBHistoryStorage.
+// This avoids touching the disk for short jobs.
+class MemoryHistoryStorage : public HistoryStorage {
+private:
+    HistoryStorageOptions _options;
+
+    // Mutex to lock _records, _size and _disk.
+    std::shared_mutex _mutex;
+    std::unordered_map<std::string, std::string> _records;
+    size_t _size = 0;
+
+    // The storage the records were moved to.
+    // Once this is set it is never changed.
+    std::shared_ptr<LevelDBHistoryStorage> _disk;
+
+    // Get the disk storage if the records have been moved.
+    std::shared_ptr<LevelDBHistoryStorage> _get_disk();
+
+public:
+    AMULET_LEVEL_EXPORT MemoryHistoryStorage(const HistoryStorageOptions& options);
+
+    // The number of bytes of keys and records in memory.
+    AMULET_LEVEL_EXPORT size_t get_memory_size();
+
+    // Have the records been moved to disk.
+    AMULET_LEVEL_EXPORT bool is_on_disk();
+
+    AMULET_LEVEL_EXPORT std::optional<std::string> get(const std::string& key) override;
+    AMULET_LEVEL_EXPORT std::vector<std::string> get_many(const std::vector<std::string>& keys) override;
+    AMULET_LEVEL_EXPORT void write(HistoryStorageBatch batch) override;
+};
+
+// Create the storage selected by options.backend.
+AMULET_LEVEL_EXPORT std::unique_ptr<HistoryStorage> create_history_storage(const HistoryStorageOptions& options);
+
+} // namespace Amulet
@@ -6,6 +6,7 @@
 
 #include <amulet/utils/signal.py.hpp>
 
+#include "future.py.hpp"
 #include "level.hpp"
 
 namespace py = pybind11;
@@ -106,6 +107,24 @@ py::module init_level(py::module m_parent)
         py::call_guard<py::gil_scoped_release>(),
         py::doc("Save all changes to the level.\n"
                 "External ReadWrite:Unique lock required."));
+    Level.def(
+        "save_async",
+        [](std::shared_ptr<Amulet::Level> self) {
+            return Amulet::run_async(
+                [self = std::move(self)](Amulet::AbstractCancelManager&) {
+                    self->save();
+                    return true;
+                },
+                [](bool) { return py::none(); });
+        },
+        py::doc("Save all changes to the level without blocking the asyncio event loop.\n"
+                "The level is saved on a shared worker pool.\n"
+                "If the awaiting task is cancelled before the save starts the save is skipped.\n"
+                "A save that has started runs to completion.\n"
+                "Must be called from a running asyncio event loop.\n"
+                "External ReadWrite:Unique lock required until the future is done.\n"
+                "\n"
+                ">>> await level.save_async()"));
     Amulet::def_signal(
         Level,
         "closed",
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import datetime
 
 import amulet.core.version
@@ -96,6 +97,18 @@ class Level(LevelMetadata):
         External ReadWrite:Unique lock required.
         """
 
+    def save_async(self) -> asyncio.Future[None]:
+        """
+        Save all changes to the level without blocking the asyncio event loop.
+        The level is saved on a shared worker pool.
+        If the awaiting task is cancelled before the save starts the save is skipped.
+        A save that has started runs to completion.
+        Must be called from a running asyncio event loop.
+        External ReadWrite:Unique lock required until the future is done.
+
+        >>> await level.save_async()
+        """
+
     def undo(self) -> None:
         """
         Revert the changes made since the previous restore point.
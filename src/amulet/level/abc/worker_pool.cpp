@@ -0,0 +1,72 @@
+#include <algorithm>
+#include <utility>
+
+#include "worker_pool.hpp"
+
+namespace Amulet {
+
+WorkerPool::WorkerPool(size_t thread_count)
+{
+    if (thread_count == 0) {
+        thread_count = std::max<size_t>(1, std::thread::hardware_concurrency());
+    }
+    for (size_t i = 0; i < thread_count; i++) {
+        _threads.emplace_back(&WorkerPool::_worker, this);
+    }
+}
+
+WorkerPool::~WorkerPool()
+{
+    {
+        std::lock_guard lock(_mutex);
+        _stop = true;
+    }
+    _condition.notify_all();
+    for (auto& thread : _threads) {
+        thread.join();
+    }
+}
+
+void WorkerPool::_worker()
+{
+    std::unique_lock lock(_mutex);
+    while (true) {
+        _condition.wait(lock, [this] { return _stop || !_jobs.empty(); });
+        if (_jobs.empty()) {
+            // Stopped and there are no jobs left.
+            return;
+        }
+        auto job = std::move(_jobs.front());
+        _jobs.pop_front();
+        lock.unlock();
+        job();
+        // Destroy the job before locking so that its destructor can submit new jobs.
+        job = nullptr;
+        lock.lock();
+    }
+}
+
+size_t WorkerPool::get_thread_count() const
+{
+    return _threads.size();
+}
+
+void WorkerPool::submit(std::function<void()> job)
+{
+    {
+        std::lock_guard lock(_mutex);
+        _jobs.push_back(std::move(job));
+    }
+    _condition.notify_one();
+}
+
+WorkerPool& get_worker_pool()
+{
+    // This is intentionally never destroyed.
+    // Jobs may still reference Python objects at interpreter shutdown
+    // and joining the threads then could deadlock.
+    static WorkerPool* pool = new WorkerPool();
+    return *pool;
+}
+
+} // namespace Amulet
@@ -0,0 +1,53 @@
+#pragma once
+
+#include <condition_variable>
+#include <deque>
+#include <functional>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+#include <amulet/level/dll.hpp>
+
+namespace Amulet {
+
+// A fixed size pool of threads that run jobs in the order they were submitted.
+class WorkerPool {
+private:
+    // Mutex to lock _jobs and _stop.
+    std::mutex _mutex;
+    std::condition_variable _condition;
+    std::deque<std::function<void()>> _jobs;
+    bool _stop = false;
+
+    std::vector<std::thread> _threads;
+
+    void _worker();
+
+public:
+    // Start thread_count threads.
+    // If thread_count is zero the number of hardware threads is used.
+    AMULET_LEVEL_EXPORT WorkerPool(size_t thread_count = 0);
+
+    WorkerPool(const WorkerPool&) = delete;
+    WorkerPool& operator=(const WorkerPool&) = delete;
+
+    // Finish the submitted jobs and stop the threads.
+    AMULET_LEVEL_EXPORT ~WorkerPool();
+
+    // The number of threads in the pool.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT size_t get_thread_count() const;
+
+    // Run a job on one of the threads.
+    // The job must not throw.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT void submit(std::function<void()> job);
+};
+
+// The pool shared by the asynchronous level APIs.
+// The pool is created on first use and lives until the process exits.
+// Thread safe.
+AMULET_LEVEL_EXPORT WorkerPool& get_worker_pool();
+
+} // namespace Amulet
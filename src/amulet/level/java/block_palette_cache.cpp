@@ -0,0 +1,76 @@
+#include <mutex>
+#include <utility>
+
+#include "block_palette_cache.hpp"
+
+namespace Amulet {
+
+BlockPaletteCache::BlockPaletteCache(size_t max_size)
+    : _max_size(max_size)
+{
+}
+
+std::shared_ptr<const BlockStack> BlockPaletteCache::get(std::int64_t data_version, const std::string& key)
+{
+    {
+        std::shared_lock lock(_mutex);
+        auto version_it = _block_stacks.find(data_version);
+        if (version_it != _block_stacks.end()) {
+            auto it = version_it->second.find(key);
+            if (it != version_it->second.end()) {
+                _hits++;
+                return it->second;
+            }
+        }
+    }
+    _misses++;
+    return nullptr;
+}
+
+void BlockPaletteCache::set(std::int64_t data_version, std::string key, std::shared_ptr<const BlockStack> block_stack)
+{
+    if (_max_size == 0) {
+        return;
+    }
+    std::lock_guard lock(_mutex);
+    if (_max_size <= _size) {
+        // Discard everything. The entries in use are rebuilt on demand.
+        _block_stacks.clear();
+        _size = 0;
+    }
+    if (_block_stacks[data_version].insert_or_assign(std::move(key), std::move(block_stack)).second) {
+        _size++;
+    }
+}
+
+void BlockPaletteCache::clear()
+{
+    std::lock_guard lock(_mutex);
+    _block_stacks.clear();
+    _size = 0;
+    _hits = 0;
+    _misses = 0;
+}
+
+size_t BlockPaletteCache::get_hits() const
+{
+    return _hits;
+}
+
+size_t BlockPaletteCache::get_misses() const
+{
+    return _misses;
+}
+
+size_t BlockPaletteCache::get_size()
+{
+    std::shared_lock lock(_mutex);
+    return _size;
+}
+
+size_t BlockPaletteCache::get_max_size() const
+{
+    return _max_size;
+}
+
+} // namespace Amulet
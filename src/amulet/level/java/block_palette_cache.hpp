@@ -0,0 +1,70 @@
+#pragma once
+
+#include <atomic>
+#include <cstdint>
+#include <memory>
+#include <shared_mutex>
+#include <string>
+#include <unordered_map>
+
+#include <amulet/core/block/block.hpp>
+
+#include <amulet/level/dll.hpp>
+
+namespace Amulet {
+
+// A cache from a serialised block palette entry to the block stack it decodes to.
+// The same few hundred palette entries are repeated in most sections
+// so after the first few chunks resolving a palette entry is a hash lookup.
+// The entries are stored separately for each data version.
+class BlockPaletteCache {
+private:
+    size_t _max_size;
+
+    // Mutex to lock _block_stacks and _size.
+    std::shared_mutex _mutex;
+    std::unordered_map<std::int64_t, std::unordered_map<std::string, std::shared_ptr<const BlockStack>>> _block_stacks;
+    size_t _size = 0;
+
+    std::atomic<size_t> _hits = 0;
+    std::atomic<size_t> _misses = 0;
+
+public:
+    // max_size is the maximum number of entries stored across all data versions.
+    AMULET_LEVEL_EXPORT BlockPaletteCache(size_t max_size = 65536);
+
+    BlockPaletteCache(const BlockPaletteCache&) = delete;
+    BlockPaletteCache& operator=(const BlockPaletteCache&) = delete;
+
+    // Get the block stack a palette entry decodes to.
+    // Returns nullptr if the entry is not cached.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT std::shared_ptr<const BlockStack> get(std::int64_t data_version, const std::string& key);
+
+    // Store the block stack a palette entry decodes to.
+    // If the cache is full all entries are discarded first.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT void set(std::int64_t data_version, std::string key, std::shared_ptr<const BlockStack> block_stack);
+
+    // Remove all entries and reset the counters.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT void clear();
+
+    // The number of lookups that found an entry.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT size_t get_hits() const;
+
+    // The number of lookups that did not find an entry.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT size_t get_misses() const;
+
+    // The number of entries stored.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT size_t get_size();
+
+    // The maximum number of entries stored.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT size_t get_max_size() const;
+};
+
+} // namespace Amulet
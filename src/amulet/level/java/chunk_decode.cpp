@@ -3,12 +3,15 @@
 #include <functional>
 #include <map>
 #include <memory>
+#include <mutex>
 #include <optional>
+#include <shared_mutex>
 #include <stdexcept>
 #include <string>
 #include <tuple>
 #include <type_traits>
 #include <variant>
+#include <vector>
 
 #include <amulet/nbt/tag/compound.hpp>
 #include <amulet/nbt/tag/named_tag.hpp>
@@ -21,8 +24,10 @@
 #include <amulet/game/java/version.hpp>
 
 #include "chunk.hpp"
+#include "decode_context.hpp"
 #include "long_array.hpp"
 #include "raw_dimension.hpp"
+#include "section_array.hpp"
 
 using namespace Amulet::NBT;
 using namespace Amulet::game;
@@ -140,19 +145,81 @@ void decode_heightmaps_compound(chunkT& chunk, CompoundTag& level)
     // TODO
 }
 
+// Append a length prefixed string so that no two entries serialise to the same key.
+static void append_key_string(std::string& key, const std::string& value)
+{
+    key += std::to_string(value.size());
+    key += ':';
+    key += value;
+}
+
+// Serialise the parts of a block palette entry that the decoded block depends on.
+static std::string get_palette_entry_key(const CompoundTag& block_tag)
+{
+    auto block_name = get_tag<StringTag>(block_tag, "Name", []() -> StringTag { throw std::invalid_argument("Block has no Name attribute."); });
+    std::string key;
+    append_key_string(key, block_name);
+    auto properties_tag = get_tag<CompoundTagPtr>(block_tag, "Properties", []() { return std::make_shared<CompoundTag>(); });
+    // Sort the properties so that the key does not depend on the stored order.
+    std::vector<const CompoundTag::value_type*> properties;
+    properties.reserve(properties_tag->size());
+    for (const auto& property : *properties_tag) {
+        properties.push_back(&property);
+    }
+    std::sort(properties.begin(), properties.end(), [](const auto* a, const auto* b) { return a->first < b->first; });
+    for (const auto* property : properties) {
+        const auto& [k, v] = *property;
+        std::visit([&key, &k](auto&& arg) {
+            using T = std::decay_t<decltype(arg)>;
+            if constexpr (std::is_same_v<T, ByteTag>) {
+                key += 'b';
+                append_key_string(key, k);
+                append_key_string(key, std::to_string(arg.value));
+            } else if constexpr (std::is_same_v<T, ShortTag>) {
+                key += 's';
+                append_key_string(key, k);
+                append_key_string(key, std::to_string(arg.value));
+            } else if constexpr (std::is_same_v<T, IntTag>) {
+                key += 'i';
+                append_key_string(key, k);
+                append_key_string(key, std::to_string(arg.value));
+            } else if constexpr (std::is_same_v<T, LongTag>) {
+                key += 'l';
+                append_key_string(key, k);
+                append_key_string(key, std::to_string(arg.value));
+            } else if constexpr (std::is_same_v<T, StringTag>) {
+                key += 't';
+                append_key_string(key, k);
+                append_key_string(key, arg);
+            }
+        },
+            v);
+    }
+    return key;
+}
+
+// The number of sections decoded and how many of them took the uniform fast path.
+struct SectionDecodeCounts {
+    size_t sections = 0;
+    size_t uniform_sections = 0;
+};
+
 template <int DataVersion>
 std::unique_ptr<JavaChunk> _decode_java_chunk(
-    JavaGameVersion& game_version,
+    const JavaDecodeContext& context,
     const JavaRawChunk& raw_chunk,
     CompoundTag& region,
     std::int64_t cx,
     std::int64_t cz,
-    const VersionNumber& version,
-    std::int64_t data_version,
-    const BlockStack& default_block,
-    const Biome& default_biome,
-    std::function<const Block&()> get_water)
+    BlockPaletteCache& block_palette_cache,
+    SectionDecodeCounts& section_counts)
 {
+    auto& game_version = context.get_game_version();
+    const auto& version = context.get_version();
+    auto data_version = context.get_data_version();
+    const auto& default_block = context.get_default_block();
+    const auto& default_biome = context.get_default_biome();
+
     // Validate coordinates
     CompoundTagPtr level_ptr;
     CompoundTag& level = [&]() -> CompoundTag& {
@@ -276,89 +343,102 @@ std::unique_ptr<JavaChunk> _decode_java_chunk(
             std::vector<std::uint32_t> lut;
             lut.reserve(palette_size);
             for (auto& block_tag : palette) {
-                auto block_name = get_tag<StringTag>(*block_tag, "Name", []() -> StringTag { throw std::invalid_argument("Block has no Name attribute."); });
-                auto colon_index = block_name.find(':');
-                auto [block_namespace, block_base_name] = [&]() -> std::pair<std::string, std::string> {
-                    if (colon_index == std::string::npos) {
-                        return std::make_pair("", block_name);
-                    } else {
-                        return std::make_pair(
-                            block_name.substr(0, colon_index),
-                            block_name.substr(colon_index + 1));
-                    }
-                }();
-                auto properties_tag = get_tag<CompoundTagPtr>(*block_tag, "Properties", []() { return std::make_shared<CompoundTag>(); });
-                std::map<std::string, Block::PropertyValue> block_properties;
-                for (const auto& [k, v] : *properties_tag) {
-                    std::visit([&block_properties, &k](auto&& arg) {
-                        using T = std::decay_t<decltype(arg)>;
-                        if constexpr (
-                            std::is_same_v<T, Amulet::NBT::ByteTag> || std::is_same_v<T, Amulet::NBT::ShortTag> || std::is_same_v<T, Amulet::NBT::IntTag> || std::is_same_v<T, Amulet::NBT::LongTag> || std::is_same_v<T, Amulet::NBT::StringTag>) {
-                            block_properties.emplace(k, arg);
+                auto key = get_palette_entry_key(*block_tag);
+                auto block_stack = block_palette_cache.get(data_version, key);
+                if (!block_stack) {
+                    auto block_name = get_tag<StringTag>(*block_tag, "Name", []() -> StringTag { throw std::invalid_argument("Block has no Name attribute."); });
+                    auto colon_index = block_name.find(':');
+                    auto [block_namespace, block_base_name] = [&]() -> std::pair<std::string, std::string> {
+                        if (colon_index == std::string::npos) {
+                            return std::make_pair("", block_name);
+                        } else {
+                            return std::make_pair(
+                                block_name.substr(0, colon_index),
+                                block_name.substr(colon_index + 1));
                         }
-                    },
-                        v);
-                }
-                std::vector<Block> blocks;
-
-                auto waterloggable = game_version.get_block_data()->is_waterloggable(block_namespace, block_base_name);
-                if (waterloggable == Waterloggable::Yes) {
-                    auto waterlogged_it = block_properties.find("waterlogged");
-                    if (
-                        waterlogged_it != block_properties.end() and std::holds_alternative<StringTag>(waterlogged_it->second)) {
-                        if (std::get<StringTag>(waterlogged_it->second) == "true") {
-                            blocks.push_back(get_water());
+                    }();
+                    auto properties_tag = get_tag<CompoundTagPtr>(*block_tag, "Properties", []() { return std::make_shared<CompoundTag>(); });
+                    std::map<std::string, Block::PropertyValue> block_properties;
+                    for (const auto& [k, v] : *properties_tag) {
+                        std::visit([&block_properties, &k](auto&& arg) {
+                            using T = std::decay_t<decltype(arg)>;
+                            if constexpr (
+                                std::is_same_v<T, Amulet::NBT::ByteTag> || std::is_same_v<T, Amulet::NBT::ShortTag> || std::is_same_v<T, Amulet::NBT::IntTag> || std::is_same_v<T, Amulet::NBT::LongTag> || std::is_same_v<T, Amulet::NBT::StringTag>) {
+                                block_properties.emplace(k, arg);
+                            }
+                        },
+                            v);
+                    }
+                    std::vector<Block> blocks;
+
+                    auto waterloggable = game_version.get_block_data()->is_waterloggable(block_namespace, block_base_name);
+                    if (waterloggable == Waterloggable::Yes) {
+                        auto waterlogged_it = block_properties.find("waterlogged");
+                        if (
+                            waterlogged_it != block_properties.end() and std::holds_alternative<StringTag>(waterlogged_it->second)) {
+                            if (std::get<StringTag>(waterlogged_it->second) == "true") {
+                                blocks.push_back(context.get_water_block());
+                            }
+                            block_properties.erase(waterlogged_it);
                         }
-                        block_properties.erase(waterlogged_it);
+                    } else if (waterloggable == Waterloggable::Always) {
+                        blocks.push_back(context.get_water_block());
                     }
-                } else if (waterloggable == Waterloggable::Always) {
-                    blocks.push_back(get_water());
+                    blocks.insert(
+                        blocks.begin(),
+                        Block(
+                            "java",
+                            version,
+                            block_namespace,
+                            block_base_name,
+                            block_properties));
+
+                    block_stack = std::make_shared<const BlockStack>(std::move(blocks));
+                    block_palette_cache.set(data_version, std::move(key), block_stack);
                 }
-                blocks.insert(
-                    blocks.begin(),
-                    Block(
-                        "java",
-                        version,
-                        block_namespace,
-                        block_base_name,
-                        block_properties));
-
-                lut.push_back(static_cast<std::uint32_t>(block_palette.block_stack_to_index(blocks)));
+                lut.push_back(static_cast<std::uint32_t>(block_palette.block_stack_to_index(*block_stack)));
+            }
+
+            section_counts.sections++;
+            // A section with one palette entry or no data is the first palette entry everywhere.
+            // The game does not read the data in this case so neither do we.
+            if (palette_size == 1 || data_tag->empty()) {
+                section_counts.uniform_sections++;
+                block_sections.set_section(
+                    cy,
+                    std::make_shared<IndexArray3D>(
+                        std::make_tuple<std::uint16_t>(16, 16, 16),
+                        lut.empty() ? 0 : lut[0]));
+                continue;
             }
 
             block_sections.set_section(
                 cy,
                 [&] {
-                    if (data_tag->empty()) {
-                        return std::make_shared<IndexArray3D>(
-                            std::make_tuple<std::uint16_t>(16, 16, 16),
-                            0);
-                    } else {
-                        std::vector<std::uint32_t> decoded_vector(4096);
-                        std::span<std::uint32_t> decoded_span(decoded_vector);
-                        Amulet::decode_long_array(
-                            std::span<std::uint64_t>(reinterpret_cast<std::uint64_t*>(data_tag->data()), data_tag->size()),
-                            decoded_span,
-                            std::max<std::uint8_t>(4, std::bit_width(palette_size - 1)),
-                            data_version <= 2529);
-                        auto index_array = std::make_shared<IndexArray3D>(
-                            std::make_tuple<std::uint16_t>(16, 16, 16));
-                        std::span<std::uint32_t> index_array_span(index_array->get_buffer(), index_array->get_size());
-                        // Convert YZX to XYZ and look up in lut.
-                        for (size_t y = 0; y < 16; y++) {
-                            for (size_t x = 0; x < 16; x++) {
-                                for (size_t z = 0; z < 16; z++) {
-                                    auto& block_index = decoded_span[y * 256 + z * 16 + x];
-                                    if (palette_size <= block_index) {
-                                        throw std::runtime_error(
-                                            "Block index at cx=" + std::to_string(cx) + ",cy=" + std::to_string(cy) + ",cz=" + std::to_string(cx) + ",dx=" + std::to_string(x) + ",dy=" + std::to_string(y) + ",dz=" + std::to_string(z) + " is larger than the block palette size.");
-                                    }
-                                    index_array_span[x * 256 + y * 16 + z] = lut[block_index];
-                                }
-                            }
+                    std::vector<std::uint32_t> decoded_vector(4096);
+                    std::span<std::uint32_t> decoded_span(decoded_vector);
+                    std::uint8_t bits_per_entry = std::max<std::uint8_t>(4, std::bit_width(palette_size - 1));
+                    Amulet::decode_long_array(
+                        std::span<std::uint64_t>(reinterpret_cast<std::uint64_t*>(data_tag->data()), data_tag->size()),
+                        decoded_span,
+                        bits_per_entry,
+                        data_version <= 2529);
+                    // Values can only be out of range if the palette does not fill every value the entries can store.
+                    if (std::bit_width(palette_size) <= bits_per_entry) {
+                        size_t invalid_index = detail::find_index_out_of_range(decoded_span, palette_size);
+                        if (invalid_index != decoded_span.size()) {
+                            size_t y = invalid_index / 256;
+                            size_t z = invalid_index / 16 % 16;
+                            size_t x = invalid_index % 16;
+                            throw std::runtime_error(
+                                "Block index at cx=" + std::to_string(cx) + ",cy=" + std::to_string(cy) + ",cz=" + std::to_string(cx) + ",dx=" + std::to_string(x) + ",dy=" + std::to_string(y) + ",dz=" + std::to_string(z) + " is larger than the block palette size.");
                         }
-                        return index_array;
                     }
+                    auto index_array = std::make_shared<IndexArray3D>(
+                        std::make_tuple<std::uint16_t>(16, 16, 16));
+                    // Convert YZX to XYZ and look up in lut.
+                    detail::remap_yzx_to_xyz(decoded_vector.data(), index_array->get_buffer(), lut.data());
+                    return index_array;
                 }());
         }
     } else {
@@ -416,6 +496,32 @@ static Biome _get_default_biome(
     }
 }
 
+std::shared_ptr<const JavaDecodeContext> JavaRawDimension::get_decode_context(std::int64_t data_version)
+{
+    {
+        std::shared_lock lock(_decode_contexts_mutex);
+        auto it = _decode_contexts.find(data_version);
+        if (it != _decode_contexts.end()) {
+            return it->second;
+        }
+    }
+    // Build the context without holding the lock because the translations are slow.
+    VersionNumber version(std::initializer_list<std::int64_t> { data_version });
+    auto version_range = std::make_shared<VersionRange>("java", version, version);
+    auto default_block = _get_default_block(*this, *version_range);
+    auto default_biome = _get_default_biome(*this, *version_range);
+    auto context = std::make_shared<const JavaDecodeContext>(
+        data_version,
+        version,
+        version_range,
+        get_java_game_version(version),
+        default_block,
+        default_biome);
+    std::lock_guard lock(_decode_contexts_mutex);
+    // If another thread built the context first use that one.
+    return _decode_contexts.emplace(data_version, std::move(context)).first->second;
+}
+
 std::unique_ptr<JavaChunk> JavaRawDimension::decode_chunk(
     const JavaRawChunk& raw_chunk,
     std::int64_t cx,
@@ -429,43 +535,26 @@ std::unique_ptr<JavaChunk> JavaRawDimension::decode_chunk(
         "DataVersion",
         []() { return IntTag(-1); }).value;
 
-    VersionNumber version(std::initializer_list<std::int64_t> { data_version });
-    auto version_range = std::make_shared<VersionRange>("java", version, version);
-    auto default_block = _get_default_block(*this, *version_range);
-    auto default_biome = _get_default_biome(*this, *version_range);
-    std::shared_ptr<JavaGameVersion> game_version = get_java_game_version(version);
-
-    std::optional<Block> _water_block;
-    auto get_water = [&version, &_water_block]() -> const Block& {
-        if (!_water_block) {
-            auto converted = get_java_game_version(VersionNumber({ 3837 }))->get_block_data()->translate("java", version, Block("java", VersionNumber({ 3837 }), "minecraft", "water", std::initializer_list<Block::PropertyMap::value_type> { { "level", StringTag("0") } }));
-            std::visit(
-                [&version, &_water_block](auto&& arg) {
-                    using T = std::decay_t<decltype(arg)>;
-                    if constexpr (std::is_same_v<T, std::tuple<Block, std::optional<BlockEntity>, bool>>) {
-                        _water_block = std::get<0>(arg);
-                    } else {
-                        throw std::runtime_error("Water block did not convert to a block in version Java " + version.toString());
-                    }
-                },
-                converted);
-        }
-        return *_water_block;
-    };
+    auto context = get_decode_context(data_version);
 
+    SectionDecodeCounts section_counts;
+    std::unique_ptr<JavaChunk> chunk;
     if (data_version >= 2844) {
-        return _decode_java_chunk<2844>(*game_version, raw_chunk, *region, cx, cz, version, data_version, default_block, default_biome, get_water);
+        chunk = _decode_java_chunk<2844>(*context, raw_chunk, *region, cx, cz, get_block_palette_cache(), section_counts);
     } else if (data_version >= 2203) {
-        return _decode_java_chunk<2203>(*game_version, raw_chunk, *region, cx, cz, version, data_version, default_block, default_biome, get_water);
+        chunk = _decode_java_chunk<2203>(*context, raw_chunk, *region, cx, cz, get_block_palette_cache(), section_counts);
     } else if (data_version >= 1466) {
-        return _decode_java_chunk<1466>(*game_version, raw_chunk, *region, cx, cz, version, data_version, default_block, default_biome, get_water);
+        chunk = _decode_java_chunk<1466>(*context, raw_chunk, *region, cx, cz, get_block_palette_cache(), section_counts);
     } else if (data_version >= 1444) {
-        return _decode_java_chunk<1444>(*game_version, raw_chunk, *region, cx, cz, version, data_version, default_block, default_biome, get_water);
+        chunk = _decode_java_chunk<1444>(*context, raw_chunk, *region, cx, cz, get_block_palette_cache(), section_counts);
     } else if (data_version >= 0) {
-        return _decode_java_chunk<0>(*game_version, raw_chunk, *region, cx, cz, version, data_version, default_block, default_biome, get_water);
+        chunk = _decode_java_chunk<0>(*context, raw_chunk, *region, cx, cz, get_block_palette_cache(), section_counts);
     } else {
-        return _decode_java_chunk<-1>(*game_version, raw_chunk, *region, cx, cz, version, data_version, default_block, default_biome, get_water);
+        chunk = _decode_java_chunk<-1>(*context, raw_chunk, *region, cx, cz, get_block_palette_cache(), section_counts);
     }
+    _decoded_section_count += section_counts.sections;
+    _uniform_section_count += section_counts.uniform_sections;
+    return chunk;
 }
 
 } // namespace Amulet
@@ -14,12 +14,14 @@ JavaChunkHandle::JavaChunkHandle(
     std::shared_ptr<JavaRawDimension> raw_dimension,
     std::shared_ptr<HistoryManagerLayer<detail::ChunkKey>> chunk_history,
     std::shared_ptr<HistoryManagerLayer<std::string>> chunk_data_history,
-    std::shared_ptr<bool> history_enabled)
+    std::shared_ptr<bool> history_enabled,
+    std::shared_ptr<bool> passthrough_enabled)
     : ChunkHandle(dimension_id, cx, cz)
     , _raw_dimension(std::move(raw_dimension))
     , _chunk_history(std::move(chunk_history))
     , _chunk_data_history(std::move(chunk_data_history))
     , _history_enabled(std::move(history_enabled))
+    , _passthrough_enabled(std::move(passthrough_enabled))
 {
 }
 
@@ -27,6 +29,7 @@ bool JavaChunkHandle::exists()
 {
     {
         std::shared_lock history_lock(_chunk_history->get_mutex());
+        std::shared_lock lock(_mutex);
         if (_chunk_history->has_resource(_key)) {
             return !_chunk_history->get_value(_key).empty();
         }
@@ -52,15 +55,22 @@ std::unique_ptr<JavaChunk> JavaChunkHandle::_get_null_chunk()
     }
 }
 
-void JavaChunkHandle::_preload()
+void JavaChunkHandle::_emit_changes()
 {
+    _chunk_history->emit_changes();
+    _chunk_data_history->emit_changes();
+}
+
+std::pair<std::string, std::vector<std::pair<std::string, std::string>>> JavaChunkHandle::_load()
+{
+    std::vector<std::pair<std::string, std::string>> component_values;
+
     // Get the chunk data.
     JavaRawChunk raw_chunk;
     try {
         raw_chunk = _raw_dimension->get_raw_chunk(_cx, _cz);
     } catch (const ChunkDoesNotExist&) {
-        _chunk_history->set_initial_value(_key, "");
-        return;
+        return std::make_pair(std::string(), std::move(component_values));
     }
 
     // Decode the chunk.
@@ -68,18 +78,25 @@ void JavaChunkHandle::_preload()
     try {
         chunk = _raw_dimension->decode_chunk(raw_chunk, _cx, _cz);
     } catch (const ChunkLoadError& e) {
-        _chunk_history->set_initial_value(_key, 'e' + std::string(e.what()));
-        return;
+        return std::make_pair('e' + std::string(e.what()), std::move(component_values));
     }
 
-    // Save the chunk.
-    _chunk_history->set_initial_value(_key, 'c' + detail::get_java_chunk_id(*chunk));
+    // Serialise the chunk.
     for (const auto& [component_id, component_data] : chunk->serialise_chunk()) {
         if (!component_data) {
             throw std::runtime_error("Component " + component_id + " cannot be undefined when initialising chunk");
         }
-        _chunk_data_history->set_initial_value(std::string(_key) + '/' + component_id, *component_data);
+        component_values.emplace_back(std::string(_key) + '/' + component_id, *component_data);
     }
+    return std::make_pair('c' + detail::get_java_chunk_id(*chunk), std::move(component_values));
+}
+
+void JavaChunkHandle::_preload()
+{
+    auto [chunk_value, component_values] = _load();
+    // Save the chunk.
+    _chunk_history->set_initial_value(_key, chunk_value);
+    _chunk_data_history->set_initial_values(component_values);
 }
 
 std::unique_ptr<JavaChunk> JavaChunkHandle::get_java_chunk(std::optional<std::set<std::string>> component_ids)
@@ -101,11 +118,16 @@ std::unique_ptr<JavaChunk> JavaChunkHandle::get_java_chunk(std::optional<std::se
         }
 
         // Load all the requested component ids.
+        std::vector<std::string> component_keys;
+        component_keys.reserve(valid_components.size());
+        for (const auto& component_id : valid_components) {
+            component_keys.push_back(std::string(_key) + '/' + component_id);
+        }
+        auto values = _chunk_data_history->get_values(component_keys);
         SerialisedChunkComponents component_data;
+        auto value_it = values.begin();
         for (const auto& component_id : valid_components) {
-            component_data.emplace(
-                component_id,
-                _chunk_data_history->get_value(std::string(_key) + '/' + component_id));
+            component_data.emplace(component_id, std::move(*value_it++));
         }
 
         chunk->reconstruct_chunk(component_data);
@@ -113,21 +135,43 @@ std::unique_ptr<JavaChunk> JavaChunkHandle::get_java_chunk(std::optional<std::se
     };
 
     {
-        std::shared_lock lock(_chunk_history->get_mutex());
+        std::shared_lock history_lock(_chunk_history->get_mutex());
+        std::shared_lock lock(_mutex);
         if (_chunk_history->has_resource(_key)) {
             // Get the chunk if it has previously been populated.
             return get_chunk();
         }
+        if (*_passthrough_enabled) {
+            // Decode the chunk without populating the history.
+            // The shared lock stops the chunk being modified until this is finished.
+            auto raw_chunk = _raw_dimension->get_raw_chunk(_cx, _cz);
+            auto chunk = _raw_dimension->decode_chunk(raw_chunk, _cx, _cz);
+            if (!component_ids) {
+                return chunk;
+            }
+            // Only load the requested components like the history path does.
+            SerialisedChunkComponents component_data;
+            for (auto& [component_id, data] : chunk->serialise_chunk()) {
+                if (component_ids->contains(component_id)) {
+                    component_data.emplace(component_id, std::move(data));
+                }
+            }
+            auto partial_chunk = detail::get_java_null_chunk(detail::get_java_chunk_id(*chunk));
+            partial_chunk->reconstruct_chunk(std::move(component_data));
+            return partial_chunk;
+        }
     }
     {
-        std::lock_guard lock(_chunk_history->get_mutex());
+        std::shared_lock history_lock(_chunk_history->get_mutex());
+        std::lock_guard lock(_mutex);
         // Load the chunk if it wasn't previously populated.
         if (!_chunk_history->has_resource(_key)) {
             _preload();
         }
     }
     {
-        std::shared_lock lock(_chunk_history->get_mutex());
+        std::shared_lock history_lock(_chunk_history->get_mutex());
+        std::shared_lock lock(_mutex);
         // Get the chunk.
         return get_chunk();
     }
@@ -176,26 +220,32 @@ void JavaChunkHandle::set_java_chunk(const JavaChunk& chunk)
         }
     };
 
-    // Lock the history state
-    std::lock_guard lock(_chunk_history->get_mutex());
+    {
+        // Lock the history state
+        std::shared_lock history_lock(_chunk_history->get_mutex());
+        std::lock_guard lock(_mutex);
 
-    if (_chunk_history->has_resource(_key)) {
-        set_new_chunk();
-    } else if (*_history_enabled) {
-        _preload();
-        set_new_chunk();
-    } else {
-        // Resource does not exist and history is disabled
-        
-        // Copy components. Error if any component is undefined.
-        get_defined_components.operator()<true>();
+        if (_chunk_history->has_resource(_key)) {
+            set_new_chunk();
+        } else if (*_history_enabled) {
+            _preload();
+            set_new_chunk();
+        } else {
+            // Resource does not exist and history is disabled
 
-        // Set new state. If the resource isn't initialised use this value.
-        _chunk_history->set_value<HistoryInitialisationMode::Value>(_key, new_chunk_id);
-        if (!defined_component_data.empty()) {
-            _chunk_data_history->set_values<HistoryInitialisationMode::Value>(defined_component_data);
+            // Copy components. Error if any component is undefined.
+            get_defined_components.operator()<true>();
+
+            // Set new state. If the resource isn't initialised use this value.
+            _chunk_history->set_value<HistoryInitialisationMode::Value>(_key, new_chunk_id);
+            if (!defined_component_data.empty()) {
+                _chunk_data_history->set_values<HistoryInitialisationMode::Value>(defined_component_data);
+            }
         }
     }
+
+    // Notify listeners after the lock is released.
+    _emit_changes();
 }
 
 void JavaChunkHandle::set_chunk(const Chunk& chunk)
@@ -209,19 +259,25 @@ void JavaChunkHandle::set_chunk(const Chunk& chunk)
 
 void JavaChunkHandle::delete_chunk()
 {
-    std::lock_guard lock(_chunk_history->get_mutex());
+    {
+        std::shared_lock history_lock(_chunk_history->get_mutex());
+        std::lock_guard lock(_mutex);
 
-    // Set initial state.
-    if (*_history_enabled) {
-        if (!_chunk_history->has_resource(_key)) {
-            _preload();
+        // Set initial state.
+        if (*_history_enabled) {
+            if (!_chunk_history->has_resource(_key)) {
+                _preload();
+            }
+        } else if (!_chunk_history->has_resource(_key)) {
+            _chunk_history->set_initial_value(_key, "");
         }
-    } else if (!_chunk_history->has_resource(_key)) {
-        _chunk_history->set_initial_value(_key, "");
+
+        // Delete
+        _chunk_history->set_value(_key, "");
     }
 
-    // Delete
-    _chunk_history->set_value(_key, "");
+    // Notify listeners after the lock is released.
+    _emit_changes();
 }
 
 } // namespace Amulet
@@ -1,6 +1,10 @@
 #pragma once
 
 #include <memory>
+#include <shared_mutex>
+#include <string>
+#include <utility>
+#include <vector>
 
 #include <amulet/level/dll.hpp>
 
@@ -20,6 +24,12 @@ private:
     std::shared_ptr<HistoryManagerLayer<std::string>> _chunk_data_history;
 
     std::shared_ptr<bool> _history_enabled;
+    std::shared_ptr<bool> _passthrough_enabled;
+
+    // Lock for the history resources of this chunk.
+    // The history lock is only held in shared mode to read and write chunks
+    // so this stops two threads changing the same chunk at once.
+    std::shared_mutex _mutex;
 
     JavaChunkHandle(
         const DimensionId& dimension_id,
@@ -28,23 +38,35 @@ private:
         std::shared_ptr<JavaRawDimension> raw_dimension,
         std::shared_ptr<HistoryManagerLayer<detail::ChunkKey>> chunk_history,
         std::shared_ptr<HistoryManagerLayer<std::string>> chunk_data_history,
-        std::shared_ptr<bool> history_enabled);
+        std::shared_ptr<bool> history_enabled,
+        std::shared_ptr<bool> passthrough_enabled);
 
     friend class JavaDimension;
 
     // Get the chunk instance will all components in their null state.
-    // Requires _chunk_history shared lock.
+    // Requires _chunk_history shared lock and _mutex shared lock.
     std::unique_ptr<JavaChunk> _get_null_chunk();
 
+    // Load the chunk from the raw level and serialise it into the values stored in the history.
+    // Returns the value of the chunk resource and the values of the component resources.
+    // No locks required.
+    std::pair<std::string, std::vector<std::pair<std::string, std::string>>> _load();
+
     // Load the chunk from the raw level.
-    // Requires _chunk_history unique lock.
+    // Requires _chunk_history shared lock and _mutex unique lock.
     void _preload();
 
+    // Emit the changes made to the history layers.
+    // The locks must not be held.
+    void _emit_changes();
+
 public:
     // Does the chunk exist. This is a quick way to check if the chunk exists without loading it.
     AMULET_LEVEL_EXPORT bool exists() override;
 
     // Get a unique copy of the chunk data.
+    // If passthrough is enabled and the chunk has not been modified,
+    // the chunk is decoded from the raw level with all components.
     AMULET_LEVEL_EXPORT std::unique_ptr<JavaChunk> get_java_chunk(std::optional<std::set<std::string>> component_ids = std::nullopt);
 
     // Get a unique copy of the chunk data.
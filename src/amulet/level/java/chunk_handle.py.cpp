@@ -5,6 +5,8 @@
 
 #include <amulet/pybind11_extensions/collections.hpp>
 
+#include <amulet/level/abc/future.py.hpp>
+
 #include "chunk_handle.hpp"
 
 namespace py = pybind11;
@@ -31,6 +33,29 @@ py::module init_java_chunk_handle(py::module m_parent)
         py::is_method(JavaChunkHandle),
         py::arg("component_ids") = py::none(),
         py::doc("Get a unique copy of the chunk data."));
+    JavaChunkHandle.def(
+        "get_chunk_async",
+        [](std::shared_ptr<Amulet::JavaChunkHandle> self, std::optional<Amulet::pybind11_extensions::collections::Iterable<std::string>> py_component_ids) {
+            std::optional<std::set<std::string>> component_ids;
+            if (py_component_ids) {
+                component_ids = std::set<std::string>(py_component_ids->begin(), py_component_ids->end());
+            }
+            return Amulet::run_async(
+                [self = std::move(self), component_ids = std::move(component_ids)](Amulet::AbstractCancelManager&) {
+                    return self->get_java_chunk(component_ids);
+                },
+                [](std::unique_ptr<Amulet::JavaChunk> chunk) {
+                    return py::cast(std::shared_ptr<Amulet::JavaChunk>(std::move(chunk)));
+                });
+        },
+        py::arg("component_ids") = py::none(),
+        py::doc(
+            "Get a unique copy of the chunk data without blocking the asyncio event loop.\n"
+            "The chunk is loaded on a shared worker pool.\n"
+            "If the awaiting task is cancelled before the chunk is loaded the load is skipped.\n"
+            "Must be called from a running asyncio event loop.\n"
+            "\n"
+            ">>> chunk = await chunk_handle.get_chunk_async()"));
     JavaChunkHandle.def(
         "set_chunk",
         &Amulet::JavaChunkHandle::set_java_chunk,
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import collections.abc
 import typing
 
@@ -17,6 +18,18 @@ class JavaChunkHandle(amulet.level.abc.chunk_handle.ChunkHandle):
         Get a unique copy of the chunk data.
         """
 
+    def get_chunk_async(
+        self, component_ids: collections.abc.Iterable[str] | None = None
+    ) -> asyncio.Future[amulet.level.java.chunk.JavaChunk]:
+        """
+        Get a unique copy of the chunk data without blocking the asyncio event loop.
+        The chunk is loaded on a shared worker pool.
+        If the awaiting task is cancelled before the chunk is loaded the load is skipped.
+        Must be called from a running asyncio event loop.
+
+        >>> chunk = await chunk_handle.get_chunk_async()
+        """
+
     @typing.overload
     def set_chunk(self, chunk: amulet.level.java.chunk.JavaChunk) -> None:
         """
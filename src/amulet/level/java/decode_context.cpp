@@ -0,0 +1,82 @@
+#include <stdexcept>
+#include <tuple>
+#include <type_traits>
+#include <utility>
+#include <variant>
+
+#include <amulet/nbt/tag/string.hpp>
+
+#include <amulet/core/block_entity/block_entity.hpp>
+
+#include <amulet/game/game.hpp>
+
+#include "decode_context.hpp"
+
+namespace Amulet {
+
+JavaDecodeContext::JavaDecodeContext(
+    std::int64_t data_version,
+    const VersionNumber& version,
+    std::shared_ptr<VersionRange> version_range,
+    std::shared_ptr<game::JavaGameVersion> game_version,
+    const BlockStack& default_block,
+    const Biome& default_biome)
+    : _data_version(data_version)
+    , _version(version)
+    , _version_range(std::move(version_range))
+    , _game_version(std::move(game_version))
+    , _default_block(default_block)
+    , _default_biome(default_biome)
+{
+}
+
+std::int64_t JavaDecodeContext::get_data_version() const
+{
+    return _data_version;
+}
+
+const VersionNumber& JavaDecodeContext::get_version() const
+{
+    return _version;
+}
+
+const std::shared_ptr<VersionRange>& JavaDecodeContext::get_version_range() const
+{
+    return _version_range;
+}
+
+game::JavaGameVersion& JavaDecodeContext::get_game_version() const
+{
+    return *_game_version;
+}
+
+const BlockStack& JavaDecodeContext::get_default_block() const
+{
+    return _default_block;
+}
+
+const Biome& JavaDecodeContext::get_default_biome() const
+{
+    return _default_biome;
+}
+
+const Block& JavaDecodeContext::get_water_block() const
+{
+    // If the translation throws the flag is not set and the next call tries again.
+    std::call_once(_water_block_flag, [this] {
+        auto converted = game::get_java_game_version(VersionNumber({ 3837 }))->get_block_data()->translate("java", _version, Block("java", VersionNumber({ 3837 }), "minecraft", "water", std::initializer_list<Block::PropertyMap::value_type> { { "level", NBT::StringTag("0") } }));
+        std::visit(
+            [this](auto&& arg) {
+                using T = std::decay_t<decltype(arg)>;
+                if constexpr (std::is_same_v<T, std::tuple<Block, std::optional<BlockEntity>, bool>>) {
+                    _water_block = std::get<0>(arg);
+                } else {
+                    throw std::runtime_error("Water block did not convert to a block in version Java " + _version.toString());
+                }
+            },
+            converted);
+    });
+    return *_water_block;
+}
+
+} // namespace Amulet
@@ -0,0 +1,75 @@
+#pragma once
+
+#include <cstdint>
+#include <memory>
+#include <mutex>
+#include <optional>
+
+#include <amulet/core/biome/biome.hpp>
+#include <amulet/core/block/block.hpp>
+#include <amulet/core/version/version.hpp>
+
+#include <amulet/game/java/version.hpp>
+
+#include <amulet/level/dll.hpp>
+
+namespace Amulet {
+
+// The values chunk decoding needs that depend only on the data version.
+// Built once for each data version and shared between threads.
+class JavaDecodeContext {
+private:
+    std::int64_t _data_version;
+    VersionNumber _version;
+    std::shared_ptr<VersionRange> _version_range;
+    std::shared_ptr<game::JavaGameVersion> _game_version;
+    BlockStack _default_block;
+    Biome _default_biome;
+
+    // The water block is only needed for waterloggable blocks so it is translated on first use.
+    mutable std::once_flag _water_block_flag;
+    mutable std::optional<Block> _water_block;
+
+public:
+    AMULET_LEVEL_EXPORT JavaDecodeContext(
+        std::int64_t data_version,
+        const VersionNumber& version,
+        std::shared_ptr<VersionRange> version_range,
+        std::shared_ptr<game::JavaGameVersion> game_version,
+        const BlockStack& default_block,
+        const Biome& default_biome);
+
+    JavaDecodeContext(const JavaDecodeContext&) = delete;
+    JavaDecodeContext& operator=(const JavaDecodeContext&) = delete;
+
+    // The data version this context was built for.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT std::int64_t get_data_version() const;
+
+    // The version number for the data version.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT const VersionNumber& get_version() const;
+
+    // A version range containing only the data version.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT const std::shared_ptr<VersionRange>& get_version_range() const;
+
+    // The game version for the data version.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT game::JavaGameVersion& get_game_version() const;
+
+    // The dimension default block translated to the data version.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT const BlockStack& get_default_block() const;
+
+    // The dimension default biome translated to the data version.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT const Biome& get_default_biome() const;
+
+    // The water block in the data version.
+    // Translated on the first call.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT const Block& get_water_block() const;
+};
+
+} // namespace Amulet
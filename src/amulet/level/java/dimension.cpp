@@ -1,21 +1,65 @@
+#include <algorithm>
+#include <atomic>
+#include <exception>
+#include <iterator>
+#include <mutex>
+#include <set>
+#include <thread>
+#include <tuple>
+
 #include "dimension.hpp"
 #include "chunk_handle.hpp"
 
+// Chunk component data is large and edits usually only change a small part of it.
+// Store a full copy every few revisions and deltas in between.
+static const size_t ChunkDataKeyframeInterval = 8;
+
+// The number of chunks written to the history in one batch when preloading.
+static const size_t PreloadBatchSize = 64;
+
+// Get the position of the chunk in the region file order.
+// Chunks are sorted by region and then in the order they are stored in the region file.
+static std::tuple<std::int64_t, std::int64_t, std::int64_t, std::int64_t> get_region_order(const std::pair<std::int64_t, std::int64_t>& chunk_coord)
+{
+    const auto& [cx, cz] = chunk_coord;
+    return std::make_tuple(cx >> 5, cz >> 5, cz, cx);
+}
+
+// Sort the chunks into region file order and remove duplicates.
+static void sort_region_order(std::vector<std::pair<std::int64_t, std::int64_t>>& chunk_coords)
+{
+    std::sort(chunk_coords.begin(), chunk_coords.end(), [](const auto& a, const auto& b) {
+        return get_region_order(a) < get_region_order(b);
+    });
+    chunk_coords.erase(std::unique(chunk_coords.begin(), chunk_coords.end()), chunk_coords.end());
+}
+
 namespace Amulet {
 
 JavaDimension::JavaDimension(
     std::shared_ptr<JavaRawDimension> raw_dimension,
     HistoryManager& history_manager,
-    std::shared_ptr<bool> history_enabled)
+    std::shared_ptr<bool> history_enabled,
+    std::shared_ptr<bool> passthrough_enabled)
     : _raw_dimension(std::move(raw_dimension))
     , _chunk_history(history_manager.new_layer<detail::ChunkKey>())
-    , _chunk_data_history(history_manager.new_layer<std::string>())
+    , _chunk_data_history(history_manager.new_layer<std::string>(ChunkDataKeyframeInterval))
     , _history_enabled(std::move(history_enabled))
+    , _passthrough_enabled(std::move(passthrough_enabled))
 {
+    _chunk_history_token = _chunk_history->resources_changed.connect([this](std::vector<detail::ChunkKey> chunk_keys) {
+        std::vector<std::pair<std::int64_t, std::int64_t>> chunk_coords;
+        chunk_coords.reserve(chunk_keys.size());
+        for (const auto& chunk_key : chunk_keys) {
+            chunk_coords.emplace_back(chunk_key.get_cx(), chunk_key.get_cz());
+        }
+        chunks_changed.emit(std::move(chunk_coords));
+    });
 }
 
 JavaDimension::~JavaDimension()
 {
+    _chunk_history->resources_changed.disconnect(_chunk_history_token);
 }
 
 const DimensionId& JavaDimension::get_dimension_id() const
@@ -63,7 +107,8 @@ std::shared_ptr<JavaChunkHandle> JavaDimension::get_java_chunk_handle(std::int64
                     _raw_dimension,
                     _chunk_history,
                     _chunk_data_history,
-                    _history_enabled));
+                    _history_enabled,
+                    _passthrough_enabled));
             _chunk_handles.emplace(key, chunk_handle);
             return chunk_handle;
         } else {
@@ -77,7 +122,8 @@ std::shared_ptr<JavaChunkHandle> JavaDimension::get_java_chunk_handle(std::int64
                         _raw_dimension,
                         _chunk_history,
                         _chunk_data_history,
-                        _history_enabled));
+                        _history_enabled,
+                        _passthrough_enabled));
                 it->second = chunk_handle;
             }
             return chunk_handle;
@@ -90,4 +136,265 @@ std::shared_ptr<ChunkHandle> JavaDimension::get_chunk_handle(std::int64_t cx, st
     return get_java_chunk_handle(cx, cz);
 }
 
+std::vector<std::pair<std::int64_t, std::int64_t>> JavaDimension::get_chunk_coords(const SelectionBox& selection)
+{
+    std::vector<std::pair<std::int64_t, std::int64_t>> chunk_coords;
+    if (selection.max_x() <= selection.min_x() || selection.max_z() <= selection.min_z()) {
+        return chunk_coords;
+    }
+    // Shifting negative numbers rounds down.
+    auto min_cx = selection.min_x() >> 4;
+    auto min_cz = selection.min_z() >> 4;
+    auto max_cx = (selection.max_x() - 1) >> 4;
+    auto max_cz = (selection.max_z() - 1) >> 4;
+    for (auto cx = min_cx; cx <= max_cx; cx++) {
+        for (auto cz = min_cz; cz <= max_cz; cz++) {
+            chunk_coords.emplace_back(cx, cz);
+        }
+    }
+    return chunk_coords;
+}
+
+std::vector<std::pair<std::int64_t, std::int64_t>> JavaDimension::get_chunk_coords(const SelectionGroup& selection)
+{
+    std::set<std::pair<std::int64_t, std::int64_t>> chunk_coords;
+    for (const auto& box : selection) {
+        for (const auto& chunk_coord : get_chunk_coords(box)) {
+            chunk_coords.insert(chunk_coord);
+        }
+    }
+    return std::vector<std::pair<std::int64_t, std::int64_t>>(chunk_coords.begin(), chunk_coords.end());
+}
+
+bool JavaDimension::_preload_batch(
+    const std::vector<std::pair<std::int64_t, std::int64_t>>& chunk_coords,
+    AbstractCancelManager& cancel_manager)
+{
+    // Find the chunks that have not been loaded.
+    std::vector<std::shared_ptr<JavaChunkHandle>> chunk_handles;
+    {
+        std::shared_lock history_lock(_chunk_history->get_mutex());
+        for (const auto& [cx, cz] : chunk_coords) {
+            auto chunk_handle = get_java_chunk_handle(cx, cz);
+            std::shared_lock lock(chunk_handle->_mutex);
+            if (!_chunk_history->has_resource(chunk_handle->_key)) {
+                chunk_handles.push_back(std::move(chunk_handle));
+            }
+        }
+    }
+
+    // Read and decode the chunks.
+    // This is the slow part and does not need the history locks.
+    std::vector<std::pair<std::string, std::vector<std::pair<std::string, std::string>>>> values;
+    values.reserve(chunk_handles.size());
+    for (const auto& chunk_handle : chunk_handles) {
+        if (cancel_manager.is_cancel_requested()) {
+            return false;
+        }
+        values.push_back(chunk_handle->_load());
+    }
+
+    // Write the chunks to the history.
+    std::shared_lock history_lock(_chunk_history->get_mutex());
+    // The handles are locked in region order so that parallel calls cannot deadlock.
+    std::vector<std::unique_lock<std::shared_mutex>> locks;
+    locks.reserve(chunk_handles.size());
+    for (const auto& chunk_handle : chunk_handles) {
+        locks.emplace_back(chunk_handle->_mutex);
+    }
+    std::vector<std::pair<detail::ChunkKey, std::string>> chunk_values;
+    std::vector<std::pair<std::string, std::string>> component_values;
+    for (size_t i = 0; i < chunk_handles.size(); i++) {
+        const auto& chunk_key = chunk_handles[i]->_key;
+        // Skip chunks loaded by another thread since they were checked.
+        if (_chunk_history->has_resource(chunk_key)) {
+            continue;
+        }
+        auto& [chunk_value, chunk_component_values] = values[i];
+        chunk_values.emplace_back(chunk_key, std::move(chunk_value));
+        std::move(chunk_component_values.begin(), chunk_component_values.end(), std::back_inserter(component_values));
+    }
+    _chunk_history->set_initial_values(chunk_values);
+    _chunk_data_history->set_initial_values(component_values);
+    return true;
+}
+
+void JavaDimension::preload_chunks(
+    const std::vector<std::pair<std::int64_t, std::int64_t>>& chunk_coords,
+    size_t worker_count,
+    AbstractCancelManager& cancel_manager,
+    AbstractProgressManager& progress_manager)
+{
+    // Sort the chunks so that each region file is read in order.
+    auto sorted_coords = chunk_coords;
+    sort_region_order(sorted_coords);
+
+    // Split the chunks into batches that do not cross region files.
+    std::vector<std::vector<std::pair<std::int64_t, std::int64_t>>> batches;
+    for (const auto& chunk_coord : sorted_coords) {
+        if (
+            batches.empty()
+            || batches.back().size() == PreloadBatchSize
+            || (batches.back().back().first >> 5) != (chunk_coord.first >> 5)
+            || (batches.back().back().second >> 5) != (chunk_coord.second >> 5)) {
+            batches.emplace_back();
+        }
+        batches.back().push_back(chunk_coord);
+    }
+    if (batches.empty()) {
+        progress_manager.update_progress(1.0f);
+        return;
+    }
+
+    if (worker_count == 0) {
+        worker_count = std::max<size_t>(1, std::thread::hardware_concurrency());
+    }
+    worker_count = std::min(worker_count, batches.size());
+
+    std::atomic<size_t> next_batch = 0;
+    std::atomic<size_t> loaded_count = 0;
+    std::atomic<bool> cancelled = false;
+    // Mutex to lock error and serialise progress updates.
+    std::mutex mutex;
+    std::exception_ptr error;
+    auto worker = [&] {
+        try {
+            while (true) {
+                auto batch_index = next_batch++;
+                if (batches.size() <= batch_index) {
+                    return;
+                }
+                const auto& batch = batches[batch_index];
+                if (cancel_manager.is_cancel_requested() || !_preload_batch(batch, cancel_manager)) {
+                    cancelled = true;
+                    next_batch = batches.size();
+                    return;
+                }
+                auto count = loaded_count += batch.size();
+                std::lock_guard lock(mutex);
+                progress_manager.update_progress(static_cast<float>(count) / sorted_coords.size());
+            }
+        } catch (...) {
+            std::lock_guard lock(mutex);
+            if (!error) {
+                error = std::current_exception();
+            }
+            // Stop the other workers.
+            next_batch = batches.size();
+        }
+    };
+
+    std::vector<std::thread> threads;
+    for (size_t i = 1; i < worker_count; i++) {
+        threads.emplace_back(worker);
+    }
+    // Use this thread as one of the workers.
+    worker();
+    for (auto& thread : threads) {
+        thread.join();
+    }
+
+    if (error) {
+        std::rethrow_exception(error);
+    }
+    if (cancelled) {
+        throw TaskCancelled();
+    }
+}
+
+void JavaDimension::preload_chunks(
+    const std::vector<std::pair<std::int64_t, std::int64_t>>& chunk_coords,
+    size_t worker_count)
+{
+    VoidCancelManager cancel_manager;
+    VoidProgressManager progress_manager;
+    preload_chunks(chunk_coords, worker_count, cancel_manager, progress_manager);
+}
+
+JavaChunkIterator::JavaChunkIterator(
+    std::shared_ptr<JavaDimension> dimension,
+    std::vector<std::pair<std::int64_t, std::int64_t>> chunk_coords,
+    size_t prefetch,
+    std::optional<std::set<std::string>> component_ids)
+    : _dimension(std::move(dimension))
+    , _chunk_coords(std::move(chunk_coords))
+    , _component_ids(std::move(component_ids))
+    , _prefetch(std::max<size_t>(1, prefetch))
+{
+    sort_region_order(_chunk_coords);
+    _slots.resize(_chunk_coords.size());
+    auto thread_count = std::min<size_t>(
+        {
+            _prefetch,
+            std::max<size_t>(1, std::thread::hardware_concurrency()),
+            _chunk_coords.size(),
+        });
+    for (size_t i = 0; i < thread_count; i++) {
+        _threads.emplace_back(&JavaChunkIterator::_worker, this);
+    }
+}
+
+JavaChunkIterator::~JavaChunkIterator()
+{
+    {
+        std::lock_guard lock(_mutex);
+        _stop = true;
+    }
+    _condition.notify_all();
+    for (auto& thread : _threads) {
+        thread.join();
+    }
+}
+
+void JavaChunkIterator::_worker()
+{
+    std::unique_lock lock(_mutex);
+    while (true) {
+        // Wait until there is a chunk to load within the prefetch window.
+        _condition.wait(lock, [this] {
+            return _stop || _chunk_coords.size() <= _load_index || _load_index < _read_index + _prefetch;
+        });
+        if (_stop || _chunk_coords.size() <= _load_index) {
+            return;
+        }
+        auto index = _load_index++;
+        const auto& [cx, cz] = _chunk_coords[index];
+        lock.unlock();
+
+        Slot slot;
+        try {
+            slot.chunk = _dimension->get_java_chunk_handle(cx, cz)->get_java_chunk(_component_ids);
+        } catch (const ChunkDoesNotExist&) {
+            // Skip chunks that do not exist.
+        } catch (...) {
+            slot.error = std::current_exception();
+        }
+        slot.done = true;
+
+        lock.lock();
+        _slots[index] = std::move(slot);
+        _condition.notify_all();
+    }
+}
+
+std::optional<JavaChunkIterator::ValueT> JavaChunkIterator::next()
+{
+    std::unique_lock lock(_mutex);
+    while (_read_index < _chunk_coords.size()) {
+        _condition.wait(lock, [this] { return _slots[_read_index].done; });
+        auto index = _read_index++;
+        auto slot = std::move(_slots[index]);
+        // Let the workers load the next chunk.
+        _condition.notify_all();
+        if (slot.error) {
+            std::rethrow_exception(slot.error);
+        }
+        if (slot.chunk) {
+            const auto& [cx, cz] = _chunk_coords[index];
+            return ValueT(cx, cz, std::move(slot.chunk));
+        }
+    }
+    return std::nullopt;
+}
+
 } // namespace Amulet
@@ -1,8 +1,21 @@
 #pragma once
 
+#include <condition_variable>
+#include <exception>
 #include <memory>
+#include <mutex>
+#include <optional>
+#include <set>
 #include <shared_mutex>
+#include <string>
+#include <thread>
+#include <tuple>
+#include <utility>
 #include <variant>
+#include <vector>
+
+#include <amulet/utils/task_manager/cancel_manager.hpp>
+#include <amulet/utils/task_manager/progress_manager.hpp>
 
 #include <amulet/level/dll.hpp>
 #include <amulet/level/abc/chunk_handle.hpp>
@@ -25,15 +38,32 @@ private:
     std::shared_ptr<HistoryManagerLayer<std::string>> _chunk_data_history;
 
     std::shared_ptr<bool> _history_enabled;
+    std::shared_ptr<bool> _passthrough_enabled;
+
+    // The connection from the chunk history to chunks_changed.
+    Signal<std::vector<detail::ChunkKey>>::tokenT _chunk_history_token;
 
     JavaDimension(
         std::shared_ptr<JavaRawDimension> raw_dimension,
         HistoryManager& history_manager,
-        std::shared_ptr<bool> history_enabled);
+        std::shared_ptr<bool> history_enabled,
+        std::shared_ptr<bool> passthrough_enabled);
 
     friend class JavaLevel;
 
+    // Load a batch of chunks into the history system.
+    // The chunks are read and decoded without locks and written to the history in one batch.
+    // Returns false if cancelled.
+    // Thread safe.
+    bool _preload_batch(
+        const std::vector<std::pair<std::int64_t, std::int64_t>>& chunk_coords,
+        AbstractCancelManager& cancel_manager);
+
 public:
+    // Emitted with the coordinates of the chunks changed by undo, redo and chunk writes.
+    // Many changes are delivered in one event after the history lock has been released.
+    Signal<std::vector<std::pair<std::int64_t, std::int64_t>>> chunks_changed;
+
     // Destructor
     AMULET_LEVEL_EXPORT ~JavaDimension() override;
 
@@ -60,6 +90,93 @@ public:
     // Get a chunk handle for a specific chunk.
     // Thread safe.
     AMULET_LEVEL_EXPORT std::shared_ptr<ChunkHandle> get_chunk_handle(std::int64_t cx, std::int64_t cz) override;
+
+    // Get the coordinates of the chunks that intersect a selection.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT static std::vector<std::pair<std::int64_t, std::int64_t>> get_chunk_coords(const SelectionBox& selection);
+
+    // Get the coordinates of the chunks that intersect a selection.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT static std::vector<std::pair<std::int64_t, std::int64_t>> get_chunk_coords(const SelectionGroup& selection);
+
+    // Load chunks from the raw level into the history system.
+    // The chunks are grouped by region file and decoded on worker_count threads.
+    // The decoded chunks are written to the history in batches.
+    // Chunks that have already been loaded are skipped.
+    // If worker_count is zero the number of hardware threads is used.
+    // Throws TaskCancelled if cancelled. The chunks loaded before cancelling remain loaded.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT void preload_chunks(
+        const std::vector<std::pair<std::int64_t, std::int64_t>>& chunk_coords,
+        size_t worker_count,
+        AbstractCancelManager& cancel_manager,
+        AbstractProgressManager& progress_manager);
+
+    // Load chunks from the raw level into the history system.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT void preload_chunks(
+        const std::vector<std::pair<std::int64_t, std::int64_t>>& chunk_coords,
+        size_t worker_count = 0);
+};
+
+// Iterates over the chunks in a dimension in region file order.
+// The following chunks are decoded on background threads while the caller processes the current chunk.
+// Chunks that do not exist are skipped.
+// The level must remain open while iterating.
+class JavaChunkIterator {
+public:
+    using ValueT = std::tuple<std::int64_t, std::int64_t, std::unique_ptr<JavaChunk>>;
+
+private:
+    // The result of loading one chunk.
+    struct Slot {
+        bool done = false;
+        std::unique_ptr<JavaChunk> chunk;
+        std::exception_ptr error;
+    };
+
+    std::shared_ptr<JavaDimension> _dimension;
+    std::vector<std::pair<std::int64_t, std::int64_t>> _chunk_coords;
+    std::optional<std::set<std::string>> _component_ids;
+    size_t _prefetch;
+
+    // Mutex to lock the state below.
+    std::mutex _mutex;
+    std::condition_variable _condition;
+    std::vector<Slot> _slots;
+    // The index of the next chunk to load.
+    size_t _load_index = 0;
+    // The index of the next chunk to return.
+    size_t _read_index = 0;
+    bool _stop = false;
+
+    std::vector<std::thread> _threads;
+
+    void _worker();
+
+public:
+    // Start loading the chunks.
+    // prefetch is the maximum number of chunks loaded ahead of the caller.
+    AMULET_LEVEL_EXPORT JavaChunkIterator(
+        std::shared_ptr<JavaDimension> dimension,
+        std::vector<std::pair<std::int64_t, std::int64_t>> chunk_coords,
+        size_t prefetch = 16,
+        std::optional<std::set<std::string>> component_ids = std::nullopt);
+
+    JavaChunkIterator(const JavaChunkIterator&) = delete;
+    JavaChunkIterator& operator=(const JavaChunkIterator&) = delete;
+
+    // Stop the background threads.
+    // Chunks that are being decoded are finished first.
+    // The GIL must not be held because the background threads may need it to finish.
+    AMULET_LEVEL_EXPORT ~JavaChunkIterator();
+
+    // Get the next chunk.
+    // Blocks until the chunk has been loaded.
+    // Returns nullopt when there are no more chunks.
+    // If loading a chunk failed the error is rethrown and the next call continues with the following chunk.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT std::optional<ValueT> next();
 };
 
 } // namespace Amulet
@@ -1,23 +1,81 @@
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
+#include <cstdint>
 #include <memory>
+#include <optional>
+#include <set>
+#include <string>
+#include <utility>
+#include <vector>
+
+#include <amulet/pybind11_extensions/collections.hpp>
+
+#include <amulet/utils/signal.py.hpp>
+
+#include <amulet/level/abc/future.py.hpp>
 
 #include "dimension.hpp"
 
 namespace py = pybind11;
 
+namespace {
+// Destroy the iterator with the GIL released.
+// The destructor joins the worker threads which may need the GIL to finish.
+struct JavaChunkIteratorDeleter {
+    void operator()(Amulet::JavaChunkIterator* ptr) const
+    {
+        if (PyGILState_Check()) {
+            py::gil_scoped_release nogil;
+            delete ptr;
+        } else {
+            delete ptr;
+        }
+    }
+};
+
+using JavaChunkIteratorHolder = std::unique_ptr<Amulet::JavaChunkIterator, JavaChunkIteratorDeleter>;
+} // namespace
+
 py::module init_java_dimension(py::module m_parent)
 {
     auto m = m_parent.def_submodule("dimension");
 
     m.attr("JavaInternalDimensionID") = py::module::import("builtins").attr("str");
 
+    py::class_<Amulet::JavaChunkIterator, JavaChunkIteratorHolder> JavaChunkIterator(m, "JavaChunkIterator",
+        "An iterator over the chunks in a dimension.\n"
+        "The following chunks are decoded on background threads while the current chunk is processed.");
+    JavaChunkIterator.def(
+        "__iter__",
+        [](Amulet::JavaChunkIterator& self) -> Amulet::JavaChunkIterator& { return self; },
+        py::return_value_policy::reference_internal);
+    JavaChunkIterator.def(
+        "__next__",
+        [](Amulet::JavaChunkIterator& self) -> std::tuple<std::int64_t, std::int64_t, std::shared_ptr<Amulet::JavaChunk>> {
+            auto value = [&self] {
+                py::gil_scoped_release nogil;
+                return self.next();
+            }();
+            if (!value) {
+                throw py::stop_iteration();
+            }
+            auto& [cx, cz, chunk] = *value;
+            return std::make_tuple(cx, cz, std::shared_ptr<Amulet::JavaChunk>(std::move(chunk)));
+        });
+
     py::class_<
         Amulet::JavaDimension,
         Amulet::Dimension,
         std::shared_ptr<Amulet::JavaDimension>>
         JavaDimension(m, "JavaDimension");
+    Amulet::def_signal(
+        JavaDimension,
+        "chunks_changed",
+        &Amulet::JavaDimension::chunks_changed,
+        py::doc("Signal emitted with the coordinates of the chunks changed by undo, redo and chunk writes.\n"
+                "Many changes are delivered in one event after the history lock has been released.\n"
+                "Thread safe."));
     JavaDimension.attr("get_chunk_handle") = py::cpp_function(
         &Amulet::JavaDimension::get_java_chunk_handle,
         py::name("get_chunk_handle"),
@@ -32,5 +90,179 @@ py::module init_java_dimension(py::module m_parent)
             ":param cx: The chunk x coordinate to load.\n"
             ":param cz: The chunk z coordinate to load."));
 
+    JavaDimension.def(
+        "get_chunks_async",
+        [](std::shared_ptr<Amulet::JavaDimension> self,
+            std::vector<std::pair<std::int64_t, std::int64_t>> chunk_coords,
+            std::optional<Amulet::pybind11_extensions::collections::Iterable<std::string>> py_component_ids) {
+            std::optional<std::set<std::string>> component_ids;
+            if (py_component_ids) {
+                component_ids = std::set<std::string>(py_component_ids->begin(), py_component_ids->end());
+            }
+            auto count = chunk_coords.size();
+            return Amulet::run_async_many(
+                count,
+                [self = std::move(self), chunk_coords = std::move(chunk_coords), component_ids = std::move(component_ids)](
+                    size_t index, Amulet::AbstractCancelManager&) -> std::unique_ptr<Amulet::JavaChunk> {
+                    const auto& [cx, cz] = chunk_coords[index];
+                    try {
+                        return self->get_java_chunk_handle(cx, cz)->get_java_chunk(component_ids);
+                    } catch (const Amulet::ChunkDoesNotExist&) {
+                        return nullptr;
+                    }
+                },
+                [](std::vector<std::unique_ptr<Amulet::JavaChunk>> chunks) {
+                    py::list py_chunks;
+                    for (auto& chunk : chunks) {
+                        py_chunks.append(py::cast(std::shared_ptr<Amulet::JavaChunk>(std::move(chunk))));
+                    }
+                    return py_chunks;
+                });
+        },
+        py::arg("chunks"),
+        py::arg("component_ids") = py::none(),
+        py::doc(
+            "Get unique copies of many chunks without blocking the asyncio event loop.\n"
+            "The chunks are loaded in parallel on a shared worker pool.\n"
+            "If the awaiting task is cancelled the chunks that have not started loading are skipped.\n"
+            "Must be called from a running asyncio event loop.\n"
+            "\n"
+            ">>> chunks = await dimension.get_chunks_async([(0, 0), (0, 1)])\n"
+            "\n"
+            ":param chunks: The chunk coordinates to load.\n"
+            ":param component_ids: The components to load. If None all components are loaded.\n"
+            ":return: The chunks in the same order as the coordinates. None if the chunk does not exist."));
+
+    auto preload_chunks = [](
+                              Amulet::JavaDimension& self,
+                              const std::vector<std::pair<std::int64_t, std::int64_t>>& chunk_coords,
+                              size_t workers,
+                              Amulet::AbstractCancelManager* cancel_manager,
+                              Amulet::AbstractProgressManager* progress_manager) {
+        Amulet::VoidCancelManager void_cancel_manager;
+        Amulet::VoidProgressManager void_progress_manager;
+        self.preload_chunks(
+            chunk_coords,
+            workers,
+            cancel_manager ? *cancel_manager : void_cancel_manager,
+            progress_manager ? *progress_manager : void_progress_manager);
+    };
+    auto preload_chunks_doc = py::doc(
+        "Load chunks from the level into the history system.\n"
+        "The chunks are read in region file order and decoded on a pool of threads.\n"
+        "The decoded chunks are written to the history in batches.\n"
+        "Chunks that have already been loaded are skipped.\n"
+        "Thread safe.\n"
+        "\n"
+        ":param chunks: The chunk coordinates or a selection to load the chunks of.\n"
+        ":param workers: The number of threads to decode chunks on. If 0 the number of CPU threads is used.\n"
+        ":param cancel_manager: An optional cancel manager to stop the operation.\n"
+        ":param progress_manager: An optional progress manager to report the progress to.\n"
+        ":raises TaskCancelled: If the operation was cancelled. The chunks loaded before cancelling remain loaded.");
+    JavaDimension.def(
+        "preload_chunks",
+        preload_chunks,
+        py::arg("chunks"),
+        py::arg("workers") = 0,
+        py::arg("cancel_manager") = py::none(),
+        py::arg("progress_manager") = py::none(),
+        py::call_guard<py::gil_scoped_release>(),
+        preload_chunks_doc);
+    JavaDimension.def(
+        "preload_chunks",
+        [preload_chunks](
+            Amulet::JavaDimension& self,
+            const Amulet::SelectionGroup& selection,
+            size_t workers,
+            Amulet::AbstractCancelManager* cancel_manager,
+            Amulet::AbstractProgressManager* progress_manager) {
+            preload_chunks(self, Amulet::JavaDimension::get_chunk_coords(selection), workers, cancel_manager, progress_manager);
+        },
+        py::arg("chunks"),
+        py::arg("workers") = 0,
+        py::arg("cancel_manager") = py::none(),
+        py::arg("progress_manager") = py::none(),
+        py::call_guard<py::gil_scoped_release>(),
+        preload_chunks_doc);
+    JavaDimension.def(
+        "preload_chunks",
+        [preload_chunks](
+            Amulet::JavaDimension& self,
+            const Amulet::SelectionBox& selection,
+            size_t workers,
+            Amulet::AbstractCancelManager* cancel_manager,
+            Amulet::AbstractProgressManager* progress_manager) {
+            preload_chunks(self, Amulet::JavaDimension::get_chunk_coords(selection), workers, cancel_manager, progress_manager);
+        },
+        py::arg("chunks"),
+        py::arg("workers") = 0,
+        py::arg("cancel_manager") = py::none(),
+        py::arg("progress_manager") = py::none(),
+        py::call_guard<py::gil_scoped_release>(),
+        preload_chunks_doc);
+
+    auto iter_chunks = [](
+                           std::shared_ptr<Amulet::JavaDimension> self,
+                           std::vector<std::pair<std::int64_t, std::int64_t>> chunk_coords,
+                           size_t prefetch,
+                           std::optional<Amulet::pybind11_extensions::collections::Iterable<std::string>> py_component_ids) {
+        std::optional<std::set<std::string>> component_ids;
+        if (py_component_ids) {
+            component_ids = std::set<std::string>(py_component_ids->begin(), py_component_ids->end());
+        }
+        py::gil_scoped_release nogil;
+        return JavaChunkIteratorHolder(new Amulet::JavaChunkIterator(
+            std::move(self),
+            std::move(chunk_coords),
+            prefetch,
+            std::move(component_ids)));
+    };
+    auto iter_chunks_doc = py::doc(
+        "Iterate over the chunks in region file order.\n"
+        "The next prefetch chunks are decoded on background threads while the current chunk is processed.\n"
+        "Chunks that do not exist are skipped.\n"
+        "The level must remain open while iterating.\n"
+        "\n"
+        ">>> for cx, cz, chunk in dimension.iter_chunks(selection, prefetch=16):\n"
+        ">>>     ...\n"
+        "\n"
+        ":param chunks: The chunk coordinates or a selection to iterate the chunks of.\n"
+        ":param prefetch: The maximum number of chunks to decode ahead of the caller.\n"
+        ":param component_ids: The components to load. If None all components are loaded.\n"
+        ":return: An iterator of the chunk x and z coordinates and the chunk.");
+    JavaDimension.def(
+        "iter_chunks",
+        iter_chunks,
+        py::arg("chunks"),
+        py::arg("prefetch") = 16,
+        py::arg("component_ids") = py::none(),
+        iter_chunks_doc);
+    JavaDimension.def(
+        "iter_chunks",
+        [iter_chunks](
+            std::shared_ptr<Amulet::JavaDimension> self,
+            const Amulet::SelectionGroup& selection,
+            size_t prefetch,
+            std::optional<Amulet::pybind11_extensions::collections::Iterable<std::string>> component_ids) {
+            return iter_chunks(std::move(self), Amulet::JavaDimension::get_chunk_coords(selection), prefetch, std::move(component_ids));
+        },
+        py::arg("chunks"),
+        py::arg("prefetch") = 16,
+        py::arg("component_ids") = py::none(),
+        iter_chunks_doc);
+    JavaDimension.def(
+        "iter_chunks",
+        [iter_chunks](
+            std::shared_ptr<Amulet::JavaDimension> self,
+            const Amulet::SelectionBox& selection,
+            size_t prefetch,
+            std::optional<Amulet::pybind11_extensions::collections::Iterable<std::string>> component_ids) {
+            return iter_chunks(std::move(self), Amulet::JavaDimension::get_chunk_coords(selection), prefetch, std::move(component_ids));
+        },
+        py::arg("chunks"),
+        py::arg("prefetch") = 16,
+        py::arg("component_ids") = py::none(),
+        iter_chunks_doc);
+
     return m;
 }
@@ -2,10 +2,28 @@ from __future__ import annotations
 
 from builtins import str as JavaInternalDimensionID
 
+import asyncio
+import collections.abc
+import typing
+
+import amulet.core.selection.box
+import amulet.core.selection.group
 import amulet.level.abc.dimension
+import amulet.level.java.chunk
 import amulet.level.java.chunk_handle
+import amulet.utils.signal
+import amulet.utils.task_manager
+
+__all__ = ["JavaChunkIterator", "JavaDimension", "JavaInternalDimensionID"]
+
+class JavaChunkIterator:
+    """
+    An iterator over the chunks in a dimension.
+    The following chunks are decoded on background threads while the current chunk is processed.
+    """
 
-__all__ = ["JavaDimension", "JavaInternalDimensionID"]
+    def __iter__(self) -> JavaChunkIterator: ...
+    def __next__(self) -> tuple[int, int, amulet.level.java.chunk.JavaChunk]: ...
 
 class JavaDimension(amulet.level.abc.dimension.Dimension):
     def get_chunk_handle(
@@ -18,3 +36,167 @@ class JavaDimension(amulet.level.abc.dimension.Dimension):
         :param cx: The chunk x coordinate to load.
         :param cz: The chunk z coordinate to load.
         """
+
+    def get_chunks_async(
+        self,
+        chunks: collections.abc.Sequence[tuple[int, int]],
+        component_ids: collections.abc.Iterable[str] | None = None,
+    ) -> asyncio.Future[list[amulet.level.java.chunk.JavaChunk | None]]:
+        """
+        Get unique copies of many chunks without blocking the asyncio event loop.
+        The chunks are loaded in parallel on a shared worker pool.
+        If the awaiting task is cancelled the chunks that have not started loading are skipped.
+        Must be called from a running asyncio event loop.
+
+        >>> chunks = await dimension.get_chunks_async([(0, 0), (0, 1)])
+
+        :param chunks: The chunk coordinates to load.
+        :param component_ids: The components to load. If None all components are loaded.
+        :return: The chunks in the same order as the coordinates. None if the chunk does not exist.
+        """
+
+    @typing.overload
+    def iter_chunks(
+        self,
+        chunks: collections.abc.Sequence[tuple[int, int]],
+        prefetch: int = 16,
+        component_ids: collections.abc.Iterable[str] | None = None,
+    ) -> JavaChunkIterator:
+        """
+        Iterate over the chunks in region file order.
+        The next prefetch chunks are decoded on background threads while the current chunk is processed.
+        Chunks that do not exist are skipped.
+        The level must remain open while iterating.
+
+        >>> for cx, cz, chunk in dimension.iter_chunks(selection, prefetch=16):
+        >>>     ...
+
+        :param chunks: The chunk coordinates or a selection to iterate the chunks of.
+        :param prefetch: The maximum number of chunks to decode ahead of the caller.
+        :param component_ids: The components to load. If None all components are loaded.
+        :return: An iterator of the chunk x and z coordinates and the chunk.
+        """
+
+    @typing.overload
+    def iter_chunks(
+        self,
+        chunks: amulet.core.selection.group.SelectionGroup,
+        prefetch: int = 16,
+        component_ids: collections.abc.Iterable[str] | None = None,
+    ) -> JavaChunkIterator:
+        """
+        Iterate over the chunks in region file order.
+        The next prefetch chunks are decoded on background threads while the current chunk is processed.
+        Chunks that do not exist are skipped.
+        The level must remain open while iterating.
+
+        >>> for cx, cz, chunk in dimension.iter_chunks(selection, prefetch=16):
+        >>>     ...
+
+        :param chunks: The chunk coordinates or a selection to iterate the chunks of.
+        :param prefetch: The maximum number of chunks to decode ahead of the caller.
+        :param component_ids: The components to load. If None all components are loaded.
+        :return: An iterator of the chunk x and z coordinates and the chunk.
+        """
+
+    @typing.overload
+    def iter_chunks(
+        self,
+        chunks: amulet.core.selection.box.SelectionBox,
+        prefetch: int = 16,
+        component_ids: collections.abc.Iterable[str] | None = None,
+    ) -> JavaChunkIterator:
+        """
+        Iterate over the chunks in region file order.
+        The next prefetch chunks are decoded on background threads while the current chunk is processed.
+        Chunks that do not exist are skipped.
+        The level must remain open while iterating.
+
+        >>> for cx, cz, chunk in dimension.iter_chunks(selection, prefetch=16):
+        >>>     ...
+
+        :param chunks: The chunk coordinates or a selection to iterate the chunks of.
+        :param prefetch: The maximum number of chunks to decode ahead of the caller.
+        :param component_ids: The components to load. If None all components are loaded.
+        :return: An iterator of the chunk x and z coordinates and the chunk.
+        """
+
+    @typing.overload
+    def preload_chunks(
+        self,
+        chunks: collections.abc.Sequence[tuple[int, int]],
+        workers: int = 0,
+        cancel_manager: amulet.utils.task_manager.AbstractCancelManager | None = None,
+        progress_manager: (
+            amulet.utils.task_manager.AbstractProgressManager | None
+        ) = None,
+    ) -> None:
+        """
+        Load chunks from the level into the history system.
+        The chunks are read in region file order and decoded on a pool of threads.
+        The decoded chunks are written to the history in batches.
+        Chunks that have already been loaded are skipped.
+        Thread safe.
+
+        :param chunks: The chunk coordinates or a selection to load the chunks of.
+        :param workers: The number of threads to decode chunks on. If 0 the number of CPU threads is used.
+        :param cancel_manager: An optional cancel manager to stop the operation.
+        :param progress_manager: An optional progress manager to report the progress to.
+        :raises TaskCancelled: If the operation was cancelled. The chunks loaded before cancelling remain loaded.
+        """
+
+    @typing.overload
+    def preload_chunks(
+        self,
+        chunks: amulet.core.selection.group.SelectionGroup,
+        workers: int = 0,
+        cancel_manager: amulet.utils.task_manager.AbstractCancelManager | None = None,
+        progress_manager: (
+            amulet.utils.task_manager.AbstractProgressManager | None
+        ) = None,
+    ) -> None:
+        """
+        Load chunks from the level into the history system.
+        The chunks are read in region file order and decoded on a pool of threads.
+        The decoded chunks are written to the history in batches.
+        Chunks that have already been loaded are skipped.
+        Thread safe.
+
+        :param chunks: The chunk coordinates or a selection to load the chunks of.
+        :param workers: The number of threads to decode chunks on. If 0 the number of CPU threads is used.
+        :param cancel_manager: An optional cancel manager to stop the operation.
+        :param progress_manager: An optional progress manager to report the progress to.
+        :raises TaskCancelled: If the operation was cancelled. The chunks loaded before cancelling remain loaded.
+        """
+
+    @typing.overload
+    def preload_chunks(
+        self,
+        chunks: amulet.core.selection.box.SelectionBox,
+        workers: int = 0,
+        cancel_manager: amulet.utils.task_manager.AbstractCancelManager | None = None,
+        progress_manager: (
+            amulet.utils.task_manager.AbstractProgressManager | None
+        ) = None,
+    ) -> None:
+        """
+        Load chunks from the level into the history system.
+        The chunks are read in region file order and decoded on a pool of threads.
+        The decoded chunks are written to the history in batches.
+        Chunks that have already been loaded are skipped.
+        Thread safe.
+
+        :param chunks: The chunk coordinates or a selection to load the chunks of.
+        :param workers: The number of threads to decode chunks on. If 0 the number of CPU threads is used.
+        :param cancel_manager: An optional cancel manager to stop the operation.
+        :param progress_manager: An optional progress manager to report the progress to.
+        :raises TaskCancelled: If the operation was cancelled. The chunks loaded before cancelling remain loaded.
+        """
+
+    @property
+    def chunks_changed(self) -> amulet.utils.signal.Signal[list[tuple[int, int]]]:
+        """
+        Signal emitted with the coordinates of the chunks changed by undo, redo and chunk writes.
+        Many changes are delivered in one event after the history lock has been released.
+        Thread safe.
+        """
@@ -6,8 +6,10 @@
 
 namespace Amulet {
 
-JavaLevelOpenData::JavaLevelOpenData()
-    : history_enabled(std::make_shared<bool>(true))
+JavaLevelOpenData::JavaLevelOpenData(const HistoryStorageOptions& history_options)
+    : history_manager(history_options)
+    , history_enabled(std::make_shared<bool>(true))
+    , passthrough_enabled(std::make_shared<bool>(false))
 {
 }
 
@@ -86,20 +88,32 @@ const std::filesystem::path& JavaLevel::get_path()
 }
 
 void JavaLevel::open()
+{
+    open(HistoryStorageOptions());
+}
+
+void JavaLevel::open(const HistoryStorageOptions& history_options)
 {
     if (_open_data) {
         return;
     }
+    auto start = std::chrono::steady_clock::now();
     {
         auto& mutex = _raw_level->get_mutex();
         mutex.lock<Amulet::ThreadAccessMode::ReadWrite, Amulet::ThreadShareMode::Unique>();
         std::lock_guard lock(mutex, std::adopt_lock);
         _raw_level->open();
     }
-    _open_data = std::make_unique<JavaLevelOpenData>();
+    _open_data = std::make_unique<JavaLevelOpenData>(history_options);
+    _open_duration = std::chrono::steady_clock::now() - start;
     opened.emit();
 }
 
+std::chrono::steady_clock::duration JavaLevel::get_open_duration()
+{
+    return _open_duration;
+}
+
 void JavaLevel::purge()
 {
     {
@@ -150,11 +164,13 @@ size_t JavaLevel::get_undo_count()
 
 void JavaLevel::undo()
 {
+    auto& open_data = _get_open_data();
     {
-        auto& open_data = _get_open_data();
         std::lock_guard lock(open_data.history_manager.get_mutex());
         open_data.history_manager.undo();
     }
+    // Notify listeners of the changed resources after the lock is released.
+    open_data.history_manager.emit_changes();
     history_changed.emit();
 }
 
@@ -167,11 +183,13 @@ size_t JavaLevel::get_redo_count()
 
 void JavaLevel::redo()
 {
+    auto& open_data = _get_open_data();
     {
-        auto& open_data = _get_open_data();
         std::lock_guard lock(open_data.history_manager.get_mutex());
         open_data.history_manager.redo();
     }
+    // Notify listeners of the changed resources after the lock is released.
+    open_data.history_manager.emit_changes();
     history_changed.emit();
 }
 
@@ -186,6 +204,28 @@ void JavaLevel::set_history_enabled(bool history_enabled)
     history_enabled_changed.emit();
 }
 
+bool JavaLevel::get_passthrough_enabled()
+{
+    return *_get_open_data().passthrough_enabled;
+}
+
+void JavaLevel::set_passthrough_enabled(bool passthrough_enabled)
+{
+    *_get_open_data().passthrough_enabled = passthrough_enabled;
+}
+
+size_t JavaLevel::get_history_max_pending_size()
+{
+    return _get_open_data().history_manager.get_max_pending_size();
+}
+
+void JavaLevel::set_history_max_pending_size(size_t max_pending_size)
+{
+    auto& history_manager = _get_open_data().history_manager;
+    std::lock_guard lock(history_manager.get_mutex());
+    history_manager.set_max_pending_size(max_pending_size);
+}
+
 std::vector<std::string> JavaLevel::get_dimension_ids()
 {
     auto& mutex = _raw_level->get_mutex();
@@ -220,7 +260,8 @@ std::shared_ptr<JavaDimension> JavaLevel::get_java_dimension(const DimensionId&
         auto dimension = std::shared_ptr<JavaDimension>(new JavaDimension(
             raw_dimension,
             open_data.history_manager,
-            open_data.history_enabled));
+            open_data.history_enabled,
+            open_data.passthrough_enabled));
         open_data.dimensions.emplace(raw_dimension->get_dimension_id(), dimension);
         open_data.dimensions.emplace(raw_dimension->get_relative_path(), dimension);
         return dimension;
@@ -20,10 +20,11 @@ class JavaLevelOpenData {
 public:
     HistoryManager history_manager;
     std::shared_ptr<bool> history_enabled;
+    std::shared_ptr<bool> passthrough_enabled;
     std::shared_mutex dimensions_mutex;
     std::map<DimensionId, std::shared_ptr<JavaDimension>> dimensions;
 
-    JavaLevelOpenData();
+    JavaLevelOpenData(const HistoryStorageOptions& history_options);
 };
 
 class JavaLevel : public Level, public CompactibleLevel, public DiskLevel, public ReloadableLevel {
@@ -33,6 +34,9 @@ private:
     // Data that is only valid when the level is open.
     std::unique_ptr<JavaLevelOpenData> _open_data;
 
+    // The time the last call to open took.
+    std::chrono::steady_clock::duration _open_duration {};
+
     // Validate _open_data is valid and return a reference.
     // External Read:SharedReadWrite lock required.
     JavaLevelOpenData& _get_open_data()
@@ -110,6 +114,16 @@ public:
     // External ReadWrite:Unique lock required.
     AMULET_LEVEL_EXPORT void open() override;
 
+    // Open the level with custom options for the history database.
+    // If the level is already open, this does nothing.
+    // External ReadWrite:Unique lock required.
+    AMULET_LEVEL_EXPORT void open(const HistoryStorageOptions& history_options);
+
+    // The time the last call to open took.
+    // This is zero if the level has not been opened.
+    // External Read:SharedReadWrite lock required.
+    AMULET_LEVEL_EXPORT std::chrono::steady_clock::duration get_open_duration();
+
     // Clear all unsaved changes and restore points.
     // External ReadWrite:Unique lock required.
     AMULET_LEVEL_EXPORT void purge() override;
@@ -157,6 +171,28 @@ public:
     // External ReadWrite:SharedReadWrite lock required.
     void set_history_enabled(bool) override;
 
+    // Get if passthrough reads are enabled.
+    // If this is true, chunks that have not been modified are decoded directly from the raw level
+    // without being added to the history system. The history system is only used once a chunk is modified.
+    // This is faster for read only access.
+    // External Read:SharedReadWrite lock required.
+    AMULET_LEVEL_EXPORT bool get_passthrough_enabled();
+
+    // Set if passthrough reads are enabled.
+    // External ReadWrite:SharedReadWrite lock required.
+    AMULET_LEVEL_EXPORT void set_passthrough_enabled(bool);
+
+    // Get the number of bytes of history writes that may wait to be written to disk.
+    // 0 if history writes are written before the edit returns.
+    // External Read:SharedReadWrite lock required.
+    AMULET_LEVEL_EXPORT size_t get_history_max_pending_size();
+
+    // Set the number of bytes of history writes that may wait to be written to disk.
+    // Writes are grouped together and written by a background thread so that edits do not wait for the disk.
+    // Pending writes are lost if the process crashes. 0 disables this. The default is 0.
+    // External ReadWrite:SharedReadWrite lock required.
+    AMULET_LEVEL_EXPORT void set_history_max_pending_size(size_t);
+
     // The identifiers for all dimensions in the level
     // External Read:SharedReadWrite lock required.
     // External Read:SharedReadOnly lock optional.
@@ -1,6 +1,7 @@
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
+#include <chrono>
 #include <memory>
 
 #include "level.hpp"
@@ -46,6 +47,40 @@ py::module init_java_level(py::module m_parent)
             "Access the raw level instance.\n"
             "Before calling any mutating functions, the caller must call :meth:`purge` (optionally saving before)\n"
             "External ReadWrite:Unique lock required."));
+    JavaLevel.def_property(
+        "passthrough_enabled",
+        &Amulet::JavaLevel::get_passthrough_enabled,
+        &Amulet::JavaLevel::set_passthrough_enabled,
+        py::doc(
+            "A boolean tracking if passthrough reads are enabled.\n"
+            "External Read:SharedReadWrite lock required when getting.\n"
+            "External ReadWrite:SharedReadWrite lock required when setting.\n"
+            "\n"
+            "If true, chunks that have not been modified are decoded directly from the raw level\n"
+            "without being added to the history system. The history system is only used once a chunk is modified.\n"
+            "This is faster for read only access."));
+    JavaLevel.def_property(
+        "history_max_pending_size",
+        &Amulet::JavaLevel::get_history_max_pending_size,
+        py::cpp_function(
+            &Amulet::JavaLevel::set_history_max_pending_size,
+            py::call_guard<py::gil_scoped_release>()),
+        py::doc(
+            "The number of bytes of history writes that may wait to be written to disk.\n"
+            "External Read:SharedReadWrite lock required when getting.\n"
+            "External ReadWrite:SharedReadWrite lock required when setting.\n"
+            "\n"
+            "If this is not 0, history writes are grouped together and written by a background thread\n"
+            "so that edits do not wait for the disk. Pending writes are lost if the process crashes.\n"
+            "0 disables this. The default is 0."));
+    JavaLevel.def_property_readonly(
+        "open_duration",
+        [](Amulet::JavaLevel& self) {
+            return std::chrono::duration<double>(self.get_open_duration()).count();
+        },
+        py::doc("The number of seconds the last call to open took.\n"
+                "This is zero if the level has not been opened.\n"
+                "External Read:SharedReadWrite lock required."));
     JavaLevel.attr("get_dimension") = py::cpp_function(
         &Amulet::JavaLevel::get_java_dimension,
         py::name("get_dimension"),
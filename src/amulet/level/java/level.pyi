@@ -35,6 +35,42 @@ class JavaLevel(
         External ReadWrite:SharedReadWrite lock required when calling code in Dimension (and its children) that need write permission.
         """
 
+    @property
+    def history_max_pending_size(self) -> int:
+        """
+        The number of bytes of history writes that may wait to be written to disk.
+        External Read:SharedReadWrite lock required when getting.
+        External ReadWrite:SharedReadWrite lock required when setting.
+
+        If this is not 0, history writes are grouped together and written by a background thread
+        so that edits do not wait for the disk. Pending writes are lost if the process crashes.
+        0 disables this. The default is 0.
+        """
+
+    @history_max_pending_size.setter
+    def history_max_pending_size(self, arg1: int) -> None: ...
+    @property
+    def open_duration(self) -> float:
+        """
+        The number of seconds the last call to open took.
+        This is zero if the level has not been opened.
+        External Read:SharedReadWrite lock required.
+        """
+
+    @property
+    def passthrough_enabled(self) -> bool:
+        """
+        A boolean tracking if passthrough reads are enabled.
+        External Read:SharedReadWrite lock required when getting.
+        External ReadWrite:SharedReadWrite lock required when setting.
+
+        If true, chunks that have not been modified are decoded directly from the raw level
+        without being added to the history system. The history system is only used once a chunk is modified.
+        This is faster for read only access.
+        """
+
+    @passthrough_enabled.setter
+    def passthrough_enabled(self, arg1: bool) -> None: ...
     @property
     def raw_level(self) -> amulet.level.java.raw_level.JavaRawLevel:
         """
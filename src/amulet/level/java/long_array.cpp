@@ -0,0 +1,153 @@
+#include <cstdint>
+
+#if defined(__x86_64__) || defined(_M_X64)
+#define AMULET_LONG_ARRAY_X86
+#include <immintrin.h>
+#if defined(_MSC_VER)
+#include <intrin.h>
+#endif
+#endif
+
+#include "long_array.hpp"
+
+#ifdef AMULET_LONG_ARRAY_X86
+// The AVX2 functions are compiled for AVX2 and only called if the CPU supports it.
+// MSVC allows the intrinsics without a target.
+#if defined(__GNUC__) || defined(__clang__)
+#define AMULET_TARGET_AVX2 __attribute__((target("avx2")))
+#else
+#define AMULET_TARGET_AVX2
+#endif
+#endif
+
+namespace Amulet {
+namespace detail {
+
+#ifdef AMULET_LONG_ARRAY_X86
+    static bool detect_avx2()
+    {
+#if defined(_MSC_VER)
+        int info[4];
+        __cpuid(info, 0);
+        if (info[0] < 7) {
+            return false;
+        }
+        __cpuid(info, 1);
+        // The OS must save the AVX registers.
+        if ((info[2] & (1 << 27)) == 0 || (_xgetbv(0) & 6) != 6) {
+            return false;
+        }
+        __cpuidex(info, 7, 0);
+        return (info[1] & (1 << 5)) != 0;
+#else
+        return __builtin_cpu_supports("avx2");
+#endif
+    }
+
+    static bool has_avx2()
+    {
+        static const bool supported = detect_avx2();
+        return supported;
+    }
+
+    // Narrow eight 64 bit lanes to eight 32 bit lanes.
+    AMULET_TARGET_AVX2 static inline __m256i narrow_to_u32(__m256i low, __m256i high)
+    {
+        const __m256i permute = _mm256_setr_epi32(0, 2, 4, 6, 0, 2, 4, 6);
+        return _mm256_inserti128_si256(
+            _mm256_castsi128_si256(_mm256_castsi256_si128(_mm256_permutevar8x32_epi32(low, permute))),
+            _mm256_castsi256_si128(_mm256_permutevar8x32_epi32(high, permute)),
+            1);
+    }
+
+    // Store eight decoded values.
+    AMULET_TARGET_AVX2 static inline void store8(std::uint32_t* decoded, __m256i low, __m256i high)
+    {
+        _mm256_storeu_si256(reinterpret_cast<__m256i*>(decoded), narrow_to_u32(low, high));
+    }
+
+    AMULET_TARGET_AVX2 static inline void store8(std::uint16_t* decoded, __m256i low, __m256i high)
+    {
+        __m256i values = narrow_to_u32(low, high);
+        _mm_storeu_si128(
+            reinterpret_cast<__m128i*>(decoded),
+            _mm_packus_epi32(_mm256_castsi256_si128(values), _mm256_extracti128_si256(values, 1)));
+    }
+
+    AMULET_TARGET_AVX2 static inline void store8(std::uint8_t* decoded, __m256i low, __m256i high)
+    {
+        __m256i values = narrow_to_u32(low, high);
+        __m128i values_16 = _mm_packus_epi32(_mm256_castsi256_si128(values), _mm256_extracti128_si256(values, 1));
+        _mm_storel_epi64(reinterpret_cast<__m128i*>(decoded), _mm_packus_epi16(values_16, values_16));
+    }
+
+    template <typename decodedT>
+    AMULET_TARGET_AVX2 static size_t decode_padded_avx2(
+        const std::uint64_t* encoded,
+        size_t encoded_size,
+        decodedT* decoded,
+        size_t decoded_size,
+        std::uint8_t bits_per_entry)
+    {
+        const __m256i mask = _mm256_set1_epi64x(static_cast<long long>(~0ull >> (64 - bits_per_entry)));
+        const __m256i step = _mm256_set1_epi64x(4 * bits_per_entry);
+        const __m256i first_shift = _mm256_setr_epi64x(0, bits_per_entry, 2 * bits_per_entry, 3 * bits_per_entry);
+        const size_t entries_per_long = 64 / bits_per_entry;
+        // Each long is decoded in groups of eight entries.
+        // Lanes past the last entry in the long are overwritten by the next long or the scalar kernel.
+        const size_t group_count = (entries_per_long + 7) / 8;
+        size_t long_index = 0;
+        while (long_index < encoded_size && long_index * entries_per_long + group_count * 8 <= decoded_size) {
+            __m256i value = _mm256_set1_epi64x(static_cast<long long>(encoded[long_index]));
+            decodedT* long_decoded = decoded + long_index * entries_per_long;
+            __m256i shift_low = first_shift;
+            for (size_t group = 0; group < group_count; group++) {
+                __m256i shift_high = _mm256_add_epi64(shift_low, step);
+                store8(
+                    long_decoded + group * 8,
+                    _mm256_and_si256(_mm256_srlv_epi64(value, shift_low), mask),
+                    _mm256_and_si256(_mm256_srlv_epi64(value, shift_high), mask));
+                shift_low = _mm256_add_epi64(shift_high, step);
+            }
+            long_index++;
+        }
+        return long_index * entries_per_long;
+    }
+#endif
+
+    template <typename decodedT>
+    static size_t decode_long_array_simd_impl(
+        const std::uint64_t* encoded,
+        size_t encoded_size,
+        decodedT* decoded,
+        size_t decoded_size,
+        std::uint8_t bits_per_entry,
+        bool dense)
+    {
+#ifdef AMULET_LONG_ARRAY_X86
+        // The dense layout is left to the scalar kernel. Gathering the longs for each lane is slower than the unrolled shifts.
+        // With fewer than eight entries per long lanes are wasted and the scalar kernel is as fast.
+        if (!dense && bits_per_entry <= 8 && has_avx2()) {
+            return decode_padded_avx2(encoded, encoded_size, decoded, decoded_size, bits_per_entry);
+        }
+#endif
+        return 0;
+    }
+
+    size_t decode_long_array_simd(const std::uint64_t* encoded, size_t encoded_size, std::uint8_t* decoded, size_t decoded_size, std::uint8_t bits_per_entry, bool dense)
+    {
+        return decode_long_array_simd_impl(encoded, encoded_size, decoded, decoded_size, bits_per_entry, dense);
+    }
+
+    size_t decode_long_array_simd(const std::uint64_t* encoded, size_t encoded_size, std::uint16_t* decoded, size_t decoded_size, std::uint8_t bits_per_entry, bool dense)
+    {
+        return decode_long_array_simd_impl(encoded, encoded_size, decoded, decoded_size, bits_per_entry, dense);
+    }
+
+    size_t decode_long_array_simd(const std::uint64_t* encoded, size_t encoded_size, std::uint32_t* decoded, size_t decoded_size, std::uint8_t bits_per_entry, bool dense)
+    {
+        return decode_long_array_simd_impl(encoded, encoded_size, decoded, decoded_size, bits_per_entry, dense);
+    }
+
+} // namespace detail
+} // namespace Amulet
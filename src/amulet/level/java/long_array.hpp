@@ -1,5 +1,6 @@
 #pragma once
 #include <algorithm>
+#include <array>
 #include <bit>
 #include <cmath>
 #include <cstdint>
@@ -7,6 +8,9 @@
 #include <stdexcept>
 #include <string>
 #include <type_traits>
+#include <utility>
+
+#include <amulet/level/dll.hpp>
 
 namespace Amulet {
 /*
@@ -38,6 +42,238 @@ inline size_t encoded_long_array_size(
     }
 }
 
+namespace detail {
+    // The largest bits_per_entry with a specialised kernel.
+    // Palettes and heightmaps never need more than this.
+    constexpr std::uint8_t MaxFixedBitsPerEntry = 32;
+
+    // Decode entries [start, stop) one at a time.
+    template <typename decodedT>
+    void decode_long_array_generic(
+        const std::uint64_t* encoded,
+        decodedT* decoded,
+        size_t start,
+        size_t stop,
+        std::uint8_t bits_per_entry,
+        bool dense)
+    {
+        const std::uint64_t mask = ~0ull >> (64 - bits_per_entry);
+        if (dense) {
+            for (size_t decoded_index = start; decoded_index < stop; decoded_index++) {
+                size_t bit_start = decoded_index * bits_per_entry;
+                size_t bit_stop = (decoded_index + 1) * bits_per_entry;
+                size_t long_start = bit_start / 64;
+                std::uint64_t value = (encoded[long_start] >> (bit_start % 64)) & mask;
+                if ((long_start + 1) * 64 < bit_stop) {
+                    // Overflows into the next long
+                    size_t overflow_bits = bit_stop - (long_start + 1) * 64;
+                    size_t previous_bits = bits_per_entry - overflow_bits;
+                    value |= (encoded[long_start + 1] & (mask >> previous_bits)) << previous_bits;
+                }
+                decoded[decoded_index] = static_cast<decodedT>(value);
+            }
+        } else {
+            size_t entries_per_long = 64 / bits_per_entry;
+            for (size_t decoded_index = start; decoded_index < stop; decoded_index++) {
+                size_t offset = decoded_index % entries_per_long;
+                decoded[decoded_index] = static_cast<decodedT>((encoded[decoded_index / entries_per_long] >> (bits_per_entry * offset)) & mask);
+            }
+        }
+    }
+
+    // Decode one entry of a dense block. The shifts are known at compile time.
+    template <std::uint8_t BitsPerEntry, size_t Entry, typename decodedT>
+    inline void decode_dense_entry(const std::uint64_t* encoded, decodedT* decoded)
+    {
+        constexpr std::uint64_t Mask = ~0ull >> (64 - BitsPerEntry);
+        constexpr size_t BitStart = Entry * BitsPerEntry;
+        constexpr size_t LongIndex = BitStart / 64;
+        constexpr size_t Shift = BitStart % 64;
+        std::uint64_t value = encoded[LongIndex] >> Shift;
+        if constexpr (64 < Shift + BitsPerEntry) {
+            value |= encoded[LongIndex + 1] << (64 - Shift);
+        }
+        decoded[Entry] = static_cast<decodedT>(value & Mask);
+    }
+
+    // Decode a dense long array with a fixed number of bits per entry.
+    // Whole blocks are unrolled and the remainder is decoded one at a time.
+    template <std::uint8_t BitsPerEntry, typename decodedT>
+    void decode_long_array_dense_fixed(const std::uint64_t* encoded, decodedT* decoded, size_t decoded_size)
+    {
+        constexpr size_t EntriesPerBlock = 64 >> std::min(std::countr_zero(BitsPerEntry), 6);
+        constexpr size_t LongsPerBlock = EntriesPerBlock * BitsPerEntry / 64;
+        size_t block_count = decoded_size / EntriesPerBlock;
+        for (size_t block = 0; block < block_count; block++) {
+            [&]<size_t... Entries>(std::index_sequence<Entries...>) {
+                (decode_dense_entry<BitsPerEntry, Entries>(encoded, decoded), ...);
+            }(std::make_index_sequence<EntriesPerBlock>());
+            encoded += LongsPerBlock;
+            decoded += EntriesPerBlock;
+        }
+        decode_long_array_generic(encoded, decoded, 0, decoded_size - block_count * EntriesPerBlock, BitsPerEntry, true);
+    }
+
+    // Decode a padded long array with a fixed number of bits per entry.
+    // Whole longs are unrolled and the remainder is decoded one at a time.
+    template <std::uint8_t BitsPerEntry, typename decodedT>
+    void decode_long_array_padded_fixed(const std::uint64_t* encoded, decodedT* decoded, size_t decoded_size)
+    {
+        constexpr size_t EntriesPerLong = 64 / BitsPerEntry;
+        constexpr std::uint64_t Mask = ~0ull >> (64 - BitsPerEntry);
+        size_t long_count = decoded_size / EntriesPerLong;
+        for (size_t long_index = 0; long_index < long_count; long_index++) {
+            const std::uint64_t value = encoded[long_index];
+            [&]<size_t... Offsets>(std::index_sequence<Offsets...>) {
+                ((decoded[Offsets] = static_cast<decodedT>((value >> (BitsPerEntry * Offsets)) & Mask)), ...);
+            }(std::make_index_sequence<EntriesPerLong>());
+            decoded += EntriesPerLong;
+        }
+        decode_long_array_generic(encoded + long_count, decoded, 0, decoded_size - long_count * EntriesPerLong, BitsPerEntry, false);
+    }
+
+    template <typename decodedT>
+    using DecodeKernel = void (*)(const std::uint64_t*, decodedT*, size_t);
+
+    template <typename decodedT, size_t... Bits>
+    constexpr std::array<DecodeKernel<decodedT>, sizeof...(Bits)> make_dense_decode_kernels(std::index_sequence<Bits...>)
+    {
+        return { &decode_long_array_dense_fixed<Bits + 1, decodedT>... };
+    }
+
+    template <typename decodedT, size_t... Bits>
+    constexpr std::array<DecodeKernel<decodedT>, sizeof...(Bits)> make_padded_decode_kernels(std::index_sequence<Bits...>)
+    {
+        return { &decode_long_array_padded_fixed<Bits + 1, decodedT>... };
+    }
+
+    // Decode with the kernel specialised for bits_per_entry.
+    template <typename decodedT>
+    void decode_long_array_fixed(
+        const std::uint64_t* encoded,
+        decodedT* decoded,
+        size_t decoded_size,
+        std::uint8_t bits_per_entry,
+        bool dense)
+    {
+        static constexpr auto dense_kernels = make_dense_decode_kernels<decodedT>(std::make_index_sequence<MaxFixedBitsPerEntry>());
+        static constexpr auto padded_kernels = make_padded_decode_kernels<decodedT>(std::make_index_sequence<MaxFixedBitsPerEntry>());
+        if (MaxFixedBitsPerEntry < bits_per_entry) {
+            decode_long_array_generic(encoded, decoded, 0, decoded_size, bits_per_entry, dense);
+        } else if (dense) {
+            dense_kernels[bits_per_entry - 1](encoded, decoded, decoded_size);
+        } else {
+            padded_kernels[bits_per_entry - 1](encoded, decoded, decoded_size);
+        }
+    }
+
+    // Decode the start of a padded array with the widest vector instructions the CPU supports.
+    // Returns the number of entries decoded. This is a whole number of longs.
+    // Returns 0 if the CPU, layout or bits_per_entry is not supported.
+    AMULET_LEVEL_EXPORT size_t decode_long_array_simd(const std::uint64_t* encoded, size_t encoded_size, std::uint8_t* decoded, size_t decoded_size, std::uint8_t bits_per_entry, bool dense);
+    AMULET_LEVEL_EXPORT size_t decode_long_array_simd(const std::uint64_t* encoded, size_t encoded_size, std::uint16_t* decoded, size_t decoded_size, std::uint8_t bits_per_entry, bool dense);
+    AMULET_LEVEL_EXPORT size_t decode_long_array_simd(const std::uint64_t* encoded, size_t encoded_size, std::uint32_t* decoded, size_t decoded_size, std::uint8_t bits_per_entry, bool dense);
+
+    // Encode one entry of a dense block. The encoded block must be zeroed.
+    template <std::uint8_t BitsPerEntry, size_t Entry, typename decodedT>
+    inline void encode_dense_entry(const decodedT* decoded, std::uint64_t* encoded)
+    {
+        constexpr std::uint64_t Mask = ~0ull >> (64 - BitsPerEntry);
+        constexpr size_t BitStart = Entry * BitsPerEntry;
+        constexpr size_t LongIndex = BitStart / 64;
+        constexpr size_t Shift = BitStart % 64;
+        std::uint64_t value = static_cast<std::uint64_t>(decoded[Entry]) & Mask;
+        encoded[LongIndex] |= value << Shift;
+        if constexpr (64 < Shift + BitsPerEntry) {
+            encoded[LongIndex + 1] |= value >> (64 - Shift);
+        }
+    }
+
+    // Encode entries [start, stop) one at a time. The encoded array must be zeroed.
+    template <typename decodedT>
+    void encode_long_array_generic(
+        const decodedT* decoded,
+        std::uint64_t* encoded,
+        size_t start,
+        size_t stop,
+        std::uint8_t bits_per_entry,
+        bool dense)
+    {
+        const std::uint64_t mask = ~0ull >> (64 - bits_per_entry);
+        if (dense) {
+            for (size_t decoded_index = start; decoded_index < stop; decoded_index++) {
+                // The bit in the array where the value starts
+                size_t bit_start = decoded_index * bits_per_entry;
+                // The long number that the value starts in
+                size_t long_start = bit_start / 64;
+                // The bit offset in the long where the value starts
+                size_t long_bit_offset = bit_start % 64;
+                std::uint64_t value = static_cast<std::uint64_t>(decoded[decoded_index]) & mask;
+                encoded[long_start] |= value << long_bit_offset;
+                if (64 < long_bit_offset + bits_per_entry) {
+                    // Overflows into the next long
+                    encoded[long_start + 1] |= value >> (64 - long_bit_offset);
+                }
+            }
+        } else {
+            size_t entries_per_long = 64 / bits_per_entry;
+            for (size_t decoded_index = start; decoded_index < stop; decoded_index++) {
+                size_t offset = decoded_index % entries_per_long;
+                std::uint64_t value = static_cast<std::uint64_t>(decoded[decoded_index]) & mask;
+                encoded[decoded_index / entries_per_long] |= value << (bits_per_entry * offset);
+            }
+        }
+    }
+
+    // Encode a dense long array with a fixed number of bits per entry.
+    template <std::uint8_t BitsPerEntry, typename decodedT>
+    void encode_long_array_dense_fixed(const decodedT* decoded, std::uint64_t* encoded, size_t decoded_size)
+    {
+        constexpr size_t EntriesPerBlock = 64 >> std::min(std::countr_zero(BitsPerEntry), 6);
+        constexpr size_t LongsPerBlock = EntriesPerBlock * BitsPerEntry / 64;
+        size_t block_count = decoded_size / EntriesPerBlock;
+        for (size_t block = 0; block < block_count; block++) {
+            [&]<size_t... Entries>(std::index_sequence<Entries...>) {
+                (encode_dense_entry<BitsPerEntry, Entries>(decoded, encoded), ...);
+            }(std::make_index_sequence<EntriesPerBlock>());
+            decoded += EntriesPerBlock;
+            encoded += LongsPerBlock;
+        }
+        encode_long_array_generic(decoded, encoded, 0, decoded_size - block_count * EntriesPerBlock, BitsPerEntry, true);
+    }
+
+    // Encode a padded long array with a fixed number of bits per entry.
+    template <std::uint8_t BitsPerEntry, typename decodedT>
+    void encode_long_array_padded_fixed(const decodedT* decoded, std::uint64_t* encoded, size_t decoded_size)
+    {
+        constexpr size_t EntriesPerLong = 64 / BitsPerEntry;
+        constexpr std::uint64_t Mask = ~0ull >> (64 - BitsPerEntry);
+        size_t long_count = decoded_size / EntriesPerLong;
+        for (size_t long_index = 0; long_index < long_count; long_index++) {
+            encoded[long_index] = [&]<size_t... Offsets>(std::index_sequence<Offsets...>) {
+                return (((static_cast<std::uint64_t>(decoded[Offsets]) & Mask) << (BitsPerEntry * Offsets)) | ...);
+            }(std::make_index_sequence<EntriesPerLong>());
+            decoded += EntriesPerLong;
+        }
+        encode_long_array_generic(decoded, encoded + long_count, 0, decoded_size - long_count * EntriesPerLong, BitsPerEntry, false);
+    }
+
+    template <typename decodedT>
+    using EncodeKernel = void (*)(const decodedT*, std::uint64_t*, size_t);
+
+    template <typename decodedT, size_t... Bits>
+    constexpr std::array<EncodeKernel<decodedT>, sizeof...(Bits)> make_dense_encode_kernels(std::index_sequence<Bits...>)
+    {
+        return { &encode_long_array_dense_fixed<Bits + 1, decodedT>... };
+    }
+
+    template <typename decodedT, size_t... Bits>
+    constexpr std::array<EncodeKernel<decodedT>, sizeof...(Bits)> make_padded_encode_kernels(std::index_sequence<Bits...>)
+    {
+        return { &encode_long_array_padded_fixed<Bits + 1, decodedT>... };
+    }
+} // namespace detail
+
 template <typename decodedT>
 void decode_long_array(
     const std::span<std::uint64_t>& encoded, // The long array to decode
@@ -56,33 +292,17 @@ void decode_long_array(
             dense ? "Dense encoded long array with " : "Encoded long array with " + std::to_string(bits_per_entry) + " bits per entry should contain " + std::to_string(encoded_len) + " longs but got " + std::to_string(encoded.size()) + ".");
     }
 
-    const std::uint64_t mask = ~0ull >> (64 - bits_per_entry);
-    if (dense) {
-        for (size_t decoded_index = 0; decoded_index < decoded.size(); decoded_index++) {
-            size_t bit_start = decoded_index * bits_per_entry;
-            size_t bit_stop = (decoded_index + 1) * bits_per_entry;
-            size_t long_start = bit_start / 64;
-            decodedT& value = decoded[decoded_index];
-            value = static_cast<decodedT>((encoded[long_start] >> (bit_start % 64)) & mask);
-            if ((long_start + 1) * 64 < bit_stop) {
-                // Overflows into the next long
-                size_t overflow_bits = bit_stop - (long_start + 1) * 64;
-                size_t previous_bits = bits_per_entry - overflow_bits;
-                value |= (encoded[long_start + 1] & (mask >> previous_bits)) << previous_bits;
-            }
-        }
-    } else {
-        size_t entries_per_long = 64 / bits_per_entry;
-        size_t decoded_index = 0;
-        for (const auto& encoded_value : encoded) {
-            for (
-                size_t offset = 0;
-                offset < entries_per_long && decoded_index < decoded.size();
-                offset++, decoded_index++) {
-                decoded[decoded_index] = static_cast<decodedT>((encoded_value >> (bits_per_entry * offset)) & mask);
-            }
-        }
+    size_t simd_size = 0;
+    if constexpr (std::is_same_v<decodedT, std::uint8_t> || std::is_same_v<decodedT, std::uint16_t> || std::is_same_v<decodedT, std::uint32_t>) {
+        simd_size = detail::decode_long_array_simd(encoded.data(), encoded.size(), decoded.data(), decoded.size(), bits_per_entry, dense);
     }
+    // The vector kernel stops on a long boundary so the rest can be decoded from there.
+    detail::decode_long_array_fixed(
+        encoded.data() + simd_size / (64 / bits_per_entry),
+        decoded.data() + simd_size,
+        decoded.size() - simd_size,
+        bits_per_entry,
+        dense);
 }
 
 // Encode the array to a long array with the specified number of bits. Extra bits are ignored.
@@ -100,45 +320,14 @@ void encode_long_array(
 
     // Set all values to 0
     std::fill(encoded.begin(), encoded.end(), 0);
-    const std::uint64_t mask = ~0ull >> (64 - bits_per_entry);
-    if (dense) {
-        for (size_t decoded_index = 0; decoded_index < decoded.size(); decoded_index++) {
-            // The bit in the array where the value starts
-            size_t bit_start = decoded_index * bits_per_entry;
-            // The bit in the array where the value stops
-            size_t bit_stop = bit_start + bits_per_entry;
-            // The long number that the value starts in
-            size_t long_start = bit_start / 64;
-            // The bit offset in the long where the value starts
-            size_t long_bit_offset = bit_start % 64;
-            // The bit in the array where the long stops
-            size_t long_bit_stop = (long_start + 1) * 64;
-            decodedT& value = decoded[decoded_index];
-            encoded[long_start] = (encoded[long_start] & ~(mask << long_bit_offset)) + ((value & mask) << long_bit_offset);
-            if (long_bit_stop < bit_stop) {
-                // Overflows into the next long
-                // The number of bits that overflow into the next long
-                size_t overflow_bits = bit_stop - long_bit_stop;
-                // The number of bits in the previous long
-                size_t previous_bits = bits_per_entry - overflow_bits;
-                encoded[long_start + 1] = (encoded[long_start + 1] & ~(mask >> previous_bits)) + ((value & mask) >> previous_bits);
-            }
-        }
+    if (detail::MaxFixedBitsPerEntry < bits_per_entry) {
+        detail::encode_long_array_generic(decoded.data(), encoded.data(), 0, decoded.size(), bits_per_entry, dense);
+    } else if (dense) {
+        static constexpr auto kernels = detail::make_dense_encode_kernels<std::remove_const_t<decodedT>>(std::make_index_sequence<detail::MaxFixedBitsPerEntry>());
+        kernels[bits_per_entry - 1](decoded.data(), encoded.data(), decoded.size());
     } else {
-        size_t entries_per_long = 64 / bits_per_entry;
-        size_t decoded_index = 0;
-        size_t long_count = (decoded.size() + entries_per_long - 1) / entries_per_long;
-        for (size_t encoded_index = 0; encoded_index < long_count; encoded_index++) {
-            auto& encoded_value = encoded[encoded_index];
-            encoded_value = 0;
-            for (
-                size_t offset = 0;
-                offset < entries_per_long && decoded_index < decoded.size();
-                offset++, decoded_index++) {
-                std::uint64_t value = decoded[decoded_index] & mask;
-                encoded_value += value << (bits_per_entry * offset);
-            }
-        }
+        static constexpr auto kernels = detail::make_padded_encode_kernels<std::remove_const_t<decodedT>>(std::make_index_sequence<detail::MaxFixedBitsPerEntry>());
+        kernels[bits_per_entry - 1](decoded.data(), encoded.data(), decoded.size());
     }
 }
 
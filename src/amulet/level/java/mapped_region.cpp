@@ -0,0 +1,199 @@
+#include <bit>
+#include <stdexcept>
+#include <string>
+
+#ifdef _WIN32
+#define WIN32_LEAN_AND_MEAN
+#define NOMINMAX
+#include <windows.h>
+#else
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#endif
+
+#include <amulet/nbt/nbt_encoding/binary.hpp>
+#include <amulet/nbt/string_encoding/string_encoding.hpp>
+
+#include <amulet/zlib/zlib.hpp>
+
+#include "mapped_region.hpp"
+
+// The size of a sector in a region file.
+static const size_t SectorSize = 4096;
+
+// The external bit in the compression type.
+static const std::uint8_t ExternalFlag = 128;
+
+namespace Amulet {
+namespace detail {
+
+#ifdef _WIN32
+    MappedRegionFile::MappedRegionFile(const std::filesystem::path& path)
+    {
+        HANDLE file = CreateFileW(path.c_str(), GENERIC_READ, FILE_SHARE_READ | FILE_SHARE_WRITE | FILE_SHARE_DELETE, nullptr, OPEN_EXISTING, FILE_ATTRIBUTE_NORMAL, nullptr);
+        if (file == INVALID_HANDLE_VALUE) {
+            throw std::runtime_error("Could not open region file " + path.string());
+        }
+        LARGE_INTEGER size;
+        if (!GetFileSizeEx(file, &size)) {
+            CloseHandle(file);
+            throw std::runtime_error("Could not get the size of region file " + path.string());
+        }
+        _size = static_cast<size_t>(size.QuadPart);
+        if (_size == 0) {
+            // Empty files cannot be mapped.
+            CloseHandle(file);
+            return;
+        }
+        HANDLE mapping = CreateFileMappingW(file, nullptr, PAGE_READONLY, 0, 0, nullptr);
+        CloseHandle(file);
+        if (mapping == nullptr) {
+            throw std::runtime_error("Could not map region file " + path.string());
+        }
+        // The view keeps the mapping and the file open.
+        _data = static_cast<const char*>(MapViewOfFile(mapping, FILE_MAP_READ, 0, 0, 0));
+        CloseHandle(mapping);
+        if (_data == nullptr) {
+            throw std::runtime_error("Could not map region file " + path.string());
+        }
+    }
+
+    MappedRegionFile::~MappedRegionFile()
+    {
+        if (_data) {
+            UnmapViewOfFile(_data);
+        }
+    }
+
+    void MappedRegionFile::prefetch() const
+    {
+        // PrefetchVirtualMemory needs Windows 8 and Windows 7 is still supported.
+    }
+#else
+    MappedRegionFile::MappedRegionFile(const std::filesystem::path& path)
+    {
+        int file = open(path.c_str(), O_RDONLY);
+        if (file == -1) {
+            throw std::runtime_error("Could not open region file " + path.string());
+        }
+        struct stat file_stat;
+        if (fstat(file, &file_stat) != 0) {
+            close(file);
+            throw std::runtime_error("Could not get the size of region file " + path.string());
+        }
+        _size = static_cast<size_t>(file_stat.st_size);
+        if (_size == 0) {
+            // Empty files cannot be mapped.
+            close(file);
+            return;
+        }
+        auto data = mmap(nullptr, _size, PROT_READ, MAP_SHARED, file, 0);
+        // The map keeps the file open.
+        close(file);
+        if (data == MAP_FAILED) {
+            throw std::runtime_error("Could not map region file " + path.string());
+        }
+        _data = static_cast<const char*>(data);
+    }
+
+    MappedRegionFile::~MappedRegionFile()
+    {
+        if (_data) {
+            munmap(const_cast<char*>(_data), _size);
+        }
+    }
+
+    void MappedRegionFile::prefetch() const
+    {
+        if (_data) {
+            madvise(const_cast<char*>(_data), _size, MADV_WILLNEED);
+        }
+    }
+#endif
+
+    // Read a big endian unsigned integer.
+    template <typename T>
+    static T read_big_endian(const char* data, size_t size)
+    {
+        T value = 0;
+        for (size_t i = 0; i < size; i++) {
+            value = (value << 8) | static_cast<std::uint8_t>(data[i]);
+        }
+        return value;
+    }
+
+    std::optional<std::pair<std::uint8_t, std::string_view>> MappedRegionFile::get_record(std::int64_t cx, std::int64_t cz) const
+    {
+        if (_size < 2 * SectorSize) {
+            // The header is incomplete so there are no chunks.
+            return std::nullopt;
+        }
+        auto location = read_big_endian<std::uint32_t>(_data + 4 * ((cx & 31) + (cz & 31) * 32), 4);
+        if (location == 0) {
+            return std::nullopt;
+        }
+        size_t offset = (location >> 8) * SectorSize;
+        if (offset < 2 * SectorSize || _size < offset + 5) {
+            throw std::runtime_error("Chunk " + std::to_string(cx) + ", " + std::to_string(cz) + " is outside the region file.");
+        }
+        auto length = read_big_endian<std::uint32_t>(_data + offset, 4);
+        if (length == 0 || _size < offset + 4 + length) {
+            throw std::runtime_error("Chunk " + std::to_string(cx) + ", " + std::to_string(cz) + " has an invalid length.");
+        }
+        auto compression_type = static_cast<std::uint8_t>(_data[offset + 4]);
+        return std::make_pair(compression_type, std::string_view(_data + offset + 5, length - 1));
+    }
+
+    std::shared_mutex& SharedRegionMap::get_mutex()
+    {
+        return _mutex;
+    }
+
+    std::shared_ptr<const MappedRegionFile> SharedRegionMap::get_file(const std::filesystem::path& path, bool prefetch)
+    {
+        std::lock_guard lock(_file_mutex);
+        if (!_file) {
+            auto file = std::make_shared<const MappedRegionFile>(path);
+            if (prefetch) {
+                file->prefetch();
+            }
+            _file = std::move(file);
+        }
+        return _file;
+    }
+
+    void SharedRegionMap::reset()
+    {
+        std::shared_ptr<const MappedRegionFile> file;
+        {
+            std::lock_guard lock(_file_mutex);
+            file = std::move(_file);
+        }
+        // The file is unmapped here if nothing else is using it.
+    }
+
+    std::optional<NBT::NamedTag> decode_region_record(std::uint8_t compression_type, std::string_view data)
+    {
+        if (compression_type & ExternalFlag) {
+            return std::nullopt;
+        }
+        switch (compression_type) {
+        case 1: // GZIP
+        case 2: // Deflate
+        {
+            std::string dst;
+            zlib::decompress_zlib_gzip(data, dst);
+            return NBT::decode_nbt(dst, std::endian::big, NBT::mutf8_to_utf8);
+        }
+        case 3: // None
+            // Decode directly from the mapped pages.
+            return NBT::decode_nbt(data, std::endian::big, NBT::mutf8_to_utf8);
+        default:
+            return std::nullopt;
+        }
+    }
+
+} // namespace detail
+} // namespace Amulet
@@ -0,0 +1,84 @@
+#pragma once
+
+#include <cstdint>
+#include <filesystem>
+#include <memory>
+#include <mutex>
+#include <optional>
+#include <shared_mutex>
+#include <string_view>
+#include <utility>
+
+#include <amulet/nbt/tag/named_tag.hpp>
+
+#include <amulet/level/dll.hpp>
+
+namespace Amulet {
+namespace detail {
+
+    // A read only memory map of a region file.
+    // Chunk records are decompressed directly from the mapped pages
+    // so the page cache is shared with other processes reading the same file.
+    // The file handle is closed once the file is mapped so a map does not count towards the open file limit.
+    class MappedRegionFile {
+    private:
+        const char* _data = nullptr;
+        size_t _size = 0;
+
+    public:
+        // Map the region file.
+        // Throws std::runtime_error if the file cannot be opened or mapped.
+        AMULET_LEVEL_EXPORT MappedRegionFile(const std::filesystem::path& path);
+        MappedRegionFile(const MappedRegionFile&) = delete;
+        MappedRegionFile& operator=(const MappedRegionFile&) = delete;
+        AMULET_LEVEL_EXPORT ~MappedRegionFile();
+
+        // Ask the operating system to read the whole file into memory in the background.
+        // This is a hint and does nothing where it is not supported.
+        AMULET_LEVEL_EXPORT void prefetch() const;
+
+        // Get the compression type and compressed data of a chunk.
+        // Coordinates are in world space.
+        // Returns nullopt if the chunk does not exist.
+        // Throws std::runtime_error if the record extends past the end of the file.
+        AMULET_LEVEL_EXPORT std::optional<std::pair<std::uint8_t, std::string_view>> get_record(std::int64_t cx, std::int64_t cz) const;
+    };
+
+    // The memory map of one region file shared between raw chunk reads.
+    // The file is mapped on the first read and the map is kept until the region file is written.
+    class SharedRegionMap {
+    private:
+        std::shared_mutex _mutex;
+        std::mutex _file_mutex;
+        std::shared_ptr<const MappedRegionFile> _file;
+
+    public:
+        SharedRegionMap() = default;
+        SharedRegionMap(const SharedRegionMap&) = delete;
+        SharedRegionMap& operator=(const SharedRegionMap&) = delete;
+
+        // Reads from the map hold this in shared mode.
+        // Writes to the region file hold this in unique mode, call reset, write and then close the region.
+        // Thread safe.
+        AMULET_LEVEL_EXPORT std::shared_mutex& get_mutex();
+
+        // Get the map, mapping the file at path if it is not mapped.
+        // Writers must close the region before releasing the unique lock so that the file contains their writes.
+        // If prefetch is true and the file is mapped by this call the whole file is prefetched.
+        // Throws std::runtime_error if the file cannot be opened or mapped.
+        // Shared lock required.
+        AMULET_LEVEL_EXPORT std::shared_ptr<const MappedRegionFile> get_file(const std::filesystem::path& path, bool prefetch);
+
+        // Discard the map. The next read maps the file again.
+        // The file is unmapped once no reader is using it.
+        // Thread safe.
+        AMULET_LEVEL_EXPORT void reset();
+    };
+
+    // Decode a chunk record.
+    // Returns nullopt if the record is stored externally or uses a compression format not supported here.
+    // The caller should read those records through the region file.
+    AMULET_LEVEL_EXPORT std::optional<NBT::NamedTag> decode_region_record(std::uint8_t compression_type, std::string_view data);
+
+} // namespace detail
+} // namespace Amulet
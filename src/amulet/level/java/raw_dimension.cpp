@@ -1,8 +1,28 @@
+#include <algorithm>
 #include <mutex>
+#include <iterator>
+#include <numeric>
 #include <shared_mutex>
+#include <stdexcept>
+#include <tuple>
 
+#include "mapped_region.hpp"
 #include "raw_dimension.hpp"
 
+// Get the position of the chunk in the region file order.
+// Chunks are sorted by region and then by their index in the region header.
+static std::tuple<std::int64_t, std::int64_t, std::int64_t> get_region_order(const std::pair<std::int64_t, std::int64_t>& chunk_coord)
+{
+    const auto& [cx, cz] = chunk_coord;
+    return std::make_tuple(cx >> 5, cz >> 5, (cz & 31) * 32 + (cx & 31));
+}
+
+// Is the layer name valid for a new layer.
+static bool is_valid_layer_name(const std::string& layer_name)
+{
+    return std::all_of(layer_name.begin(), layer_name.end(), [](char c) { return 'a' <= c && c <= 'z'; });
+}
+
 namespace Amulet {
 
 JavaRawDimension::~JavaRawDimension()
@@ -57,10 +77,23 @@ void JavaRawDimension::delete_chunk(std::int64_t cx, std::int64_t cz)
     auto& mutex = _anvil_dimension.get_mutex();
     mutex.lock<ThreadAccessMode::ReadWrite, ThreadShareMode::SharedReadWrite>();
     std::lock_guard lock(mutex, std::adopt_lock);
+    std::vector<RegionKey> region_keys;
+    for (const auto& layer_name : _anvil_dimension.layer_names()) {
+        region_keys.emplace_back(layer_name, cx >> 5, cz >> 5);
+    }
+    auto region_map_locks = _reset_region_maps(region_keys);
     _anvil_dimension.delete_chunk(cx, cz);
+    _close_regions(region_keys);
 }
 JavaRawChunk JavaRawDimension::get_raw_chunk(std::int64_t cx, std::int64_t cz)
 {
+    if (_mmap_enabled) {
+        auto chunks = get_raw_chunks({ std::make_pair(cx, cz) });
+        if (!chunks[0]) {
+            throw RegionEntryDoesNotExist("Chunk " + std::to_string(cx) + ", " + std::to_string(cz) + " does not exist.");
+        }
+        return std::move(*chunks[0]);
+    }
     auto& mutex = _anvil_dimension.get_mutex();
     mutex.lock<ThreadAccessMode::Read, ThreadShareMode::SharedReadWrite>();
     std::lock_guard lock(mutex, std::adopt_lock);
@@ -71,14 +104,248 @@ void JavaRawDimension::set_raw_chunk(std::int64_t cx, std::int64_t cz, const Jav
     auto& mutex = _anvil_dimension.get_mutex();
     mutex.lock<ThreadAccessMode::ReadWrite, ThreadShareMode::SharedReadWrite>();
     std::lock_guard lock(mutex, std::adopt_lock);
+    std::vector<RegionKey> region_keys;
+    for (const auto& [layer_name, tag] : chunk) {
+        region_keys.emplace_back(layer_name, cx >> 5, cz >> 5);
+    }
+    auto region_map_locks = _reset_region_maps(region_keys);
     _anvil_dimension.set_chunk_data(cx, cz, chunk);
+    _close_regions(region_keys);
+}
+bool JavaRawDimension::get_mmap_enabled() const
+{
+    return _mmap_enabled;
+}
+
+void JavaRawDimension::set_mmap_enabled(bool enabled)
+{
+    _mmap_enabled = enabled;
+    if (!enabled) {
+        // Release the maps. Readers still using a map keep it until they finish.
+        std::lock_guard lock(_region_maps_mutex);
+        for (auto& [key, region_map] : _region_maps) {
+            region_map->reset();
+        }
+    }
+}
+
+std::shared_ptr<detail::SharedRegionMap> JavaRawDimension::_get_region_map(const RegionKey& region_key)
+{
+    std::lock_guard lock(_region_maps_mutex);
+    auto& region_map = _region_maps[region_key];
+    if (!region_map) {
+        region_map = std::make_shared<detail::SharedRegionMap>();
+    }
+    return region_map;
+}
+
+std::vector<std::unique_lock<std::shared_mutex>> JavaRawDimension::_reset_region_maps(std::vector<RegionKey> region_keys)
+{
+    // Lock in key order so that two writers cannot each hold a lock the other is waiting for.
+    std::sort(region_keys.begin(), region_keys.end());
+    region_keys.erase(std::unique(region_keys.begin(), region_keys.end()), region_keys.end());
+    std::vector<std::unique_lock<std::shared_mutex>> locks;
+    locks.reserve(region_keys.size());
+    for (const auto& region_key : region_keys) {
+        // The map is kept in _region_maps until the instance is destroyed so the mutex outlives the lock.
+        auto region_map = _get_region_map(region_key);
+        locks.emplace_back(region_map->get_mutex());
+        region_map->reset();
+    }
+    return locks;
+}
+
+void JavaRawDimension::_close_regions(const std::vector<RegionKey>& region_keys)
+{
+    for (const auto& [layer_name, rx, rz] : region_keys) {
+        if (!_anvil_dimension.has_layer(layer_name)) {
+            continue;
+        }
+        auto layer = _anvil_dimension.get_layer(layer_name);
+        OrderedLockGuard<ThreadAccessMode::ReadWrite, ThreadShareMode::SharedReadWrite> layer_lock(layer->get_mutex());
+        if (!layer->has_region(rx, rz)) {
+            continue;
+        }
+        auto region = layer->get_region(rx, rz);
+        OrderedLockGuard<ThreadAccessMode::ReadWrite, ThreadShareMode::SharedReadWrite> region_lock(region->get_mutex());
+        region->close();
+    }
+}
+
+BlockPaletteCache& JavaRawDimension::get_block_palette_cache()
+{
+    return _block_palette_cache;
 }
+
+size_t JavaRawDimension::get_decoded_section_count() const
+{
+    return _decoded_section_count;
+}
+
+size_t JavaRawDimension::get_uniform_section_count() const
+{
+    return _uniform_section_count;
+}
+
+std::vector<std::optional<JavaRawChunk>> JavaRawDimension::get_raw_chunks(const std::vector<std::pair<std::int64_t, std::int64_t>>& chunk_coords)
+{
+    // The indexes of the chunks sorted by region file order.
+    std::vector<size_t> order(chunk_coords.size());
+    std::iota(order.begin(), order.end(), 0);
+    std::stable_sort(order.begin(), order.end(), [&chunk_coords](size_t a, size_t b) {
+        return get_region_order(chunk_coords[a]) < get_region_order(chunk_coords[b]);
+    });
+
+    auto& mutex = _anvil_dimension.get_mutex();
+    mutex.lock<ThreadAccessMode::Read, ThreadShareMode::SharedReadWrite>();
+    std::lock_guard lock(mutex, std::adopt_lock);
+    if (_anvil_dimension.is_destroyed()) {
+        throw std::runtime_error("This JavaRawDimension instance has been destroyed.");
+    }
+
+    bool mmap_enabled = _mmap_enabled;
+    std::vector<std::optional<JavaRawChunk>> chunks(chunk_coords.size());
+    for (const auto& layer_name : _anvil_dimension.layer_names()) {
+        auto layer = _anvil_dimension.get_layer(layer_name);
+        OrderedLockGuard<ThreadAccessMode::Read, ThreadShareMode::SharedReadWrite> layer_lock(layer->get_mutex());
+        auto it = order.begin();
+        while (it != order.end()) {
+            // Find the chunks in this region.
+            auto rx = chunk_coords[*it].first >> 5;
+            auto rz = chunk_coords[*it].second >> 5;
+            auto region_end = std::find_if(it, order.end(), [&](size_t index) {
+                return (chunk_coords[index].first >> 5) != rx || (chunk_coords[index].second >> 5) != rz;
+            });
+            if (layer->has_region(rx, rz)) {
+                auto region = layer->get_region(rx, rz);
+                OrderedLockGuard<ThreadAccessMode::Read, ThreadShareMode::SharedReadWrite> region_lock(region->get_mutex());
+                auto add_tag = [&chunks, &layer_name](size_t index, NBT::NamedTag tag) {
+                    auto& chunk = chunks[index];
+                    if (!chunk) {
+                        chunk.emplace();
+                    }
+                    chunk->emplace(layer_name, std::move(tag));
+                };
+                if (mmap_enabled) {
+                    // The map is shared with other reads of this region and is reset when the region is written.
+                    auto region_map = _get_region_map(std::make_tuple(layer_name, rx, rz));
+                    std::shared_lock region_map_lock(region_map->get_mutex());
+                    // Prefetch the file when more than two chunks are read from it.
+                    auto mapped_region = region_map->get_file(region->path(), 2 < std::distance(it, region_end));
+                    for (; it != region_end; it++) {
+                        const auto& [cx, cz] = chunk_coords[*it];
+                        auto record = mapped_region->get_record(cx, cz);
+                        if (!record) {
+                            continue;
+                        }
+                        auto tag = detail::decode_region_record(record->first, record->second);
+                        if (!tag) {
+                            // This format must be read through the region.
+                            tag = region->get_value(cx, cz);
+                        }
+                        add_tag(*it, std::move(*tag));
+                    }
+                } else {
+                    for (; it != region_end; it++) {
+                        const auto& [cx, cz] = chunk_coords[*it];
+                        if (region->has_value(cx, cz)) {
+                            add_tag(*it, region->get_value(cx, cz));
+                        }
+                    }
+                }
+            }
+            it = region_end;
+        }
+    }
+    return chunks;
+}
+
+void JavaRawDimension::set_raw_chunks(const std::map<std::pair<std::int64_t, std::int64_t>, JavaRawChunk>& chunks)
+{
+    // Group the tags by layer.
+    // Invalid layer names are rejected before anything is written.
+    std::map<std::string, std::vector<std::pair<std::pair<std::int64_t, std::int64_t>, const NBT::NamedTag*>>> layers;
+    for (const auto& [chunk_coord, chunk] : chunks) {
+        for (const auto& [layer_name, tag] : chunk) {
+            if (!is_valid_layer_name(layer_name)) {
+                throw std::invalid_argument("Anvil layer contains characters not in the range a-z");
+            }
+            layers[layer_name].emplace_back(chunk_coord, &tag);
+        }
+    }
+
+    auto& mutex = _anvil_dimension.get_mutex();
+    bool has_layers;
+    {
+        OrderedLockGuard<ThreadAccessMode::Read, ThreadShareMode::SharedReadWrite> lock(mutex);
+        has_layers = std::all_of(layers.begin(), layers.end(), [this](const auto& value) { return _anvil_dimension.has_layer(value.first); });
+    }
+    if (!has_layers) {
+        // get_layer only holds a shared lock on the layer map when it creates a layer.
+        // Create the missing layers while no other thread is using the dimension.
+        mutex.lock<ThreadAccessMode::ReadWrite, ThreadShareMode::Unique>();
+        std::lock_guard lock(mutex, std::adopt_lock);
+        if (_anvil_dimension.is_destroyed()) {
+            throw std::runtime_error("This JavaRawDimension instance has been destroyed.");
+        }
+        for (const auto& [layer_name, tags] : layers) {
+            _anvil_dimension.get_layer(layer_name, true);
+        }
+    }
+
+    mutex.lock<ThreadAccessMode::ReadWrite, ThreadShareMode::SharedReadWrite>();
+    std::lock_guard lock(mutex, std::adopt_lock);
+    if (_anvil_dimension.is_destroyed()) {
+        throw std::runtime_error("This JavaRawDimension instance has been destroyed.");
+    }
+
+    for (auto& [layer_name, tags] : layers) {
+        // Sort the tags into region file order.
+        std::stable_sort(tags.begin(), tags.end(), [](const auto& a, const auto& b) {
+            return get_region_order(a.first) < get_region_order(b.first);
+        });
+        auto layer = _anvil_dimension.get_layer(layer_name);
+        OrderedLockGuard<ThreadAccessMode::ReadWrite, ThreadShareMode::SharedReadWrite> layer_lock(layer->get_mutex());
+        auto it = tags.begin();
+        while (it != tags.end()) {
+            // Find the chunks in this region.
+            auto rx = it->first.first >> 5;
+            auto rz = it->first.second >> 5;
+            auto region_end = std::find_if(it, tags.end(), [&](const auto& value) {
+                return (value.first.first >> 5) != rx || (value.first.second >> 5) != rz;
+            });
+            auto region_map_locks = _reset_region_maps({ std::make_tuple(layer_name, rx, rz) });
+            auto region = layer->get_region(rx, rz, true);
+            OrderedLockGuard<ThreadAccessMode::ReadWrite, ThreadShareMode::SharedReadWrite> region_lock(region->get_mutex());
+            for (; it != region_end; it++) {
+                const auto& [cx, cz] = it->first;
+                region->set_value(cx, cz, *it->second);
+            }
+            // Flush the writes so that they are in the file when it is next mapped.
+            region->close();
+        }
+    }
+}
+
 void JavaRawDimension::compact()
 {
     auto& mutex = _anvil_dimension.get_mutex();
     mutex.lock<ThreadAccessMode::ReadWrite, ThreadShareMode::SharedReadOnly>();
     std::lock_guard lock(mutex, std::adopt_lock);
+    // Compacting truncates the file. Reading a truncated page through a map is an error
+    // and Windows does not allow a mapped file to be truncated.
+    std::vector<RegionKey> region_keys;
+    for (const auto& layer_name : _anvil_dimension.layer_names()) {
+        auto layer = _anvil_dimension.get_layer(layer_name);
+        OrderedLockGuard<ThreadAccessMode::Read, ThreadShareMode::SharedReadWrite> layer_lock(layer->get_mutex());
+        for (auto it = layer->all_region_coords(); it != AnvilRegionCoordIterator(); it++) {
+            auto [rx, rz] = *it;
+            region_keys.emplace_back(layer_name, rx, rz);
+        }
+    }
+    auto region_map_locks = _reset_region_maps(region_keys);
     _anvil_dimension.compact();
+    _close_regions(region_keys);
 }
 
 void JavaRawDimension::destroy()
@@ -86,6 +353,8 @@ void JavaRawDimension::destroy()
     _destroyed = true;
     std::lock_guard lock(_anvil_dimension.get_mutex());
     _anvil_dimension.destroy();
+    std::lock_guard region_maps_lock(_region_maps_mutex);
+    _region_maps.clear();
 }
 
 bool JavaRawDimension::is_destroyed()
@@ -1,9 +1,18 @@
 #pragma once
 
+#include <atomic>
 #include <cstdint>
 #include <filesystem>
 #include <map>
+#include <memory>
+#include <mutex>
+#include <optional>
+#include <shared_mutex>
 #include <string>
+#include <tuple>
+#include <unordered_map>
+#include <utility>
+#include <vector>
 
 #include <amulet/nbt/tag/named_tag.hpp>
 
@@ -18,7 +27,10 @@
 #include <amulet/level/dll.hpp>
 #include <amulet/level/abc/dimension.hpp>
 
+#include "block_palette_cache.hpp"
 #include "chunk.hpp"
+#include "decode_context.hpp"
+#include "mapped_region.hpp"
 
 namespace Amulet {
 
@@ -36,6 +48,37 @@ private:
     BlockStack _default_block;
     Biome _default_biome;
     bool _destroyed = false;
+    std::atomic<bool> _mmap_enabled = false;
+    BlockPaletteCache _block_palette_cache;
+    std::atomic<size_t> _decoded_section_count = 0;
+    std::atomic<size_t> _uniform_section_count = 0;
+
+    // Mutex to lock _decode_contexts.
+    std::shared_mutex _decode_contexts_mutex;
+    std::unordered_map<std::int64_t, std::shared_ptr<const JavaDecodeContext>> _decode_contexts;
+
+    // A region file identified by its layer name and region coordinates.
+    using RegionKey = std::tuple<std::string, std::int64_t, std::int64_t>;
+
+    // Mutex to lock _region_maps.
+    std::mutex _region_maps_mutex;
+    // The memory map of each region file.
+    // An entry is created the first time a region is read or written and is kept until the instance is destroyed.
+    std::map<RegionKey, std::shared_ptr<detail::SharedRegionMap>> _region_maps;
+
+    // Get the region map for a region file.
+    // Thread safe.
+    std::shared_ptr<detail::SharedRegionMap> _get_region_map(const RegionKey& region_key);
+
+    // Discard the maps of the region files and lock them so that they are not mapped again.
+    // The returned locks must be held until the region files have been written and closed.
+    // Thread safe.
+    std::vector<std::unique_lock<std::shared_mutex>> _reset_region_maps(std::vector<RegionKey> region_keys);
+
+    // Close the region files so that their buffered writes are in the file when it is next mapped.
+    // Region files that do not exist are skipped.
+    // External ReadWrite:SharedReadWrite lock required.
+    void _close_regions(const std::vector<RegionKey>& region_keys);
 
     template <typename layersT>
     JavaRawDimension(
@@ -117,6 +160,49 @@ public:
     // External ReadWrite:SharedReadWrite lock required.
     AMULET_LEVEL_EXPORT void set_raw_chunk(std::int64_t cx, std::int64_t cz, const JavaRawChunk& chunk);
 
+    // Are raw chunk reads served from memory mapped region files.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT bool get_mmap_enabled() const;
+
+    // Enable or disable reading raw chunks from memory mapped region files.
+    // When enabled, get_raw_chunk and get_raw_chunks decompress directly from the mapped pages.
+    // This avoids copying each record into a buffer and shares the page cache with other processes.
+    // Each region file is mapped once and the map is reused until the region is written to or compacted.
+    // Disabling this releases the maps.
+    // Records stored in external files or compressed with LZ4 are read through the region file.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT void set_mmap_enabled(bool enabled);
+
+    // Get many raw chunks from this dimension.
+    // The chunks are read one region file at a time in the order they are stored in the region header.
+    // Each region file is looked up and locked once per batch.
+    // Returns the chunks in the order requested. nullopt if the chunk does not exist.
+    // External Read:SharedReadWrite lock required.
+    AMULET_LEVEL_EXPORT std::vector<std::optional<JavaRawChunk>> get_raw_chunks(const std::vector<std::pair<std::int64_t, std::int64_t>>& chunk_coords);
+
+    // Set many chunks in this dimension from raw data.
+    // The chunks are written one region file at a time in the order they are stored in the region header.
+    // Each region file is looked up and locked once per batch.
+    // External ReadWrite:SharedReadWrite lock required.
+    AMULET_LEVEL_EXPORT void set_raw_chunks(const std::map<std::pair<std::int64_t, std::int64_t>, JavaRawChunk>& chunks);
+
+    // The cache of decoded block palette entries used by decode_chunk.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT BlockPaletteCache& get_block_palette_cache();
+
+    // Get the values chunk decoding needs for a data version.
+    // The context is built on the first call for each data version and reused after that.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT std::shared_ptr<const JavaDecodeContext> get_decode_context(std::int64_t data_version);
+
+    // The number of block sections decode_chunk has decoded.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT size_t get_decoded_section_count() const;
+
+    // The number of decoded block sections that contained one block and skipped unpacking.
+    // Thread safe.
+    AMULET_LEVEL_EXPORT size_t get_uniform_section_count() const;
+
     // Decode a raw chunk to a chunk object.
     // TODO: thread safety
     AMULET_LEVEL_EXPORT std::unique_ptr<JavaChunk> decode_chunk(const JavaRawChunk& raw_chunk, std::int64_t cx, std::int64_t cz);
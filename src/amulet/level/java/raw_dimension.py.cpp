@@ -2,6 +2,7 @@
 #include <pybind11/stl.h>
 
 #include <memory>
+#include <utility>
 
 #include <amulet/pybind11_extensions/nogil_holder.hpp>
 
@@ -52,8 +53,12 @@ py::module init_java_raw_dimension(py::module m_parent)
     JavaRawDimension.def_property_readonly(
         "all_chunk_coords",
         [](const Amulet::JavaRawDimension& self) {
+            auto chunk_coords = [&self] {
+                py::gil_scoped_release nogil;
+                return self.all_chunk_coords();
+            }();
             return py::make_iterator(
-                self.all_chunk_coords(),
+                std::move(chunk_coords),
                 Amulet::AnvilChunkCoordIterator());
         },
         py::doc("An iterator of all chunk coordinates in the dimension.\n"
@@ -64,6 +69,7 @@ py::module init_java_raw_dimension(py::module m_parent)
         &Amulet::JavaRawDimension::has_chunk,
         py::arg("cx"),
         py::arg("cz"),
+        py::call_guard<py::gil_scoped_release>(),
         py::doc("Does the chunk exist in this dimension.\n"
                 "External Read:SharedReadWrite lock required.\n"
                 "External Read:SharedReadOnly lock optional."));
@@ -72,6 +78,7 @@ py::module init_java_raw_dimension(py::module m_parent)
         &Amulet::JavaRawDimension::delete_chunk,
         py::arg("cx"),
         py::arg("cz"),
+        py::call_guard<py::gil_scoped_release>(),
         py::doc("Delete the chunk from this dimension.\n"
                 "External ReadWrite:SharedReadWrite lock required."));
     JavaRawDimension.def(
@@ -79,6 +86,7 @@ py::module init_java_raw_dimension(py::module m_parent)
         &Amulet::JavaRawDimension::get_raw_chunk,
         py::arg("cx"),
         py::arg("cz"),
+        py::call_guard<py::gil_scoped_release>(),
         py::doc("Get the raw chunk from this dimension.\n"
                 "External Read:SharedReadWrite lock required."));
     JavaRawDimension.def(
@@ -87,8 +95,76 @@ py::module init_java_raw_dimension(py::module m_parent)
         py::arg("cx"),
         py::arg("cz"),
         py::arg("chunk"),
+        py::call_guard<py::gil_scoped_release>(),
         py::doc("Set the chunk in this dimension from raw data.\n"
                 "External ReadWrite:SharedReadWrite lock required."));
+    JavaRawDimension.def_property(
+        "mmap_enabled",
+        &Amulet::JavaRawDimension::get_mmap_enabled,
+        &Amulet::JavaRawDimension::set_mmap_enabled,
+        py::doc("Are raw chunk reads served from memory mapped region files.\n"
+                "When enabled, get_raw_chunk and get_raw_chunks decompress directly from the mapped pages.\n"
+                "This avoids copying each record into a buffer and shares the page cache with other processes.\n"
+                "Each region file is mapped once and the map is reused until the region is written to or compacted.\n"
+                "Disabling this releases the maps.\n"
+                "Records stored in external files or compressed with LZ4 are read through the region file.\n"
+                "Thread safe."));
+    JavaRawDimension.def_property_readonly(
+        "palette_cache_hits",
+        [](Amulet::JavaRawDimension& self) {
+            return self.get_block_palette_cache().get_hits();
+        },
+        py::doc("The number of block palette entries decode_chunk found in the palette cache.\n"
+                "Thread safe."));
+    JavaRawDimension.def_property_readonly(
+        "palette_cache_misses",
+        [](Amulet::JavaRawDimension& self) {
+            return self.get_block_palette_cache().get_misses();
+        },
+        py::doc("The number of block palette entries decode_chunk had to translate.\n"
+                "Thread safe."));
+    JavaRawDimension.def_property_readonly(
+        "palette_cache_size",
+        [](Amulet::JavaRawDimension& self) {
+            return self.get_block_palette_cache().get_size();
+        },
+        py::doc("The number of block palette entries in the palette cache.\n"
+                "Thread safe."));
+    JavaRawDimension.def_property_readonly(
+        "decoded_section_count",
+        &Amulet::JavaRawDimension::get_decoded_section_count,
+        py::doc("The number of block sections decode_chunk has decoded.\n"
+                "Thread safe."));
+    JavaRawDimension.def_property_readonly(
+        "uniform_section_count",
+        &Amulet::JavaRawDimension::get_uniform_section_count,
+        py::doc("The number of decoded block sections that contained one block and skipped unpacking.\n"
+                "Thread safe."));
+    JavaRawDimension.def(
+        "clear_palette_cache",
+        [](Amulet::JavaRawDimension& self) {
+            self.get_block_palette_cache().clear();
+        },
+        py::call_guard<py::gil_scoped_release>(),
+        py::doc("Remove all entries from the palette cache and reset the counters.\n"
+                "Thread safe."));
+    JavaRawDimension.def(
+        "get_raw_chunks",
+        &Amulet::JavaRawDimension::get_raw_chunks,
+        py::arg("chunks"),
+        py::call_guard<py::gil_scoped_release>(),
+        py::doc("Get many raw chunks from this dimension.\n"
+                "The chunks are read one region file at a time in the order they are stored in the region header.\n"
+                "Returns the chunks in the order requested. None if the chunk does not exist.\n"
+                "External Read:SharedReadWrite lock required."));
+    JavaRawDimension.def(
+        "set_raw_chunks",
+        &Amulet::JavaRawDimension::set_raw_chunks,
+        py::arg("chunks"),
+        py::call_guard<py::gil_scoped_release>(),
+        py::doc("Set many chunks in this dimension from raw data.\n"
+                "The chunks are written one region file at a time in the order they are stored in the region header.\n"
+                "External ReadWrite:SharedReadWrite lock required."));
     JavaRawDimension.def(
         "decode_chunk",
         [](
@@ -114,6 +190,7 @@ py::module init_java_raw_dimension(py::module m_parent)
     JavaRawDimension.def(
         "compact",
         &Amulet::JavaRawDimension::compact,
+        py::call_guard<py::gil_scoped_release>(),
         py::doc("Compact the level.\n"
                 "External Read:SharedReadWrite lock required."));
     JavaRawDimension.def(
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import collections.abc
 import typing
 
 import amulet.core.biome
@@ -12,6 +13,12 @@ import amulet.utils.lock
 __all__ = ["JavaRawDimension"]
 
 class JavaRawDimension:
+    def clear_palette_cache(self) -> None:
+        """
+        Remove all entries from the palette cache and reset the counters.
+        Thread safe.
+        """
+
     def compact(self) -> None:
         """
         Compact the level.
@@ -54,6 +61,16 @@ class JavaRawDimension:
         External Read:SharedReadWrite lock required.
         """
 
+    def get_raw_chunks(
+        self, chunks: collections.abc.Sequence[tuple[int, int]]
+    ) -> list[dict[str, amulet.nbt.NamedTag] | None]:
+        """
+        Get many raw chunks from this dimension.
+        The chunks are read one region file at a time in the order they are stored in the region header.
+        Returns the chunks in the order requested. None if the chunk does not exist.
+        External Read:SharedReadWrite lock required.
+        """
+
     def has_chunk(self, cx: int, cz: int) -> bool:
         """
         Does the chunk exist in this dimension.
@@ -76,6 +93,18 @@ class JavaRawDimension:
         External ReadWrite:SharedReadWrite lock required.
         """
 
+    def set_raw_chunks(
+        self,
+        chunks: collections.abc.Mapping[
+            tuple[int, int], dict[str, amulet.nbt.NamedTag]
+        ],
+    ) -> None:
+        """
+        Set many chunks in this dimension from raw data.
+        The chunks are written one region file at a time in the order they are stored in the region header.
+        External ReadWrite:SharedReadWrite lock required.
+        """
+
     @property
     def all_chunk_coords(self) -> typing.Iterator[tuple[int, int]]:
         """
@@ -91,6 +120,13 @@ class JavaRawDimension:
         Thread safe.
         """
 
+    @property
+    def decoded_section_count(self) -> int:
+        """
+        The number of block sections decode_chunk has decoded.
+        Thread safe.
+        """
+
     @property
     def default_biome(self) -> amulet.core.biome.Biome:
         """
@@ -119,9 +155,51 @@ class JavaRawDimension:
         Thread safe.
         """
 
+    @property
+    def mmap_enabled(self) -> bool:
+        """
+        Are raw chunk reads served from memory mapped region files.
+        When enabled, get_raw_chunk and get_raw_chunks decompress directly from the mapped pages.
+        This avoids copying each record into a buffer and shares the page cache with other processes.
+        Each region file is mapped once and the map is reused until the region is written to or compacted.
+        Disabling this releases the maps.
+        Records stored in external files or compressed with LZ4 are read through the region file.
+        Thread safe.
+        """
+
+    @mmap_enabled.setter
+    def mmap_enabled(self, arg1: bool) -> None: ...
+    @property
+    def palette_cache_hits(self) -> int:
+        """
+        The number of block palette entries decode_chunk found in the palette cache.
+        Thread safe.
+        """
+
+    @property
+    def palette_cache_misses(self) -> int:
+        """
+        The number of block palette entries decode_chunk had to translate.
+        Thread safe.
+        """
+
+    @property
+    def palette_cache_size(self) -> int:
+        """
+        The number of block palette entries in the palette cache.
+        Thread safe.
+        """
+
     @property
     def relative_path(self) -> str:
         """
         The relative path to the dimension. eg. "DIM1".
         Thread safe.
         """
+
+    @property
+    def uniform_section_count(self) -> int:
+        """
+        The number of decoded block sections that contained one block and skipped unpacking.
+        Thread safe.
+        """
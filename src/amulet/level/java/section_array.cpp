@@ -0,0 +1,83 @@
+#include <algorithm>
+#include <cstddef>
+#include <limits>
+
+#if defined(__SSE2__) || defined(_M_X64) || (defined(_M_IX86_FP) && _M_IX86_FP >= 2)
+#define AMULET_SECTION_ARRAY_SSE2
+#include <emmintrin.h>
+#endif
+
+#include "section_array.hpp"
+
+namespace Amulet {
+namespace detail {
+
+    size_t find_index_out_of_range(std::span<const std::uint32_t> values, size_t limit)
+    {
+        auto is_invalid = [limit](std::uint32_t value) { return limit <= value; };
+        if (std::numeric_limits<std::uint32_t>::max() < limit) {
+            return values.size();
+        }
+        if (limit == 0) {
+            // Every value is invalid.
+            return 0;
+        }
+        size_t index = 0;
+#ifdef AMULET_SECTION_ARRAY_SSE2
+        // SSE2 only has a signed comparison so flip the sign bits to compare as unsigned.
+        const __m128i sign = _mm_set1_epi32(std::numeric_limits<std::int32_t>::min());
+        const __m128i max_valid = _mm_xor_si128(_mm_set1_epi32(static_cast<std::int32_t>(limit - 1)), sign);
+        __m128i invalid = _mm_setzero_si128();
+        for (; index + 4 <= values.size(); index += 4) {
+            __m128i value = _mm_loadu_si128(reinterpret_cast<const __m128i*>(values.data() + index));
+            invalid = _mm_or_si128(invalid, _mm_cmpgt_epi32(_mm_xor_si128(value, sign), max_valid));
+        }
+        if (_mm_movemask_epi8(invalid)) {
+            index = 0;
+        }
+#endif
+        // Without SSE2 or if an invalid value was found this finds the first invalid value.
+        return std::find_if(values.begin() + index, values.end(), is_invalid) - values.begin();
+    }
+
+    void remap_yzx_to_xyz(const std::uint32_t* yzx, std::uint32_t* xyz, const std::uint32_t* lut)
+    {
+        // Each Y layer is a 16x16 ZX tile that fits in the L1 cache.
+        // The lookups are done in source order and the tile is then transposed into 16 runs of Z, one for each X.
+        alignas(16) std::uint32_t tile[256];
+        for (size_t y = 0; y < 16; y++) {
+            const std::uint32_t* layer = yzx + y * 256;
+            for (size_t index = 0; index < 256; index++) {
+                tile[index] = lut[layer[index]];
+            }
+            std::uint32_t* column = xyz + y * 16;
+#ifdef AMULET_SECTION_ARRAY_SSE2
+            // Transpose the tile in 4x4 blocks.
+            for (size_t z = 0; z < 16; z += 4) {
+                for (size_t x = 0; x < 16; x += 4) {
+                    __m128i row0 = _mm_load_si128(reinterpret_cast<const __m128i*>(tile + (z + 0) * 16 + x));
+                    __m128i row1 = _mm_load_si128(reinterpret_cast<const __m128i*>(tile + (z + 1) * 16 + x));
+                    __m128i row2 = _mm_load_si128(reinterpret_cast<const __m128i*>(tile + (z + 2) * 16 + x));
+                    __m128i row3 = _mm_load_si128(reinterpret_cast<const __m128i*>(tile + (z + 3) * 16 + x));
+                    __m128i low01 = _mm_unpacklo_epi32(row0, row1);
+                    __m128i low23 = _mm_unpacklo_epi32(row2, row3);
+                    __m128i high01 = _mm_unpackhi_epi32(row0, row1);
+                    __m128i high23 = _mm_unpackhi_epi32(row2, row3);
+                    _mm_storeu_si128(reinterpret_cast<__m128i*>(column + (x + 0) * 256 + z), _mm_unpacklo_epi64(low01, low23));
+                    _mm_storeu_si128(reinterpret_cast<__m128i*>(column + (x + 1) * 256 + z), _mm_unpackhi_epi64(low01, low23));
+                    _mm_storeu_si128(reinterpret_cast<__m128i*>(column + (x + 2) * 256 + z), _mm_unpacklo_epi64(high01, high23));
+                    _mm_storeu_si128(reinterpret_cast<__m128i*>(column + (x + 3) * 256 + z), _mm_unpackhi_epi64(high01, high23));
+                }
+            }
+#else
+            for (size_t x = 0; x < 16; x++) {
+                for (size_t z = 0; z < 16; z++) {
+                    column[x * 256 + z] = tile[z * 16 + x];
+                }
+            }
+#endif
+        }
+    }
+
+} // namespace detail
+} // namespace Amulet
@@ -0,0 +1,21 @@
+#pragma once
+
+#include <cstdint>
+#include <span>
+
+#include <amulet/level/dll.hpp>
+
+namespace Amulet {
+namespace detail {
+
+    // Find the first value that is not less than limit.
+    // Returns values.size() if every value is less than limit.
+    // The common case where every value is valid is a single vectorised pass with no branches per value.
+    AMULET_LEVEL_EXPORT size_t find_index_out_of_range(std::span<const std::uint32_t> values, size_t limit);
+
+    // Look up each value of a 16x16x16 array stored in YZX order in lut and store the result in XYZ order.
+    // Every value in yzx must be a valid index into lut.
+    AMULET_LEVEL_EXPORT void remap_yzx_to_xyz(const std::uint32_t* yzx, std::uint32_t* xyz, const std::uint32_t* lut);
+
+} // namespace detail
+} // namespace Amulet
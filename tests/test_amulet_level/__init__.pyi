@@ -2,9 +2,9 @@ from __future__ import annotations
 
 import faulthandler as faulthandler
 
-from . import _test_amulet_level, test_abc
+from . import _test_amulet_level, test_abc, test_java
 
-__all__ = ["compiler_config", "faulthandler", "test_abc"]
+__all__ = ["compiler_config", "faulthandler", "test_abc", "test_java"]
 
 def _init() -> None: ...
 
@@ -5,6 +5,22 @@ from test_amulet_level.test_abc.test_history_ import (
     test_undo_overwrite,
     test_set_value_enum,
     test_set_values_enum,
+    test_max_undo_count,
+    test_max_undo_size,
+    test_reclaim,
+    test_delta,
+    test_shared_values,
+    test_cache,
+    test_get_values,
+    test_resource_key,
+    test_resource_table,
+    test_parallel,
+    test_write_behind,
+    test_emit_changes,
+    test_storage_options,
+    test_memory_storage,
+    test_lazy_storage,
+    test_set_initial_values,
 )
 
 
@@ -20,3 +36,51 @@ class HistoryTestCase(TestCase):
 
     def test_set_values_enum(self) -> None:
         test_set_values_enum()
+
+    def test_max_undo_count(self) -> None:
+        test_max_undo_count()
+
+    def test_max_undo_size(self) -> None:
+        test_max_undo_size()
+
+    def test_reclaim(self) -> None:
+        test_reclaim()
+
+    def test_delta(self) -> None:
+        test_delta()
+
+    def test_shared_values(self) -> None:
+        test_shared_values()
+
+    def test_cache(self) -> None:
+        test_cache()
+
+    def test_get_values(self) -> None:
+        test_get_values()
+
+    def test_resource_key(self) -> None:
+        test_resource_key()
+
+    def test_resource_table(self) -> None:
+        test_resource_table()
+
+    def test_parallel(self) -> None:
+        test_parallel()
+
+    def test_write_behind(self) -> None:
+        test_write_behind()
+
+    def test_emit_changes(self) -> None:
+        test_emit_changes()
+
+    def test_storage_options(self) -> None:
+        test_storage_options()
+
+    def test_memory_storage(self) -> None:
+        test_memory_storage()
+
+    def test_lazy_storage(self) -> None:
+        test_lazy_storage()
+
+    def test_set_initial_values(self) -> None:
+        test_set_initial_values()
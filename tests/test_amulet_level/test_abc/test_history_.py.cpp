@@ -1,9 +1,19 @@
 #include <pybind11/pybind11.h>
+#include <pybind11/stl.h>
 
+#include <algorithm>
+#include <atomic>
+#include <chrono>
+#include <filesystem>
 #include <initializer_list>
 #include <list>
 #include <map>
+#include <optional>
+#include <mutex>
+#include <shared_mutex>
+#include <stdexcept>
 #include <string>
+#include <thread>
 #include <type_traits>
 #include <vector>
 
@@ -141,8 +151,8 @@ static void test_history()
 
     // Test resetting
     history_manager.reset();
-    ASSERT_EQUAL(size_t, 0, layer_1->get_resources().size())
-    ASSERT_EQUAL(size_t, 0, layer_2->get_resources().size())
+    ASSERT_EQUAL(size_t, 0, layer_1->get_resource_count())
+    ASSERT_EQUAL(size_t, 0, layer_2->get_resource_count())
 
     layer_1->set_initial_value(key_1, "value_1_1");
     layer_1->set_initial_value(key_2, "value_1_2");
@@ -410,6 +420,944 @@ static void test_set_values_enum()
     ASSERT_EQUAL(std::string, "value_true_val", layer->get_value("value_true"))
 }
 
+static void test_max_undo_count()
+{
+    // Create the history manager.
+    Amulet::HistoryManager history_manager;
+    auto layer = history_manager.new_layer<std::string>();
+    history_manager.set_max_undo_count(2);
+    ASSERT_EQUAL(size_t, 2, history_manager.get_max_undo_count())
+
+    layer->set_initial_value("key", "val0");
+    for (size_t i = 1; i <= 4; i++) {
+        history_manager.create_undo_bin();
+        layer->set_value("key", "val" + std::to_string(i));
+    }
+
+    // Only the two most recent bins can be undone.
+    ASSERT_EQUAL(size_t, 2, history_manager.get_undo_count())
+    ASSERT_EQUAL(std::string, "val4", layer->get_value("key"))
+    history_manager.undo();
+    ASSERT_EQUAL(std::string, "val3", layer->get_value("key"))
+    history_manager.undo();
+    ASSERT_EQUAL(std::string, "val2", layer->get_value("key"))
+    ASSERT_EQUAL(size_t, 0, history_manager.get_undo_count())
+    ASSERT_EQUAL(size_t, 2, history_manager.get_redo_count())
+    ASSERT_RAISES(std::runtime_error, history_manager.undo())
+
+    // Modifying the base state must not create an undo point.
+    layer->set_value("key", "val5");
+    ASSERT_EQUAL(std::string, "val5", layer->get_value("key"))
+    ASSERT_EQUAL(size_t, 0, history_manager.get_undo_count())
+    ASSERT_EQUAL(size_t, 0, history_manager.get_redo_count())
+
+    history_manager.create_undo_bin();
+    layer->set_value("key", "val6");
+    history_manager.undo();
+    ASSERT_EQUAL(std::string, "val5", layer->get_value("key"))
+    history_manager.redo();
+    ASSERT_EQUAL(std::string, "val6", layer->get_value("key"))
+
+    // Reducing the limit drops the oldest bins.
+    history_manager.create_undo_bin();
+    layer->set_value("key", "val7");
+    ASSERT_EQUAL(size_t, 2, history_manager.get_undo_count())
+    history_manager.set_max_undo_count(1);
+    ASSERT_EQUAL(size_t, 1, history_manager.get_undo_count())
+    history_manager.undo();
+    ASSERT_EQUAL(std::string, "val6", layer->get_value("key"))
+    ASSERT_RAISES(std::runtime_error, history_manager.undo())
+}
+
+static void test_max_undo_size()
+{
+    // Create the history manager.
+    Amulet::HistoryManager history_manager;
+    auto layer = history_manager.new_layer<std::string>();
+    history_manager.set_max_undo_size(10);
+    ASSERT_EQUAL(size_t, 10, history_manager.get_max_undo_size())
+
+    layer->set_initial_value("key_1", "val0");
+    layer->set_initial_value("key_2", "val0");
+
+    // Each bin writes 8 bytes.
+    history_manager.create_undo_bin();
+    layer->set_values({ std::make_pair("key_1", "val1"), std::make_pair("key_2", "val1") });
+    history_manager.create_undo_bin();
+    layer->set_values({ std::make_pair("key_1", "val2"), std::make_pair("key_2", "val2") });
+    ASSERT_EQUAL(size_t, 2, history_manager.get_undo_count())
+    // The limit is checked when a new bin is created.
+    history_manager.create_undo_bin();
+    ASSERT_EQUAL(size_t, 2, history_manager.get_undo_count())
+    layer->set_value("key_1", "val3");
+
+    history_manager.undo();
+    ASSERT_EQUAL(std::string, "val2", layer->get_value("key_1"))
+    ASSERT_EQUAL(std::string, "val2", layer->get_value("key_2"))
+    history_manager.undo();
+    ASSERT_EQUAL(std::string, "val1", layer->get_value("key_1"))
+    ASSERT_EQUAL(std::string, "val1", layer->get_value("key_2"))
+    ASSERT_RAISES(std::runtime_error, history_manager.undo())
+    history_manager.redo();
+    history_manager.redo();
+    ASSERT_EQUAL(std::string, "val3", layer->get_value("key_1"))
+    ASSERT_EQUAL(std::string, "val2", layer->get_value("key_2"))
+
+    // The current bin is never dropped.
+    history_manager.set_max_undo_size(0);
+    ASSERT_EQUAL(size_t, 1, history_manager.get_undo_count())
+    history_manager.undo();
+    ASSERT_EQUAL(std::string, "val2", layer->get_value("key_1"))
+    ASSERT_RAISES(std::runtime_error, history_manager.undo())
+}
+
+static void test_reclaim()
+{
+    // Create the history manager.
+    Amulet::HistoryManager history_manager;
+    auto layer = history_manager.new_layer<std::string>();
+
+    layer->set_initial_value("key", "val0");
+    history_manager.create_undo_bin();
+    layer->set_value("key", "val1");
+    history_manager.create_undo_bin();
+    layer->set_value("key", "val2");
+
+    // Undo and overwrite the future. The old revisions are discarded.
+    history_manager.undo();
+    history_manager.undo();
+    layer->set_value("key", "val3");
+    history_manager.create_undo_bin();
+    layer->set_value("key", "val4");
+    history_manager.reclaim();
+
+    // Keys that were discarded and then rewritten must not be deleted.
+    ASSERT_EQUAL(std::string, "val4", layer->get_value("key"))
+    history_manager.undo();
+    ASSERT_EQUAL(std::string, "val3", layer->get_value("key"))
+    history_manager.redo();
+
+    // Reset discards everything.
+    history_manager.reset();
+    layer->set_initial_value("key", "val5");
+    history_manager.reclaim();
+    ASSERT_EQUAL(std::string, "val5", layer->get_value("key"))
+}
+
+static void test_delta()
+{
+    // Create the history manager.
+    Amulet::HistoryManager history_manager;
+    auto layer = history_manager.new_layer<std::string>(4);
+    ASSERT_RAISES(std::invalid_argument, history_manager.new_layer<std::string>(0))
+
+    // Each revision changes a few bytes of a large value.
+    std::vector<std::string> values;
+    std::string value(10000, 'a');
+    values.push_back(value);
+    layer->set_initial_value("key", value);
+    for (size_t i = 1; i < 20; i++) {
+        history_manager.create_undo_bin();
+        value[i * 100] = 'b';
+        if (i % 5 == 0) {
+            // Change the length.
+            value.insert(i * 10, "inserted");
+        }
+        if (i % 7 == 0) {
+            // Change the value twice in the same bin.
+            layer->set_value("key", "temporary");
+        }
+        values.push_back(value);
+        layer->set_value("key", value);
+        ASSERT_EQUAL(std::string, value, layer->get_value("key"))
+    }
+
+    // Undo and validate each revision.
+    for (size_t i = values.size() - 1; i > 0; i--) {
+        ASSERT_EQUAL(std::string, values[i], layer->get_value("key"))
+        history_manager.undo();
+    }
+    ASSERT_EQUAL(std::string, values[0], layer->get_value("key"))
+    for (size_t i = 1; i < values.size(); i++) {
+        history_manager.redo();
+        ASSERT_EQUAL(std::string, values[i], layer->get_value("key"))
+    }
+
+    // Dropping the oldest bins must not break the deltas that depend on them.
+    history_manager.set_max_undo_count(6);
+    for (size_t i = values.size() - 1; i > values.size() - 7; i--) {
+        ASSERT_EQUAL(std::string, values[i], layer->get_value("key"))
+        history_manager.undo();
+    }
+    ASSERT_EQUAL(std::string, values[values.size() - 7], layer->get_value("key"))
+    ASSERT_RAISES(std::runtime_error, history_manager.undo())
+
+    // Overwrite the base revision.
+    layer->set_value("key", "base");
+    ASSERT_EQUAL(std::string, "base", layer->get_value("key"))
+    history_manager.create_undo_bin();
+    layer->set_value("key", "base2");
+    history_manager.undo();
+    ASSERT_EQUAL(std::string, "base", layer->get_value("key"))
+}
+
+static void test_shared_values()
+{
+    // Create the history manager.
+    Amulet::HistoryManager history_manager;
+    auto layer = history_manager.new_layer<std::string>();
+    auto delta_layer = history_manager.new_layer<std::string>(4);
+
+    std::string value_a(4096, 'a');
+    std::string value_b(4096, 'b');
+
+    // Many resources with the same value.
+    for (size_t i = 0; i < 10; i++) {
+        layer->set_initial_value(std::to_string(i), value_a);
+        delta_layer->set_initial_value(std::to_string(i), value_a);
+    }
+    history_manager.create_undo_bin();
+    layer->set_values({ { "0", value_b }, { "1", value_b }, { "2", "small" } });
+    // Overwrite with the same value in the same bin.
+    layer->set_value("1", value_b);
+    delta_layer->set_value("0", value_b);
+    history_manager.create_undo_bin();
+    // Return to a previous value.
+    layer->set_value("0", value_a);
+    delta_layer->set_value("0", value_a);
+
+    ASSERT_EQUAL(std::string, value_a, layer->get_value("0"))
+    ASSERT_EQUAL(std::string, value_b, layer->get_value("1"))
+    ASSERT_EQUAL(std::string, "small", layer->get_value("2"))
+    ASSERT_EQUAL(std::string, value_a, layer->get_value("3"))
+    ASSERT_EQUAL(std::string, value_a, delta_layer->get_value("0"))
+    history_manager.undo();
+    ASSERT_EQUAL(std::string, value_b, layer->get_value("0"))
+    ASSERT_EQUAL(std::string, value_b, delta_layer->get_value("0"))
+    history_manager.undo();
+    ASSERT_EQUAL(std::string, value_a, layer->get_value("0"))
+    ASSERT_EQUAL(std::string, value_a, layer->get_value("1"))
+    ASSERT_EQUAL(std::string, value_a, layer->get_value("2"))
+    ASSERT_EQUAL(std::string, value_a, delta_layer->get_value("0"))
+
+    // Destroy the redo bins and wait for the unreferenced values to be deleted.
+    layer->set_value("1", "small");
+    history_manager.reclaim();
+    for (size_t i = 0; i < 10; i++) {
+        if (i != 1) {
+            ASSERT_EQUAL(std::string, value_a, layer->get_value(std::to_string(i)))
+        }
+        ASSERT_EQUAL(std::string, value_a, delta_layer->get_value(std::to_string(i)))
+    }
+
+    // Values that were deleted can be stored again.
+    history_manager.create_undo_bin();
+    layer->set_value("1", value_b);
+    history_manager.set_max_undo_count(0);
+    history_manager.reclaim();
+    ASSERT_EQUAL(std::string, value_b, layer->get_value("1"))
+    ASSERT_EQUAL(std::string, value_a, layer->get_value("0"))
+
+    // Reset everything.
+    history_manager.reset();
+    history_manager.reclaim();
+    layer->set_initial_value("0", value_b);
+    ASSERT_EQUAL(std::string, value_b, layer->get_value("0"))
+}
+
+static void test_cache()
+{
+    // Create the history manager.
+    Amulet::HistoryManager history_manager;
+    auto layer = history_manager.new_layer<std::string>();
+    auto delta_layer = history_manager.new_layer<std::string>(4);
+
+    // Written values are cached.
+    layer->set_initial_value("key", "value1");
+    delta_layer->set_initial_value("key", std::string(1000, 'a'));
+    size_t hits = history_manager.get_cache_hits();
+    size_t misses = history_manager.get_cache_misses();
+    ASSERT_EQUAL(std::string, "value1", layer->get_value("key"))
+    ASSERT_EQUAL(std::string, std::string(1000, 'a'), delta_layer->get_value("key"))
+    ASSERT_EQUAL(size_t, hits + 2, history_manager.get_cache_hits())
+    ASSERT_EQUAL(size_t, misses, history_manager.get_cache_misses())
+
+    // Undo and redo read the value of the other revision.
+    history_manager.create_undo_bin();
+    layer->set_value("key", "value2");
+    delta_layer->set_value("key", std::string(1000, 'b'));
+    ASSERT_EQUAL(std::string, "value2", layer->get_value("key"))
+    history_manager.undo();
+    ASSERT_EQUAL(std::string, "value1", layer->get_value("key"))
+    ASSERT_EQUAL(std::string, std::string(1000, 'a'), delta_layer->get_value("key"))
+    history_manager.redo();
+    ASSERT_EQUAL(std::string, "value2", layer->get_value("key"))
+    ASSERT_EQUAL(std::string, std::string(1000, 'b'), delta_layer->get_value("key"))
+
+    // Overwriting a revision replaces the cached value.
+    layer->set_values({ { "key", "value3" } });
+    ASSERT_EQUAL(std::string, "value3", layer->get_value("key"))
+
+    // Values are read from the database when the cache is disabled.
+    history_manager.set_max_cache_size(0);
+    ASSERT_EQUAL(size_t, 0, history_manager.get_max_cache_size())
+    hits = history_manager.get_cache_hits();
+    misses = history_manager.get_cache_misses();
+    ASSERT_EQUAL(std::string, "value3", layer->get_value("key"))
+    ASSERT_EQUAL(std::string, std::string(1000, 'b'), delta_layer->get_value("key"))
+    history_manager.undo();
+    ASSERT_EQUAL(std::string, "value1", layer->get_value("key"))
+    ASSERT_EQUAL(std::string, std::string(1000, 'a'), delta_layer->get_value("key"))
+    ASSERT_EQUAL(size_t, hits, history_manager.get_cache_hits())
+    ASSERT_EQUAL(bool, true, misses + 4 <= history_manager.get_cache_misses())
+
+    // Values larger than the cache are not cached.
+    // The limit is split evenly between the cache shards.
+    history_manager.set_max_cache_size(800);
+    ASSERT_EQUAL(std::string, "value1", layer->get_value("key"))
+    ASSERT_EQUAL(std::string, std::string(1000, 'a'), delta_layer->get_value("key"))
+    hits = history_manager.get_cache_hits();
+    ASSERT_EQUAL(std::string, "value1", layer->get_value("key"))
+    ASSERT_EQUAL(size_t, hits + 1, history_manager.get_cache_hits())
+    ASSERT_EQUAL(std::string, std::string(1000, 'a'), delta_layer->get_value("key"))
+    ASSERT_EQUAL(size_t, hits + 1, history_manager.get_cache_hits())
+}
+
+static void test_get_values()
+{
+    // Create the history manager.
+    Amulet::HistoryManager history_manager;
+    auto layer = history_manager.new_layer<std::string>(4);
+    history_manager.set_max_cache_size(0);
+
+    std::vector<std::string> keys;
+    std::map<std::string, std::string> values;
+    for (size_t i = 0; i < 20; i++) {
+        auto key = std::to_string(i);
+        keys.push_back(key);
+        values[key] = std::string(i * 10, static_cast<char>('a' + i));
+        layer->set_initial_value(key, values[key]);
+    }
+    history_manager.create_undo_bin();
+    for (size_t i = 0; i < 20; i += 3) {
+        auto key = std::to_string(i);
+        values[key] += "changed";
+        layer->set_value(key, values[key]);
+    }
+
+    // Values are returned in the requested order, not the key order.
+    std::ranges::reverse(keys);
+    keys.push_back("5");
+    auto result = layer->get_values(keys);
+    ASSERT_EQUAL(size_t, keys.size(), result.size())
+    for (size_t i = 0; i < keys.size(); i++) {
+        ASSERT_EQUAL(std::string, values[keys[i]], result[i])
+    }
+    result = layer->get_values({ "3", "4" });
+    ASSERT_EQUAL(size_t, 2, result.size())
+    ASSERT_EQUAL(std::string, values["3"], result[0])
+    ASSERT_EQUAL(std::string, values["4"], result[1])
+    ASSERT_EQUAL(size_t, 0, layer->get_values(std::vector<std::string>()).size())
+    ASSERT_RAISES(std::out_of_range, layer->get_values({ "3", "missing" }))
+
+    // Read the previous revision.
+    history_manager.undo();
+    result = layer->get_values({ "0", "1" });
+    ASSERT_EQUAL(std::string, std::string(0, 'a'), result[0])
+    ASSERT_EQUAL(std::string, std::string(10, 'b'), result[1])
+
+    // Read from the cache.
+    history_manager.set_max_cache_size(1024 * 1024);
+    layer->get_values({ "0", "1" });
+    size_t hits = history_manager.get_cache_hits();
+    result = layer->get_values({ "0", "1" });
+    ASSERT_EQUAL(size_t, hits + 2, history_manager.get_cache_hits())
+    ASSERT_EQUAL(std::string, std::string(10, 'b'), result[1])
+}
+
+static void test_resource_key()
+{
+    // Revisions sort in numerical order.
+    ASSERT_EQUAL(bool, true, Amulet::get_resource_key(1, std::string("key"), 255) < Amulet::get_resource_key(1, std::string("key"), 256))
+    ASSERT_EQUAL(bool, true, Amulet::get_resource_key(1, std::string("key"), 256) < Amulet::get_resource_key(1, std::string("key"), 1ull << 32))
+    // Layers sort in numerical order.
+    ASSERT_EQUAL(bool, true, Amulet::get_resource_key(255, std::string("key"), 0) < Amulet::get_resource_key(256, std::string("key"), 0))
+    // All revisions of a resource share the prefix.
+    auto prefix = Amulet::get_resource_prefix(1, std::string("key"));
+    ASSERT_EQUAL(std::string, prefix, Amulet::get_resource_key(1, std::string("key"), 1000).substr(0, prefix.size()))
+    ASSERT_EQUAL(size_t, prefix.size() + 8, Amulet::get_resource_key(1, std::string("key"), 1000).size())
+}
+
+static void test_resource_table()
+{
+    // Create the history manager.
+    Amulet::HistoryManager history_manager;
+    auto layer = history_manager.new_layer<std::string>();
+
+    // Add enough resources to grow the table several times.
+    for (size_t i = 0; i < 10000; i++) {
+        layer->set_initial_value(std::to_string(i), std::to_string(i));
+    }
+    ASSERT_EQUAL(size_t, 10000, layer->get_resource_count())
+    ASSERT_EQUAL(bool, false, layer->has_resource("10000"))
+    ASSERT_RAISES(std::out_of_range, layer->get_resource("10000"))
+    history_manager.create_undo_bin();
+    for (size_t i = 0; i < 10000; i += 7) {
+        layer->set_value(std::to_string(i), "changed");
+    }
+    for (size_t i = 0; i < 10000; i++) {
+        auto key = std::to_string(i);
+        ASSERT_EQUAL(bool, true, layer->has_resource(key))
+        ASSERT_EQUAL(std::string, i % 7 ? key : "changed", layer->get_value(key))
+    }
+
+    // The changed signal is emitted by emit_changes after undo and redo once something connects to it.
+    size_t changed_count = 0;
+    layer->set_value<Amulet::HistoryInitialisationMode::Empty>("new", "value");
+    // The tokens must be kept alive for the callbacks to be called.
+    auto token_0 = layer->get_resource_changed("0").connect([&changed_count] { changed_count++; });
+    auto token_1 = layer->get_resource_changed("1").connect([&changed_count] { changed_count++; });
+    history_manager.undo();
+    ASSERT_EQUAL(size_t, 0, changed_count)
+    history_manager.emit_changes();
+    ASSERT_EQUAL(size_t, 1, changed_count)
+    ASSERT_EQUAL(std::string, "0", layer->get_value("0"))
+    ASSERT_EQUAL(std::string, "", layer->get_value("new"))
+    history_manager.redo();
+    ASSERT_EQUAL(size_t, 1, changed_count)
+    history_manager.emit_changes();
+    ASSERT_EQUAL(size_t, 2, changed_count)
+    ASSERT_EQUAL(std::string, "changed", layer->get_value("0"))
+    ASSERT_EQUAL(std::string, "value", layer->get_value("new"))
+
+    // Reset removes all resources.
+    history_manager.reset();
+    ASSERT_EQUAL(size_t, 0, layer->get_resource_count())
+    ASSERT_EQUAL(bool, false, layer->has_resource("0"))
+}
+
+static void test_parallel()
+{
+    // Create the history manager.
+    Amulet::HistoryManager history_manager;
+    auto layer = history_manager.new_layer<std::string>(4);
+    history_manager.create_undo_bin();
+
+    // Write from multiple threads while holding the shared lock.
+    // Each thread writes its own resources and all threads write the same shared resources.
+    const size_t thread_count = 8;
+    const size_t resource_count = 100;
+    std::vector<std::thread> threads;
+    for (size_t t = 0; t < thread_count; t++) {
+        threads.emplace_back([&history_manager, &layer, t, resource_count] {
+            std::shared_lock lock(history_manager.get_mutex());
+            for (size_t i = 0; i < resource_count; i++) {
+                auto key = std::to_string(t) + "/" + std::to_string(i);
+                layer->set_value<Amulet::HistoryInitialisationMode::Empty>(key, key);
+                layer->set_values<Amulet::HistoryInitialisationMode::Empty>({
+                    { key + "/batch", key },
+                    { std::to_string(i), "shared" },
+                });
+            }
+        });
+    }
+    for (auto& thread : threads) {
+        thread.join();
+    }
+    threads.clear();
+
+    // Read from multiple threads while holding the shared lock.
+    std::atomic<size_t> error_count = 0;
+    for (size_t t = 0; t < thread_count; t++) {
+        threads.emplace_back([&history_manager, &layer, &error_count, t, resource_count] {
+            std::shared_lock lock(history_manager.get_mutex());
+            for (size_t i = 0; i < resource_count; i++) {
+                auto key = std::to_string(t) + "/" + std::to_string(i);
+                auto values = layer->get_values(std::vector<std::string> { key, key + "/batch", std::to_string(i) });
+                if (values[0] != key || values[1] != key || values[2] != "shared") {
+                    error_count++;
+                }
+            }
+        });
+    }
+    for (auto& thread : threads) {
+        thread.join();
+    }
+    ASSERT_EQUAL(size_t, 0, error_count)
+    ASSERT_EQUAL(size_t, thread_count * resource_count * 2 + resource_count, layer->get_resource_count())
+
+    // All changes were added to the same undo bin.
+    ASSERT_EQUAL(size_t, 1, history_manager.get_undo_count())
+    history_manager.undo();
+    for (size_t t = 0; t < thread_count; t++) {
+        for (size_t i = 0; i < resource_count; i++) {
+            auto key = std::to_string(t) + "/" + std::to_string(i);
+            ASSERT_EQUAL(std::string, "", layer->get_value(key))
+            ASSERT_EQUAL(std::string, "", layer->get_value(key + "/batch"))
+        }
+    }
+    history_manager.redo();
+    for (size_t t = 0; t < thread_count; t++) {
+        for (size_t i = 0; i < resource_count; i++) {
+            auto key = std::to_string(t) + "/" + std::to_string(i);
+            ASSERT_EQUAL(std::string, key, layer->get_value(key))
+            ASSERT_EQUAL(std::string, key, layer->get_value(key + "/batch"))
+            ASSERT_EQUAL(std::string, "shared", layer->get_value(std::to_string(i)))
+        }
+    }
+
+    // A write after undo from multiple threads invalidates the future once.
+    history_manager.undo();
+    for (size_t t = 0; t < thread_count; t++) {
+        threads.emplace_back([&history_manager, &layer, t] {
+            std::shared_lock lock(history_manager.get_mutex());
+            layer->set_value(std::to_string(t) + "/0", "changed");
+        });
+    }
+    for (size_t t = 0; t < thread_count; t++) {
+        threads[t + thread_count].join();
+    }
+    ASSERT_EQUAL(size_t, 0, history_manager.get_redo_count())
+    ASSERT_EQUAL(size_t, 0, history_manager.get_undo_count())
+    ASSERT_EQUAL(std::string, "changed", layer->get_value("0/0"))
+    ASSERT_EQUAL(std::string, "", layer->get_value("0/1"))
+}
+
+static void test_write_behind()
+{
+    // Create the history manager.
+    Amulet::HistoryManager history_manager;
+    auto layer = history_manager.new_layer<std::string>(4);
+    ASSERT_EQUAL(size_t, 0, history_manager.get_max_pending_size())
+    // Disable the cache so that values are read from the pending writes.
+    history_manager.set_max_cache_size(0);
+    // A small limit makes writers wait for the writer thread.
+    history_manager.set_max_pending_size(1000);
+    ASSERT_EQUAL(size_t, 1000, history_manager.get_max_pending_size())
+
+    std::map<std::string, std::string> values;
+    for (size_t i = 0; i < 100; i++) {
+        auto key = std::to_string(i);
+        values[key] = std::string(100 + i, static_cast<char>('a' + i % 26));
+        layer->set_initial_value(key, values[key]);
+        ASSERT_EQUAL(std::string, values[key], layer->get_value(key))
+    }
+    for (size_t revision = 0; revision < 5; revision++) {
+        history_manager.create_undo_bin();
+        std::list<std::pair<std::string, std::string>> batch;
+        for (size_t i = revision; i < 100; i += 3) {
+            auto key = std::to_string(i);
+            values[key] += std::to_string(revision);
+            if (i % 2) {
+                layer->set_value(key, values[key]);
+            } else {
+                batch.emplace_back(key, values[key]);
+            }
+        }
+        layer->set_values(batch);
+        for (const auto& [key, value] : values) {
+            ASSERT_EQUAL(std::string, value, layer->get_value(key))
+        }
+        auto read_values = layer->get_values(std::vector<std::string> { "0", "1", "2", "3" });
+        ASSERT_EQUAL(std::string, values["0"], read_values[0])
+        ASSERT_EQUAL(std::string, values["3"], read_values[3])
+    }
+
+    // Undo and redo read the written values.
+    for (size_t i = 0; i < 5; i++) {
+        history_manager.undo();
+    }
+    for (size_t i = 0; i < 100; i++) {
+        ASSERT_EQUAL(std::string, std::string(100 + i, static_cast<char>('a' + i % 26)), layer->get_value(std::to_string(i)))
+    }
+    for (size_t i = 0; i < 5; i++) {
+        history_manager.redo();
+    }
+    for (const auto& [key, value] : values) {
+        ASSERT_EQUAL(std::string, value, layer->get_value(key))
+    }
+
+    // Overwrite the undone revisions while their deletes may be pending.
+    history_manager.undo();
+    history_manager.reclaim();
+    layer->set_value("0", "new");
+    history_manager.set_max_undo_count(1);
+    history_manager.flush();
+    ASSERT_EQUAL(std::string, "new", layer->get_value("0"))
+
+    // Disabling write-behind writes the pending writes.
+    layer->set_value("1", "sync");
+    history_manager.set_max_pending_size(0);
+    ASSERT_EQUAL(size_t, 0, history_manager.get_max_pending_size())
+    layer->set_value("2", "sync");
+    ASSERT_EQUAL(std::string, "sync", layer->get_value("1"))
+    ASSERT_EQUAL(std::string, "sync", layer->get_value("2"))
+    history_manager.undo();
+    ASSERT_EQUAL(std::string, values["0"], layer->get_value("0"))
+}
+
+static void test_emit_changes()
+{
+    // Create the history manager.
+    Amulet::HistoryManager history_manager;
+    auto layer_1 = history_manager.new_layer<std::string>();
+    auto layer_2 = history_manager.new_layer<std::string>();
+
+    std::vector<std::vector<std::string>> events_1;
+    std::vector<std::vector<std::string>> events_2;
+    auto token_1 = layer_1->resources_changed.connect([&events_1](std::vector<std::string> resource_ids) {
+        events_1.push_back(std::move(resource_ids));
+    });
+    auto token_2 = layer_2->resources_changed.connect([&events_2](std::vector<std::string> resource_ids) {
+        events_2.push_back(std::move(resource_ids));
+    });
+
+    // Initial values are not changes.
+    for (size_t i = 0; i < 10; i++) {
+        layer_1->set_initial_value(std::to_string(i), "");
+    }
+    history_manager.emit_changes();
+    ASSERT_EQUAL(size_t, 0, events_1.size())
+
+    // Writes are coalesced until emit_changes is called.
+    history_manager.create_undo_bin();
+    layer_1->set_values({ { "2", "a" }, { "1", "a" } });
+    layer_1->set_value("3", "a");
+    layer_1->set_value("1", "b");
+    ASSERT_EQUAL(size_t, 0, events_1.size())
+    history_manager.emit_changes();
+    ASSERT_EQUAL(size_t, 1, events_1.size())
+    ASSERT_EQUAL(size_t, 3, events_1[0].size())
+    ASSERT_EQUAL(std::string, "1", events_1[0][0])
+    ASSERT_EQUAL(std::string, "2", events_1[0][1])
+    ASSERT_EQUAL(std::string, "3", events_1[0][2])
+    ASSERT_EQUAL(size_t, 0, events_2.size())
+
+    // Nothing is emitted if nothing changed.
+    history_manager.emit_changes();
+    ASSERT_EQUAL(size_t, 1, events_1.size())
+
+    // Undo and redo emit one event with all the changed resources.
+    history_manager.create_undo_bin();
+    layer_1->set_value("4", "a");
+    layer_2->set_value<Amulet::HistoryInitialisationMode::Empty>("x", "a");
+    layer_1->emit_changes();
+    ASSERT_EQUAL(size_t, 2, events_1.size())
+    ASSERT_EQUAL(size_t, 0, events_2.size())
+    history_manager.undo();
+    history_manager.undo();
+    history_manager.emit_changes();
+    ASSERT_EQUAL(size_t, 3, events_1.size())
+    ASSERT_EQUAL(size_t, 4, events_1[2].size())
+    ASSERT_EQUAL(size_t, 1, events_2.size())
+    ASSERT_EQUAL(size_t, 1, events_2[0].size())
+    ASSERT_EQUAL(std::string, "x", events_2[0][0])
+    history_manager.redo();
+    history_manager.emit_changes();
+    ASSERT_EQUAL(size_t, 4, events_1.size())
+    ASSERT_EQUAL(size_t, 3, events_1[3].size())
+    ASSERT_EQUAL(size_t, 1, events_2.size())
+
+    // The callbacks can use the history.
+    size_t value_count = 0;
+    auto token_3 = layer_1->resources_changed.connect([&history_manager, &layer_1, &value_count](std::vector<std::string> resource_ids) {
+        std::shared_lock lock(history_manager.get_mutex());
+        value_count += layer_1->get_values(resource_ids).size();
+    });
+    history_manager.redo();
+    history_manager.emit_changes();
+    ASSERT_EQUAL(size_t, 1, value_count)
+    layer_1->resources_changed.disconnect(token_3);
+}
+
+static void test_storage_options()
+{
+    Amulet::TempDir temp_dir("test_history");
+    auto parent_dir = temp_dir.get_path() / "history";
+    for (auto compression : { Amulet::HistoryCompression::None, Amulet::HistoryCompression::Zlib, Amulet::HistoryCompression::ZlibRaw }) {
+        Amulet::HistoryStorageOptions options;
+        options.compression = compression;
+        options.cache_size = 1024 * 1024;
+        options.write_buffer_size = 64 * 1024;
+        options.block_size = 4096;
+        options.bloom_bits = compression == Amulet::HistoryCompression::None ? 0 : 10;
+        options.temp_dir = parent_dir;
+        {
+            // Create the history manager.
+            Amulet::HistoryManager history_manager(options);
+            auto layer = history_manager.new_layer<std::string>();
+            // Read values from the database.
+            history_manager.set_max_cache_size(0);
+            for (size_t i = 0; i < 100; i++) {
+                layer->set_initial_value(std::to_string(i), std::string(1000, static_cast<char>('a' + i % 26)));
+            }
+            // The database is in a new directory in temp_dir.
+            ASSERT_EQUAL(size_t, 1, std::distance(std::filesystem::directory_iterator(parent_dir), std::filesystem::directory_iterator()))
+            history_manager.create_undo_bin();
+            layer->set_value("0", "edit");
+            ASSERT_EQUAL(std::string, "edit", layer->get_value("0"))
+            for (size_t i = 1; i < 100; i++) {
+                ASSERT_EQUAL(std::string, std::string(1000, static_cast<char>('a' + i % 26)), layer->get_value(std::to_string(i)))
+            }
+            history_manager.undo();
+            ASSERT_EQUAL(std::string, std::string(1000, 'a'), layer->get_value("0"))
+        }
+        // The directory is deleted with the history manager.
+        ASSERT_EQUAL(size_t, 0, std::distance(std::filesystem::directory_iterator(parent_dir), std::filesystem::directory_iterator()))
+    }
+}
+
+static void test_memory_storage()
+{
+    Amulet::TempDir temp_dir("test_history");
+    auto parent_dir = temp_dir.get_path() / "history";
+    auto get_directory_count = [&parent_dir]() -> size_t {
+        if (!std::filesystem::exists(parent_dir)) {
+            return 0;
+        }
+        return std::distance(std::filesystem::directory_iterator(parent_dir), std::filesystem::directory_iterator());
+    };
+    Amulet::HistoryStorageOptions options;
+    options.backend = Amulet::HistoryStorageBackend::Memory;
+    options.memory_limit = 1000;
+    options.temp_dir = parent_dir;
+
+    {
+        Amulet::MemoryHistoryStorage storage(options);
+        storage.write({ { "a", "1" }, { "b", "2" }, { "c", "3" } });
+        ASSERT_EQUAL(size_t, 6, storage.get_memory_size())
+        storage.write({ { "a", "11" }, { "c", std::nullopt } });
+        ASSERT_EQUAL(size_t, 5, storage.get_memory_size())
+        ASSERT_EQUAL(std::string, "11", storage.get("a").value())
+        ASSERT_EQUAL(bool, false, storage.get("c").has_value())
+        auto records = storage.get_many({ "a", "b" });
+        ASSERT_EQUAL(std::string, "11", records[0])
+        ASSERT_EQUAL(std::string, "2", records[1])
+        ASSERT_RAISES(std::runtime_error, storage.get_many({ "c" }))
+        ASSERT_EQUAL(bool, false, storage.is_on_disk())
+        ASSERT_EQUAL(size_t, 0, get_directory_count())
+
+        // Exceeding the limit moves the records to disk.
+        storage.write({ { "d", std::string(1000, 'd') } });
+        ASSERT_EQUAL(bool, true, storage.is_on_disk())
+        ASSERT_EQUAL(size_t, 0, storage.get_memory_size())
+        ASSERT_EQUAL(size_t, 1, get_directory_count())
+        records = storage.get_many({ "a", "b", "d" });
+        ASSERT_EQUAL(std::string, "11", records[0])
+        ASSERT_EQUAL(std::string, "2", records[1])
+        ASSERT_EQUAL(std::string, std::string(1000, 'd'), records[2])
+        storage.write({ { "b", std::nullopt }, { "e", "5" } });
+        ASSERT_EQUAL(bool, false, storage.get("b").has_value())
+        ASSERT_EQUAL(std::string, "5", storage.get("e").value())
+    }
+    ASSERT_EQUAL(size_t, 0, get_directory_count())
+
+    // The history works the same before and after the records are moved to disk.
+    options.memory_limit = 20000;
+    Amulet::HistoryManager history_manager(options);
+    history_manager.set_max_cache_size(0);
+    auto layer = history_manager.new_layer<std::string>();
+    for (size_t i = 0; i < 10; i++) {
+        layer->set_initial_value(std::to_string(i), std::string(1000, static_cast<char>('a' + i)));
+    }
+    ASSERT_EQUAL(size_t, 0, get_directory_count())
+    for (size_t revision = 0; revision < 3; revision++) {
+        history_manager.create_undo_bin();
+        for (size_t i = 0; i < 10; i++) {
+            layer->set_value(std::to_string(i), std::string(1000, static_cast<char>('a' + i)) + std::to_string(revision));
+        }
+    }
+    ASSERT_EQUAL(size_t, 1, get_directory_count())
+    for (size_t revision = 0; revision < 3; revision++) {
+        history_manager.undo();
+    }
+    auto values = layer->get_values(std::vector<std::string> { "0", "1", "9" });
+    ASSERT_EQUAL(std::string, std::string(1000, 'a'), values[0])
+    ASSERT_EQUAL(std::string, std::string(1000, 'b'), values[1])
+    ASSERT_EQUAL(std::string, std::string(1000, 'j'), values[2])
+}
+
+static void test_lazy_storage()
+{
+    Amulet::TempDir temp_dir("test_history");
+    auto parent_dir = temp_dir.get_path() / "history";
+    Amulet::HistoryStorageOptions options;
+    options.temp_dir = parent_dir;
+
+    Amulet::HistoryManager history_manager(options);
+    auto layer = history_manager.new_layer<std::string>();
+    // Using the history without writing values does not create the storage.
+    history_manager.create_undo_bin();
+    history_manager.flush();
+    history_manager.reclaim();
+    ASSERT_EQUAL(size_t, 0, layer->get_resource_count())
+    ASSERT_RAISES(std::out_of_range, layer->get_value("0"))
+    ASSERT_EQUAL(bool, false, history_manager.has_storage())
+    ASSERT_EQUAL(bool, false, std::filesystem::exists(parent_dir))
+
+    // The first write creates the storage.
+    layer->set_initial_value("0", "a");
+    ASSERT_EQUAL(bool, true, history_manager.has_storage())
+    ASSERT_EQUAL(size_t, 1, std::distance(std::filesystem::directory_iterator(parent_dir), std::filesystem::directory_iterator()))
+    layer->set_value("0", "b");
+    ASSERT_EQUAL(std::string, "b", layer->get_value("0"))
+    history_manager.undo();
+    ASSERT_EQUAL(std::string, "a", layer->get_value("0"))
+}
+
+static void test_set_initial_values()
+{
+    // Create the history manager.
+    Amulet::HistoryManager history_manager;
+    auto layer = history_manager.new_layer<std::string>();
+    history_manager.set_max_cache_size(0);
+
+    layer->set_initial_values({ { "a", "1" }, { "b", "2" } });
+    std::vector<std::pair<std::string, std::string>> resources;
+    for (size_t i = 0; i < 100; i++) {
+        resources.emplace_back(std::to_string(i), std::string(100, static_cast<char>(i)));
+    }
+    layer->set_initial_values(resources);
+    ASSERT_EQUAL(size_t, 102, layer->get_resource_count())
+    ASSERT_EQUAL(std::string, "1", layer->get_value("a"))
+    ASSERT_EQUAL(std::string, "2", layer->get_value("b"))
+    for (const auto& [key, value] : resources) {
+        ASSERT_EQUAL(std::string, value, layer->get_value(key))
+    }
+
+    // Nothing is written if a resource already exists.
+    ASSERT_RAISES(std::runtime_error, layer->set_initial_values({ { "c", "3" }, { "a", "1" } }))
+    ASSERT_RAISES(std::runtime_error, layer->set_initial_values({ { "c", "3" }, { "c", "3" } }))
+    ASSERT_EQUAL(bool, false, layer->has_resource("c"))
+
+    // The initial values can be undone to.
+    history_manager.create_undo_bin();
+    layer->set_value("a", "4");
+    history_manager.undo();
+    ASSERT_EQUAL(std::string, "1", layer->get_value("a"))
+}
+
+static Amulet::HistoryStorageBackend get_backend(const std::string& backend)
+{
+    if (backend == "leveldb") {
+        return Amulet::HistoryStorageBackend::LevelDB;
+    } else if (backend == "memory") {
+        return Amulet::HistoryStorageBackend::Memory;
+    }
+    throw std::invalid_argument("Unknown backend " + backend);
+}
+
+static Amulet::HistoryCompression get_compression(const std::string& compression)
+{
+    if (compression == "none") {
+        return Amulet::HistoryCompression::None;
+    } else if (compression == "zlib") {
+        return Amulet::HistoryCompression::Zlib;
+    } else if (compression == "zlib_raw") {
+        return Amulet::HistoryCompression::ZlibRaw;
+    }
+    throw std::invalid_argument("Unknown compression " + compression);
+}
+
+// Time loading resources into the history and then editing them with the given storage options.
+// This is similar to preloading chunks and editing them.
+// The value cache is disabled so that all reads come from the database.
+// Returns the number of seconds taken.
+static double benchmark_storage_options(
+    const std::string& backend,
+    const std::string& compression,
+    size_t cache_size,
+    size_t write_buffer_size,
+    size_t block_size,
+    int bloom_bits,
+    size_t resource_count,
+    size_t value_size,
+    size_t edit_count)
+{
+    Amulet::HistoryStorageOptions options;
+    options.backend = get_backend(backend);
+    options.compression = get_compression(compression);
+    options.cache_size = cache_size;
+    options.write_buffer_size = write_buffer_size;
+    options.block_size = block_size;
+    options.bloom_bits = bloom_bits;
+    auto start = std::chrono::steady_clock::now();
+    Amulet::HistoryManager history_manager(options);
+    history_manager.set_max_cache_size(0);
+    auto layer = history_manager.new_layer<std::string>();
+    // Values with some structure so that they compress like real data.
+    auto get_value = [value_size](size_t index, size_t revision) {
+        std::string value(value_size, 0);
+        for (size_t i = 0; i < value_size; i++) {
+            value[i] = static_cast<char>((i / 64 + index + revision) % 16);
+        }
+        return value;
+    };
+    // Preload
+    for (size_t i = 0; i < resource_count; i++) {
+        layer->set_initial_value(std::to_string(i), get_value(i, 0));
+    }
+    // Edit
+    for (size_t revision = 1; revision <= edit_count; revision++) {
+        history_manager.create_undo_bin();
+        for (size_t i = revision; i < resource_count; i += 7) {
+            auto key = std::to_string(i);
+            layer->get_value(key);
+            layer->set_value(key, get_value(i, revision));
+        }
+    }
+    for (size_t revision = 0; revision < edit_count; revision++) {
+        history_manager.undo();
+    }
+    for (size_t i = 0; i < resource_count; i++) {
+        layer->get_value(std::to_string(i));
+    }
+    std::chrono::duration<double> duration = std::chrono::steady_clock::now() - start;
+    return duration.count();
+}
+
+// Time creating a history manager and writing one value.
+// The history storage is created on the first write.
+// Returns the number of seconds taken to create the history manager and write the value.
+static std::pair<double, double> benchmark_history_open(const std::string& backend)
+{
+    Amulet::HistoryStorageOptions options;
+    options.backend = get_backend(backend);
+    auto start = std::chrono::steady_clock::now();
+    Amulet::HistoryManager history_manager(options);
+    auto layer = history_manager.new_layer<std::string>();
+    std::chrono::duration<double> open_duration = std::chrono::steady_clock::now() - start;
+    start = std::chrono::steady_clock::now();
+    layer->set_initial_value("0", "value");
+    std::chrono::duration<double> write_duration = std::chrono::steady_clock::now() - start;
+    return std::make_pair(open_duration.count(), write_duration.count());
+}
+
+// Time writing values to distinct resources from multiple threads.
+// Returns the number of seconds taken.
+static double benchmark_parallel_set_value(size_t thread_count, size_t resource_count, size_t value_size)
+{
+    Amulet::HistoryManager history_manager;
+    auto layer = history_manager.new_layer<std::string>();
+    history_manager.create_undo_bin();
+    auto start = std::chrono::steady_clock::now();
+    std::vector<std::thread> threads;
+    for (size_t t = 0; t < thread_count; t++) {
+        threads.emplace_back([&history_manager, &layer, t, thread_count, resource_count, value_size] {
+            std::shared_lock lock(history_manager.get_mutex());
+            for (size_t i = t; i < resource_count; i += thread_count) {
+                auto key = std::to_string(i);
+                layer->set_value<Amulet::HistoryInitialisationMode::Empty>(key, std::string(value_size, static_cast<char>(i)));
+            }
+        });
+    }
+    for (auto& thread : threads) {
+        thread.join();
+    }
+    std::chrono::duration<double> duration = std::chrono::steady_clock::now() - start;
+    return duration.count();
+}
+
 void init_test_history(py::module m_parent)
 {
     auto m = m_parent.def_submodule("test_history_");
@@ -417,4 +1365,45 @@ void init_test_history(py::module m_parent)
     m.def("test_undo_overwrite", &test_undo_overwrite);
     m.def("test_set_value_enum", &test_set_value_enum);
     m.def("test_set_values_enum", &test_set_values_enum);
+    m.def("test_max_undo_count", &test_max_undo_count);
+    m.def("test_max_undo_size", &test_max_undo_size);
+    m.def("test_reclaim", &test_reclaim);
+    m.def("test_delta", &test_delta);
+    m.def("test_shared_values", &test_shared_values);
+    m.def("test_cache", &test_cache);
+    m.def("test_get_values", &test_get_values);
+    m.def("test_resource_key", &test_resource_key);
+    m.def("test_resource_table", &test_resource_table);
+    m.def("test_parallel", &test_parallel);
+    m.def("test_write_behind", &test_write_behind);
+    m.def("test_emit_changes", &test_emit_changes);
+    m.def("test_storage_options", &test_storage_options);
+    m.def("test_memory_storage", &test_memory_storage);
+    m.def("test_lazy_storage", &test_lazy_storage);
+    m.def("test_set_initial_values", &test_set_initial_values);
+    m.def(
+        "benchmark_parallel_set_value",
+        &benchmark_parallel_set_value,
+        py::arg("thread_count"),
+        py::arg("resource_count"),
+        py::arg("value_size"),
+        py::call_guard<py::gil_scoped_release>());
+    m.def(
+        "benchmark_history_open",
+        &benchmark_history_open,
+        py::arg("backend"),
+        py::call_guard<py::gil_scoped_release>());
+    m.def(
+        "benchmark_storage_options",
+        &benchmark_storage_options,
+        py::arg("backend"),
+        py::arg("compression"),
+        py::arg("cache_size"),
+        py::arg("write_buffer_size"),
+        py::arg("block_size"),
+        py::arg("bloom_bits"),
+        py::arg("resource_count"),
+        py::arg("value_size"),
+        py::arg("edit_count"),
+        py::call_guard<py::gil_scoped_release>());
 }
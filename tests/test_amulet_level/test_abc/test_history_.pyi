@@ -1,13 +1,63 @@
 from __future__ import annotations
 
 __all__ = [
+    "benchmark_history_open",
+    "benchmark_parallel_set_value",
+    "benchmark_storage_options",
+    "test_cache",
+    "test_delta",
+    "test_emit_changes",
+    "test_get_values",
     "test_history",
+    "test_lazy_storage",
+    "test_max_undo_count",
+    "test_max_undo_size",
+    "test_memory_storage",
+    "test_parallel",
+    "test_reclaim",
+    "test_resource_key",
+    "test_resource_table",
+    "test_set_initial_values",
     "test_set_value_enum",
     "test_set_values_enum",
+    "test_shared_values",
+    "test_storage_options",
     "test_undo_overwrite",
+    "test_write_behind",
 ]
 
+def benchmark_history_open(backend: str) -> tuple[float, float]: ...
+def benchmark_parallel_set_value(
+    thread_count: int, resource_count: int, value_size: int
+) -> float: ...
+def benchmark_storage_options(
+    backend: str,
+    compression: str,
+    cache_size: int,
+    write_buffer_size: int,
+    block_size: int,
+    bloom_bits: int,
+    resource_count: int,
+    value_size: int,
+    edit_count: int,
+) -> float: ...
+def test_cache() -> None: ...
+def test_delta() -> None: ...
+def test_emit_changes() -> None: ...
+def test_get_values() -> None: ...
 def test_history() -> None: ...
+def test_lazy_storage() -> None: ...
+def test_max_undo_count() -> None: ...
+def test_max_undo_size() -> None: ...
+def test_memory_storage() -> None: ...
+def test_parallel() -> None: ...
+def test_reclaim() -> None: ...
+def test_resource_key() -> None: ...
+def test_resource_table() -> None: ...
+def test_set_initial_values() -> None: ...
 def test_set_value_enum() -> None: ...
 def test_set_values_enum() -> None: ...
+def test_shared_values() -> None: ...
+def test_storage_options() -> None: ...
 def test_undo_overwrite() -> None: ...
+def test_write_behind() -> None: ...
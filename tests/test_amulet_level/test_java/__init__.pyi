@@ -0,0 +1,5 @@
+from __future__ import annotations
+
+from . import test_section_array_
+
+__all__ = ["test_section_array_"]
@@ -0,0 +1,12 @@
+#include <pybind11/pybind11.h>
+
+#include <amulet/pybind11_extensions/py_module.hpp>
+
+namespace py = pybind11;
+
+void init_test_section_array(py::module m_parent);
+
+void init_test_java(py::module m_parent){
+    auto m = Amulet::pybind11_extensions::def_subpackage(m_parent, "test_java");
+    init_test_section_array(m);
+}
@@ -1,3 +1,4 @@
+import asyncio
 from unittest import TestCase
 from typing import TypeGuard, TypeVar, Any, Type
 
@@ -167,6 +168,79 @@ class JavaChunkHandleTestCase(TestCase):
             finally:
                 level.close()
 
+    def test_passthrough(self) -> None:
+        with WorldTemp(java_vanilla_1_13) as world_data:
+            level = JavaLevel.load(world_data.path)
+            level.open()
+            try:
+                self.assertFalse(level.passthrough_enabled)
+                level.passthrough_enabled = True
+                self.assertTrue(level.passthrough_enabled)
+                overworld = level.get_dimension("minecraft:overworld")
+
+                # Chunks that have not been modified are read from the raw level.
+                with self.assertRaises(ChunkDoesNotExist):
+                    overworld.get_chunk_handle(100, 200).get_chunk()
+                chunk_handle = overworld.get_chunk_handle(1, 2)
+                chunk = self.assertCast(chunk_handle.get_chunk(), JavaChunk1466)
+                self.assertEqual(67, len(chunk.block.palette))
+                chunk_2 = self.assertCast(chunk_handle.get_chunk(), JavaChunk1466)
+                self.assertEqual(67, len(chunk_2.block.palette))
+
+                # Modified chunks are read from the history.
+                level.create_restore_point()
+                block_stack = BlockStack(
+                    Block(
+                        "java",
+                        chunk.block.palette.version_range.max_version,
+                        "my_namespace",
+                        "my_basename",
+                    )
+                )
+                chunk.block.palette.block_stack_to_index(block_stack)
+                chunk_handle.set_chunk(chunk)
+                chunk_3 = self.assertCast(chunk_handle.get_chunk(), JavaChunk1466)
+                self.assertEqual(68, len(chunk_3.block.palette))
+
+                # The original state is restored by undo.
+                level.undo()
+                chunk_4 = self.assertCast(chunk_handle.get_chunk(), JavaChunk1466)
+                self.assertEqual(67, len(chunk_4.block.palette))
+            finally:
+                level.close()
+
+    def test_passthrough_components(self) -> None:
+        with WorldTemp(java_vanilla_1_13) as world_data:
+            level = JavaLevel.load(world_data.path)
+            level.open()
+            try:
+                level.passthrough_enabled = True
+                overworld = level.get_dimension("minecraft:overworld")
+                chunk_handle = overworld.get_chunk_handle(1, 2)
+                component_ids = {BlockComponent.ComponentID}
+
+                def get_loaded_component_ids(chunk: Chunk) -> set[str]:
+                    return {
+                        component_id
+                        for component_id, data in chunk.serialise_chunk().items()
+                        if data is not None
+                    }
+
+                # Only the requested components are loaded from the raw level.
+                chunk = self.assertCast(
+                    chunk_handle.get_chunk(component_ids), JavaChunk1466
+                )
+                self.assertEqual(component_ids, get_loaded_component_ids(chunk))
+                self.assertEqual(67, len(chunk.block.palette))
+
+                # The history loads the same components once the chunk is modified.
+                level.create_restore_point()
+                chunk_handle.set_chunk(chunk_handle.get_chunk())
+                chunk_2 = chunk_handle.get_chunk(component_ids)
+                self.assertEqual(component_ids, get_loaded_component_ids(chunk_2))
+            finally:
+                level.close()
+
     def test_undo_redo(self) -> None:
         with WorldTemp(java_vanilla_1_13) as world_data:
             level = JavaLevel.load(world_data.path)
@@ -406,3 +480,22 @@ class JavaChunkHandleTestCase(TestCase):
 
             finally:
                 level.close()
+
+    def test_get_chunk_async(self) -> None:
+        with WorldTemp(java_vanilla_1_13) as world_data:
+            level = JavaLevel.load(world_data.path)
+            level.open()
+            try:
+                overworld = level.get_dimension("minecraft:overworld")
+
+                async def get_chunks() -> None:
+                    chunk = await overworld.get_chunk_handle(1, 2).get_chunk_async()
+                    block_component = self.assertCast(chunk, BlockComponent)
+                    self.assertEqual(67, len(block_component.block.palette))
+
+                    with self.assertRaises(ChunkDoesNotExist):
+                        await overworld.get_chunk_handle(1000, 1000).get_chunk_async()
+
+                asyncio.run(get_chunks())
+            finally:
+                level.close()
@@ -1,13 +1,17 @@
+import asyncio
 from unittest import TestCase
 
 from amulet.core.block import BlockStack
 from amulet.core.biome import Biome
-from amulet.core.selection import SelectionBox
+from amulet.core.chunk.component import BlockComponent
+from amulet.core.selection import SelectionBox, SelectionGroup
+from amulet.utils.task_manager import CancelManager, ProgressManager, TaskCancelled
 from amulet.level.java import (
     JavaLevel,
     JavaDimension,
     JavaChunkHandle,
 )
+from amulet.level.java.chunk import JavaChunk
 
 from amulet.minecraft_worlds import WorldTemp, java_vanilla_1_13
 
@@ -34,3 +38,121 @@ class JavaDimensionTestCase(TestCase):
 
             finally:
                 level.close()
+
+    def test_preload_chunks(self) -> None:
+        with WorldTemp(java_vanilla_1_13) as world_data:
+            level = JavaLevel.load(world_data.path)
+            level.open()
+            try:
+                overworld = level.get_dimension("minecraft:overworld")
+                assert isinstance(overworld, JavaDimension)
+                progress: list[float] = []
+                progress_manager = ProgressManager()
+                progress_manager.register_progress_callback(progress.append)
+                chunk_coords = [(cx, cz) for cx in range(-2, 4) for cz in range(-1, 5)]
+                overworld.preload_chunks(
+                    chunk_coords, workers=4, progress_manager=progress_manager
+                )
+                self.assertTrue(progress)
+                self.assertEqual(1.0, progress[-1])
+                self.assertEqual(sorted(progress), progress)
+
+                # The preloaded chunk is read from the history.
+                chunk_handle = overworld.get_chunk_handle(1, 2)
+                self.assertTrue(chunk_handle.exists())
+                chunk = chunk_handle.get_chunk()
+                self.assertIsInstance(chunk, JavaChunk)
+                assert isinstance(chunk, BlockComponent)
+                self.assertEqual(67, len(chunk.block.palette))
+
+                # Loaded chunks and selections are accepted.
+                overworld.preload_chunks(SelectionBox(0, 0, 0, 32, 256, 32))
+                overworld.preload_chunks(
+                    SelectionGroup(SelectionBox(-16, 0, -16, 16, 256, 16)), workers=1
+                )
+
+                # Cancelling stops the operation.
+                cancel_manager = CancelManager()
+                cancel_manager.cancel()
+                with self.assertRaises(TaskCancelled):
+                    overworld.preload_chunks(
+                        [(10, 10), (11, 11)], cancel_manager=cancel_manager
+                    )
+            finally:
+                level.close()
+
+    def test_iter_chunks(self) -> None:
+        with WorldTemp(java_vanilla_1_13) as world_data:
+            level = JavaLevel.load(world_data.path)
+            level.open()
+            try:
+                overworld = level.get_dimension("minecraft:overworld")
+                assert isinstance(overworld, JavaDimension)
+                selection = SelectionBox(-32, 0, -16, 64, 256, 80)
+                expected = [
+                    (cx, cz)
+                    for cx in range(-2, 4)
+                    for cz in range(-1, 5)
+                    if overworld.get_chunk_handle(cx, cz).exists()
+                ]
+                self.assertTrue(expected)
+
+                chunk_coords = []
+                for cx, cz, chunk in overworld.iter_chunks(selection, prefetch=4):
+                    self.assertIsInstance(chunk, JavaChunk)
+                    chunk_coords.append((cx, cz))
+                self.assertEqual(sorted(expected), sorted(chunk_coords))
+                # The chunks are in region file order.
+                self.assertEqual(
+                    sorted(
+                        chunk_coords,
+                        key=lambda c: (c[0] >> 5, c[1] >> 5, c[1], c[0]),
+                    ),
+                    chunk_coords,
+                )
+
+                # Stopping early is allowed.
+                for cx, cz, chunk in overworld.iter_chunks(expected, prefetch=1):
+                    self.assertEqual(chunk_coords[0], (cx, cz))
+                    break
+
+                self.assertEqual(
+                    [], list(overworld.iter_chunks([(1000, 1000), (1001, 1000)]))
+                )
+            finally:
+                level.close()
+
+    def test_get_chunks_async(self) -> None:
+        with WorldTemp(java_vanilla_1_13) as world_data:
+            level = JavaLevel.load(world_data.path)
+            level.open()
+            try:
+                overworld = level.get_dimension("minecraft:overworld")
+                assert isinstance(overworld, JavaDimension)
+
+                async def get_chunks() -> None:
+                    chunks = await overworld.get_chunks_async(
+                        [(1, 2), (1000, 1000), (1, 3)]
+                    )
+                    self.assertEqual(3, len(chunks))
+                    self.assertIsInstance(chunks[0], JavaChunk)
+                    self.assertIsNone(chunks[1])
+                    self.assertIsInstance(chunks[2], JavaChunk)
+
+                    self.assertEqual([], await overworld.get_chunks_async([]))
+
+                    # Cancelling the awaiting task cancels the future.
+                    async def get_many_chunks() -> list[JavaChunk | None]:
+                        return await overworld.get_chunks_async(
+                            [(cx, cz) for cx in range(32) for cz in range(32)]
+                        )
+
+                    task = asyncio.create_task(get_many_chunks())
+                    await asyncio.sleep(0)
+                    task.cancel()
+                    with self.assertRaises(asyncio.CancelledError):
+                        await task
+
+                asyncio.run(get_chunks())
+            finally:
+                level.close()
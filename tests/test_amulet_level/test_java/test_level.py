@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime
 from tempfile import TemporaryDirectory
 import os
@@ -102,6 +103,50 @@ class JavaLevelTestCase(
             finally:
                 level.close()
 
+    def test_open_duration(self) -> None:
+        with WorldTemp(java_vanilla_1_13) as world_data:
+            level = JavaLevel.load(world_data.path)
+            self.assertEqual(0.0, level.open_duration)
+            level.open()
+            try:
+                self.assertIsInstance(level.open_duration, float)
+                self.assertGreater(level.open_duration, 0.0)
+            finally:
+                level.close()
+
+    def test_history_max_pending_size(self) -> None:
+        with WorldTemp(java_vanilla_1_13) as world_data:
+            level = JavaLevel.load(world_data.path)
+            level.open()
+            try:
+                # History writes are written before the edit returns unless enabled.
+                self.assertEqual(0, level.history_max_pending_size)
+                level.history_max_pending_size = 64 * 1024 * 1024
+                self.assertEqual(64 * 1024 * 1024, level.history_max_pending_size)
+                overworld = level.get_dimension("minecraft:overworld")
+                chunk_handle = overworld.get_chunk_handle(1, 2)
+                level.create_restore_point()
+                chunk_handle.set_chunk(chunk_handle.get_chunk())
+                level.history_max_pending_size = 0
+                self.assertEqual(0, level.history_max_pending_size)
+                level.undo()
+                self.assertTrue(chunk_handle.exists())
+            finally:
+                level.close()
+
+    def test_save_async(self) -> None:
+        with WorldTemp(java_vanilla_1_13) as world_data:
+            level = JavaLevel.load(world_data.path)
+            level.open()
+            try:
+
+                async def save() -> None:
+                    self.assertIsNone(await level.save_async())
+
+                asyncio.run(save())
+            finally:
+                level.close()
+
     def test_path(self) -> None:
         with WorldTemp(java_vanilla_1_13) as world_data:
             level = JavaLevel.load(world_data.path)
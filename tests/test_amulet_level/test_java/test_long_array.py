@@ -7,6 +7,48 @@ import os
 from amulet.level.java.long_array import decode_long_array, encode_long_array
 
 
+def reference_decode(
+    long_array: numpy.ndarray, size: int, bits_per_entry: int, dense: bool
+) -> list[int]:
+    """A slow but obviously correct decoder to compare against."""
+    mask = (1 << bits_per_entry) - 1
+    if dense:
+        stream = sum(int(value) << (64 * i) for i, value in enumerate(long_array))
+        return [(stream >> (bits_per_entry * i)) & mask for i in range(size)]
+    else:
+        entries_per_long = 64 // bits_per_entry
+        return [
+            (
+                int(long_array[i // entries_per_long])
+                >> (bits_per_entry * (i % entries_per_long))
+            )
+            & mask
+            for i in range(size)
+        ]
+
+
+def reference_encode(
+    array: numpy.ndarray, bits_per_entry: int, dense: bool
+) -> list[int]:
+    """A slow but obviously correct encoder to compare against."""
+    mask = (1 << bits_per_entry) - 1
+    if dense:
+        long_count = (len(array) * bits_per_entry + 63) // 64
+        stream = sum(
+            (int(value) & mask) << (bits_per_entry * i) for i, value in enumerate(array)
+        )
+        return [(stream >> (64 * i)) & (2**64 - 1) for i in range(long_count)]
+    else:
+        entries_per_long = 64 // bits_per_entry
+        long_count = (len(array) + entries_per_long - 1) // entries_per_long
+        long_array = [0] * long_count
+        for i, value in enumerate(array):
+            long_array[i // entries_per_long] |= (int(value) & mask) << (
+                bits_per_entry * (i % entries_per_long)
+            )
+        return long_array
+
+
 class LongArrayTestCase(unittest.TestCase):
     def assertArrayEqual(self, a: numpy.ndarray, b: numpy.ndarray) -> None:
         self.assertEqual(a.dtype.kind, b.dtype.kind)
@@ -436,6 +478,40 @@ class LongArrayTestCase(unittest.TestCase):
                     ),
                 )
 
+    def test_reference(self) -> None:
+        """Check every bits per entry and layout is bit exact with the reference.
+        The sizes cover partial longs, partial dense blocks and the vectorised paths."""
+        for dense in (False, True):
+            for bits_per_entry in range(1, 65):
+                for size in (1, 7, 8, 9, 63, 64, 65, 100, 257):
+                    with self.subTest(
+                        dense=dense, bits_per_entry=bits_per_entry, size=size
+                    ):
+                        long_count = (
+                            (size * bits_per_entry + 63) // 64
+                            if dense
+                            else (size + 64 // bits_per_entry - 1)
+                            // (64 // bits_per_entry)
+                        )
+                        long_array = numpy.random.randint(
+                            0, 2**64, long_count, dtype=numpy.uint64
+                        )
+                        decoded = decode_long_array(
+                            long_array, size, bits_per_entry, dense
+                        )
+                        self.assertEqual(
+                            reference_decode(long_array, size, bits_per_entry, dense),
+                            decoded.tolist(),
+                        )
+
+                        array = numpy.random.randint(
+                            0, 2**bits_per_entry, size, dtype=numpy.uint64
+                        )
+                        self.assertEqual(
+                            reference_encode(array, bits_per_entry, dense),
+                            encode_long_array(array, bits_per_entry, dense).tolist(),
+                        )
+
     def test_encode_decode(self) -> None:
         for dense in (False, True):
             for bits_per_entry in range(4, 65):
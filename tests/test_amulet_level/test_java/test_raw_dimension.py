@@ -1,13 +1,16 @@
 from unittest import TestCase
 import os
 
+import numpy
+
 from amulet.core.block import BlockStack
 from amulet.core.biome import Biome
 from amulet.core.chunk import ChunkDoesNotExist
 from amulet.core.selection import SelectionBox
 from amulet.utils.lock import OrderedLock
 from amulet.level.java import JavaRawLevel, JavaRawDimension
-from amulet.nbt import NamedTag
+from amulet.level.java.long_array import encode_long_array
+from amulet.nbt import NamedTag, CompoundTag, ListTag, StringTag, LongArrayTag
 
 from amulet.minecraft_worlds import WorldTemp, java_vanilla_1_13
 
@@ -77,6 +80,268 @@ class JavaRawDimensionTestCase(TestCase):
             finally:
                 raw_level.close()
 
+    def test_batch(self) -> None:
+        with WorldTemp(java_vanilla_1_13) as world_data:
+            raw_level = JavaRawLevel.load(world_data.path)
+            raw_level.open()
+            try:
+                overworld = raw_level.get_dimension("minecraft:overworld")
+                chunk_coords = [(1, 2), (0, 0), (1000, 1000), (-1, -1), (0, 0)]
+                chunks = overworld.get_raw_chunks(chunk_coords)
+                self.assertEqual(len(chunk_coords), len(chunks))
+                for (cx, cz), chunk in zip(chunk_coords, chunks):
+                    if overworld.has_chunk(cx, cz):
+                        self.assertEqual(overworld.get_raw_chunk(cx, cz), chunk)
+                    else:
+                        self.assertIsNone(chunk)
+                self.assertIsNone(chunks[2])
+                self.assertEqual([], overworld.get_raw_chunks([]))
+
+                # Move chunks to a new region.
+                chunk_data = overworld.get_raw_chunk(0, 0)
+                overworld.set_raw_chunks(
+                    {(2000, 2000): chunk_data, (2001, 2000): chunk_data}
+                )
+                self.assertEqual(
+                    [chunk_data, chunk_data],
+                    overworld.get_raw_chunks([(2000, 2000), (2001, 2000)]),
+                )
+
+                # Layers that do not exist are created.
+                layer_chunk_data = {
+                    **chunk_data,
+                    "custom": next(iter(chunk_data.values())),
+                }
+                overworld.set_raw_chunks({(2002, 2000): layer_chunk_data})
+                self.assertEqual(layer_chunk_data, overworld.get_raw_chunk(2002, 2000))
+            finally:
+                raw_level.close()
+
+    def test_mmap(self) -> None:
+        with WorldTemp(java_vanilla_1_13) as world_data:
+            raw_level = JavaRawLevel.load(world_data.path)
+            raw_level.open()
+            try:
+                overworld = raw_level.get_dimension("minecraft:overworld")
+                self.assertFalse(overworld.mmap_enabled)
+                chunk_coords = list(overworld.all_chunk_coords)
+                chunks = overworld.get_raw_chunks(chunk_coords)
+
+                overworld.mmap_enabled = True
+                self.assertTrue(overworld.mmap_enabled)
+                self.assertEqual(chunks, overworld.get_raw_chunks(chunk_coords))
+                self.assertEqual(chunks[0], overworld.get_raw_chunk(*chunk_coords[0]))
+                with self.assertRaises(ChunkDoesNotExist):
+                    overworld.get_raw_chunk(1000, 1000)
+
+                # Writes are visible to mapped reads.
+                chunk_data = overworld.get_raw_chunk(0, 0)
+                overworld.set_raw_chunk(2000, 2000, chunk_data)
+                self.assertEqual(chunk_data, overworld.get_raw_chunk(2000, 2000))
+
+                # Writes to a region that is already mapped are visible to mapped reads.
+                cx, cz = chunk_coords[0]
+                overworld.set_raw_chunk(cx, cz, chunks[1])
+                self.assertEqual(chunks[1], overworld.get_raw_chunk(cx, cz))
+                overworld.set_raw_chunks({(cx, cz): chunks[0]})
+                self.assertEqual(chunks[0], overworld.get_raw_chunk(cx, cz))
+                overworld.delete_chunk(cx, cz)
+                with self.assertRaises(ChunkDoesNotExist):
+                    overworld.get_raw_chunk(cx, cz)
+                overworld.compact()
+                self.assertEqual(chunks[1:], overworld.get_raw_chunks(chunk_coords[1:]))
+
+                # Disabling mmap releases the maps and reads go through the region files.
+                overworld.mmap_enabled = False
+                self.assertEqual(chunks[1:], overworld.get_raw_chunks(chunk_coords[1:]))
+            finally:
+                raw_level.close()
+
+    def test_palette_cache(self) -> None:
+        with WorldTemp(java_vanilla_1_13) as world_data:
+            raw_level = JavaRawLevel.load(world_data.path)
+            raw_level.open()
+            try:
+                overworld = raw_level.get_dimension("minecraft:overworld")
+                overworld.clear_palette_cache()
+                self.assertEqual(0, overworld.palette_cache_hits)
+                self.assertEqual(0, overworld.palette_cache_misses)
+                self.assertEqual(0, overworld.palette_cache_size)
+
+                raw_chunk = overworld.get_raw_chunk(0, 0)
+                chunk = overworld.decode_chunk(raw_chunk, 0, 0)
+                misses = overworld.palette_cache_misses
+                self.assertLess(0, misses)
+                self.assertEqual(misses, overworld.palette_cache_size)
+
+                # The second decode is served from the cache and gives the same result.
+                cached_chunk = overworld.decode_chunk(raw_chunk, 0, 0)
+                self.assertEqual(misses, overworld.palette_cache_misses)
+                self.assertLess(0, overworld.palette_cache_hits)
+                palette = chunk.block.palette
+                cached_palette = cached_chunk.block.palette
+                self.assertEqual(len(palette), len(cached_palette))
+                for index in range(len(palette)):
+                    self.assertEqual(
+                        palette.index_to_block_stack(index),
+                        cached_palette.index_to_block_stack(index),
+                    )
+
+                overworld.clear_palette_cache()
+                self.assertEqual(0, overworld.palette_cache_hits)
+                self.assertEqual(0, overworld.palette_cache_misses)
+                self.assertEqual(0, overworld.palette_cache_size)
+            finally:
+                raw_level.close()
+
+    def test_uniform_sections(self) -> None:
+        with WorldTemp(java_vanilla_1_13) as world_data:
+            raw_level = JavaRawLevel.load(world_data.path)
+            raw_level.open()
+            try:
+                overworld = raw_level.get_dimension("minecraft:overworld")
+                raw_chunk = overworld.get_raw_chunk(0, 0)
+                level = raw_chunk["region"].compound.get_compound("Level")
+                assert level is not None
+                sections = level.get_list("Sections")
+                assert sections is not None
+                self.assertLessEqual(2, len(sections))
+
+                def make_uniform(section_index: int, block_name: str) -> int:
+                    section = sections[section_index]
+                    assert isinstance(section, CompoundTag)
+                    y_tag = section.get_byte("Y")
+                    assert y_tag is not None
+                    section["Palette"] = ListTag(
+                        [CompoundTag({"Name": StringTag(block_name)})]
+                    )
+                    del section["BlockStates"]
+                    return y_tag.py_int
+
+                # Make the first section all stone and the second all air with no block data.
+                cy = make_uniform(0, "minecraft:stone")
+                air_cy = make_uniform(1, "minecraft:air")
+
+                decoded_section_count = overworld.decoded_section_count
+                uniform_section_count = overworld.uniform_section_count
+                chunk = overworld.decode_chunk(raw_chunk, 0, 0)
+                self.assertLess(decoded_section_count, overworld.decoded_section_count)
+                self.assertLess(uniform_section_count, overworld.uniform_section_count)
+
+                array = numpy.asarray(chunk.block.sections[cy])
+                self.assertEqual((16, 16, 16), array.shape)
+                block_index = int(array[0, 0, 0])
+                self.assertTrue(numpy.all(array == block_index))
+                self.assertEqual(
+                    "stone",
+                    chunk.block.palette.index_to_block_stack(block_index)[0].base_name,
+                )
+
+                # Uniform sections are stored even if they match the default array.
+                self.assertIn(air_cy, chunk.block.sections)
+                array = numpy.asarray(chunk.block.sections[air_cy])
+                block_index = int(array[0, 0, 0])
+                self.assertTrue(numpy.all(array == block_index))
+                self.assertEqual(
+                    "air",
+                    chunk.block.palette.index_to_block_stack(block_index)[0].base_name,
+                )
+            finally:
+                raw_level.close()
+
+    def _set_section_blocks(
+        self, raw_chunk: dict[str, NamedTag], block_names: list[str], yzx: numpy.ndarray
+    ) -> int:
+        """Replace the blocks of the first section in a 1.13 chunk.
+
+        yzx is a flat array of palette indexes in the order the game stores them.
+        Returns the section's Y coordinate.
+        """
+        level = raw_chunk["region"].compound.get_compound("Level")
+        assert level is not None
+        sections = level.get_list("Sections")
+        assert sections is not None
+        section = sections[0]
+        assert isinstance(section, CompoundTag)
+        y_tag = section.get_byte("Y")
+        assert y_tag is not None
+        section["Palette"] = ListTag(
+            [CompoundTag({"Name": StringTag(name)}) for name in block_names]
+        )
+        # 1.13 stores at least 4 bits per entry in a dense long array.
+        section["BlockStates"] = LongArrayTag(
+            encode_long_array(
+                yzx.astype(numpy.uint64),
+                max(4, (len(block_names) - 1).bit_length()),
+                True,
+            )
+        )
+        return y_tag.py_int
+
+    def test_section_remap(self) -> None:
+        block_names = [
+            "minecraft:air",
+            "minecraft:stone",
+            "minecraft:dirt",
+            "minecraft:cobblestone",
+            "minecraft:oak_planks",
+            "minecraft:sand",
+            "minecraft:gravel",
+            "minecraft:gold_ore",
+            "minecraft:iron_ore",
+            "minecraft:coal_ore",
+            "minecraft:glass",
+            "minecraft:bricks",
+            "minecraft:bookshelf",
+            "minecraft:obsidian",
+            "minecraft:ice",
+            "minecraft:clay",
+            "minecraft:glowstone",
+            "minecraft:netherrack",
+        ]
+        yzx = numpy.random.default_rng(0).integers(0, len(block_names), 4096)
+        with WorldTemp(java_vanilla_1_13) as world_data:
+            raw_level = JavaRawLevel.load(world_data.path)
+            raw_level.open()
+            try:
+                overworld = raw_level.get_dimension("minecraft:overworld")
+                raw_chunk = overworld.get_raw_chunk(0, 0)
+                cy = self._set_section_blocks(raw_chunk, block_names, yzx)
+                chunk = overworld.decode_chunk(raw_chunk, 0, 0)
+                array = numpy.asarray(chunk.block.sections[cy])
+                palette = chunk.block.palette
+                for x in range(16):
+                    for y in range(16):
+                        for z in range(16):
+                            block = palette.index_to_block_stack(int(array[x, y, z]))[0]
+                            self.assertEqual(
+                                block_names[yzx[y * 256 + z * 16 + x]],
+                                block.namespaced_name,
+                            )
+            finally:
+                raw_level.close()
+
+    def test_section_index_out_of_range(self) -> None:
+        block_names = ["minecraft:air", "minecraft:stone", "minecraft:dirt"]
+        yzx = numpy.zeros(4096, dtype=numpy.uint64)
+        # The first invalid index in storage order is reported.
+        yzx[5 * 256 + 7 * 16 + 3] = 9
+        yzx[10 * 256] = 3
+        with WorldTemp(java_vanilla_1_13) as world_data:
+            raw_level = JavaRawLevel.load(world_data.path)
+            raw_level.open()
+            try:
+                overworld = raw_level.get_dimension("minecraft:overworld")
+                raw_chunk = overworld.get_raw_chunk(0, 0)
+                cy = self._set_section_blocks(raw_chunk, block_names, yzx)
+                with self.assertRaisesRegex(
+                    RuntimeError,
+                    f"cy={cy},.*dx=3,dy=5,dz=7 is larger than the block palette size",
+                ):
+                    overworld.decode_chunk(raw_chunk, 0, 0)
+            finally:
+                raw_level.close()
+
     def test_compact(self) -> None:
         with WorldTemp(java_vanilla_1_13) as world_data:
 
@@ -0,0 +1,14 @@
+from unittest import TestCase
+
+from test_amulet_level.test_java.test_section_array_ import (
+    test_find_index_out_of_range,
+    test_remap_yzx_to_xyz,
+)
+
+
+class SectionArrayTestCase(TestCase):
+    def test_find_index_out_of_range(self) -> None:
+        test_find_index_out_of_range()
+
+    def test_remap_yzx_to_xyz(self) -> None:
+        test_remap_yzx_to_xyz()
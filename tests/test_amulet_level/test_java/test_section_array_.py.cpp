@@ -0,0 +1,162 @@
+#include <pybind11/pybind11.h>
+#include <pybind11/stl.h>
+
+#include <chrono>
+#include <cstdint>
+#include <limits>
+#include <random>
+#include <span>
+#include <stdexcept>
+#include <string>
+#include <utility>
+#include <vector>
+
+#include <amulet/level/java/section_array.hpp>
+
+#include <amulet/test_utils/test_utils.hpp>
+
+namespace py = pybind11;
+
+// The section decode loop before find_index_out_of_range and remap_yzx_to_xyz.
+static void reference_remap_yzx_to_xyz(const std::uint32_t* yzx, std::uint32_t* xyz, const std::uint32_t* lut, size_t lut_size)
+{
+    for (size_t y = 0; y < 16; y++) {
+        for (size_t x = 0; x < 16; x++) {
+            for (size_t z = 0; z < 16; z++) {
+                auto block_index = yzx[y * 256 + z * 16 + x];
+                if (lut_size <= block_index) {
+                    throw std::runtime_error("Block index is larger than the block palette size.");
+                }
+                xyz[x * 256 + y * 16 + z] = lut[block_index];
+            }
+        }
+    }
+}
+
+// A section of random indexes into a lut of lut_size random values.
+static std::pair<std::vector<std::uint32_t>, std::vector<std::uint32_t>> random_section(size_t lut_size)
+{
+    std::mt19937 generator(lut_size);
+    std::uniform_int_distribution<std::uint32_t> index_distribution(0, static_cast<std::uint32_t>(lut_size - 1));
+    std::uniform_int_distribution<std::uint32_t> value_distribution;
+    std::vector<std::uint32_t> yzx(4096);
+    for (auto& index : yzx) {
+        index = index_distribution(generator);
+    }
+    std::vector<std::uint32_t> lut(lut_size);
+    for (auto& value : lut) {
+        value = value_distribution(generator);
+    }
+    return std::make_pair(std::move(yzx), std::move(lut));
+}
+
+static void test_find_index_out_of_range()
+{
+    // Sizes around the vector width cover the vector loop and the scalar tail.
+    for (size_t size = 0; size <= 40; size++) {
+        std::vector<std::uint32_t> values(size, 4);
+        ASSERT_EQUAL(size_t, size, Amulet::detail::find_index_out_of_range(values, 5))
+        for (size_t index = 0; index < size; index++) {
+            // The value equal to the limit is the smallest invalid value.
+            values[index] = 5;
+            ASSERT_EQUAL(size_t, index, Amulet::detail::find_index_out_of_range(values, 5))
+            // Values with the high bit set are invalid. A signed comparison would see them as negative.
+            values[index] = 0x80000000;
+            ASSERT_EQUAL(size_t, index, Amulet::detail::find_index_out_of_range(values, 5))
+            values[index] = 0xFFFFFFFF;
+            ASSERT_EQUAL(size_t, index, Amulet::detail::find_index_out_of_range(values, 5))
+            // The first invalid value is found when there are more than one.
+            values.back() = 6;
+            ASSERT_EQUAL(size_t, index, Amulet::detail::find_index_out_of_range(values, 5))
+            values[index] = 4;
+            values.back() = 4;
+        }
+    }
+
+    // Limits either side of the sign bit.
+    std::vector<std::uint32_t> values(16, 0x7FFFFFFF);
+    ASSERT_EQUAL(size_t, 16, Amulet::detail::find_index_out_of_range(values, 0x80000000))
+    values[9] = 0x80000000;
+    ASSERT_EQUAL(size_t, 9, Amulet::detail::find_index_out_of_range(values, 0x80000000))
+    ASSERT_EQUAL(size_t, 16, Amulet::detail::find_index_out_of_range(values, 0x80000001))
+    values[3] = 0xFFFFFFFF;
+    ASSERT_EQUAL(size_t, 3, Amulet::detail::find_index_out_of_range(values, 0xFFFFFFFF))
+    // Every value is valid if the limit is larger than the largest value.
+    ASSERT_EQUAL(size_t, 16, Amulet::detail::find_index_out_of_range(values, static_cast<size_t>(std::numeric_limits<std::uint32_t>::max()) + 1))
+    // No value is valid if the limit is zero.
+    ASSERT_EQUAL(size_t, 0, Amulet::detail::find_index_out_of_range(values, 0))
+    ASSERT_EQUAL(size_t, 0, Amulet::detail::find_index_out_of_range(std::span<const std::uint32_t>(), 0))
+}
+
+static void test_remap_yzx_to_xyz()
+{
+    for (size_t lut_size : { 1, 2, 16, 100, 4096 }) {
+        auto [yzx, lut] = random_section(lut_size);
+        std::vector<std::uint32_t> expected(4096);
+        reference_remap_yzx_to_xyz(yzx.data(), expected.data(), lut.data(), lut.size());
+        std::vector<std::uint32_t> xyz(4096);
+        Amulet::detail::remap_yzx_to_xyz(yzx.data(), xyz.data(), lut.data());
+        ASSERT_EQUAL(std::vector<std::uint32_t>, expected, xyz)
+    }
+
+    // Each cell stores its own coordinates so a misplaced value is easy to spot.
+    std::vector<std::uint32_t> yzx(4096);
+    std::vector<std::uint32_t> lut(4096);
+    for (std::uint32_t index = 0; index < 4096; index++) {
+        yzx[index] = index;
+        lut[index] = index;
+    }
+    std::vector<std::uint32_t> xyz(4096);
+    Amulet::detail::remap_yzx_to_xyz(yzx.data(), xyz.data(), lut.data());
+    for (std::uint32_t x = 0; x < 16; x++) {
+        for (std::uint32_t y = 0; y < 16; y++) {
+            for (std::uint32_t z = 0; z < 16; z++) {
+                ASSERT_EQUAL(std::uint32_t, y * 256 + z * 16 + x, xyz[x * 256 + y * 16 + z])
+            }
+        }
+    }
+}
+
+// Time validating and remapping one section with the reference loop and the bulk functions.
+// Returns the number of seconds each took per section.
+static std::pair<double, double> benchmark_remap_section(size_t lut_size, size_t iterations)
+{
+    auto [yzx, lut] = random_section(lut_size);
+    std::vector<std::uint32_t> xyz(4096);
+    std::uint32_t checksum = 0;
+
+    auto start = std::chrono::steady_clock::now();
+    for (size_t i = 0; i < iterations; i++) {
+        reference_remap_yzx_to_xyz(yzx.data(), xyz.data(), lut.data(), lut.size());
+        checksum += xyz[i % 4096];
+    }
+    std::chrono::duration<double> reference_duration = std::chrono::steady_clock::now() - start;
+
+    start = std::chrono::steady_clock::now();
+    for (size_t i = 0; i < iterations; i++) {
+        if (Amulet::detail::find_index_out_of_range(yzx, lut.size()) != yzx.size()) {
+            throw std::runtime_error("Block index is larger than the block palette size.");
+        }
+        Amulet::detail::remap_yzx_to_xyz(yzx.data(), xyz.data(), lut.data());
+        checksum += xyz[i % 4096];
+    }
+    std::chrono::duration<double> duration = std::chrono::steady_clock::now() - start;
+
+    // Use the result so that the loops are not optimised away.
+    volatile std::uint32_t sink = checksum;
+    (void)sink;
+    return std::make_pair(reference_duration.count() / iterations, duration.count() / iterations);
+}
+
+void init_test_section_array(py::module m_parent)
+{
+    auto m = m_parent.def_submodule("test_section_array_");
+    m.def("test_find_index_out_of_range", &test_find_index_out_of_range);
+    m.def("test_remap_yzx_to_xyz", &test_remap_yzx_to_xyz);
+    m.def(
+        "benchmark_remap_section",
+        &benchmark_remap_section,
+        py::arg("lut_size"),
+        py::arg("iterations"),
+        py::call_guard<py::gil_scoped_release>());
+}
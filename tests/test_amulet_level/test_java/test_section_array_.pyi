@@ -0,0 +1,11 @@
+from __future__ import annotations
+
+__all__ = [
+    "benchmark_remap_section",
+    "test_find_index_out_of_range",
+    "test_remap_yzx_to_xyz",
+]
+
+def benchmark_remap_section(lut_size: int, iterations: int) -> tuple[float, float]: ...
+def test_find_index_out_of_range() -> None: ...
+def test_remap_yzx_to_xyz() -> None: ...
@@ -0,0 +1,99 @@
+"""Benchmark the history system.
+
+The benchmarks are part of the compiled test module.
+Run tools/compile_tests.py before running this script.
+"""
+
+import argparse
+import os
+import sys
+
+RootDir = os.path.dirname(os.path.dirname(__file__))
+TestsDir = os.path.join(RootDir, "tests")
+
+sys.path.insert(0, TestsDir)
+
+from test_amulet_level.test_abc.test_history_ import (
+    benchmark_history_open,
+    benchmark_parallel_set_value,
+    benchmark_storage_options,
+)
+
+MiB = 1024 * 1024
+
+# Storage options to compare.
+# backend, compression, cache_size, write_buffer_size, block_size, bloom_bits
+StorageProfiles = {
+    "default": ("leveldb", "zlib_raw", 40 * MiB, 4 * MiB, 160 * 1024, 10),
+    "fast": ("leveldb", "none", 256 * MiB, 64 * MiB, 64 * 1024, 10),
+    "small": ("leveldb", "zlib", 8 * MiB, 1 * MiB, 256 * 1024, 10),
+    "no_bloom": ("leveldb", "zlib_raw", 40 * MiB, 4 * MiB, 160 * 1024, 0),
+    "memory": ("memory", "zlib_raw", 40 * MiB, 4 * MiB, 160 * 1024, 10),
+}
+
+
+def benchmark_parallel(resource_count: int, value_size: int) -> None:
+    print(
+        f"Writing {resource_count} values of {value_size} bytes to distinct resources."
+    )
+    base_time = None
+    for thread_count in (1, 2, 4, 8):
+        duration = benchmark_parallel_set_value(
+            thread_count, resource_count, value_size
+        )
+        if base_time is None:
+            base_time = duration
+        print(f"{thread_count} threads: {duration:.3f}s ({base_time / duration:.2f}x)")
+
+
+def benchmark_storage(resource_count: int, value_size: int, edit_count: int) -> None:
+    print(
+        f"Preloading {resource_count} values of {value_size} bytes and editing them {edit_count} times."
+    )
+    base_time = None
+    for name, profile in StorageProfiles.items():
+        duration = benchmark_storage_options(
+            *profile, resource_count, value_size, edit_count
+        )
+        if base_time is None:
+            base_time = duration
+        print(f"{name}: {duration:.3f}s ({base_time / duration:.2f}x)")
+
+
+def benchmark_open(repeat: int) -> None:
+    print(f"Creating a history manager and writing the first value {repeat} times.")
+    for backend in ("leveldb", "memory"):
+        open_time = 0.0
+        write_time = 0.0
+        for _ in range(repeat):
+            open_duration, write_duration = benchmark_history_open(backend)
+            open_time += open_duration
+            write_time += write_duration
+        print(
+            f"{backend}: open {1000 * open_time / repeat:.3f}ms, first write {1000 * write_time / repeat:.3f}ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the history system.")
+    parser.add_argument(
+        "benchmark",
+        choices=("parallel", "storage", "open", "all"),
+        nargs="?",
+        default="all",
+    )
+    parser.add_argument("--resource-count", type=int, default=100_000)
+    parser.add_argument("--value-size", type=int, default=1000)
+    parser.add_argument("--edit-count", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+    if args.benchmark in ("parallel", "all"):
+        benchmark_parallel(args.resource_count, args.value_size)
+    if args.benchmark in ("storage", "all"):
+        benchmark_storage(args.resource_count, args.value_size, args.edit_count)
+    if args.benchmark in ("open", "all"):
+        benchmark_open(args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Benchmark opening levels.
+
+Many levels are opened to read metadata or a few chunks.
+This measures the time to open a level and read the first chunk.
+"""
+
+import argparse
+import time
+
+from amulet.level.java import JavaLevel
+
+from amulet.minecraft_worlds import WorldTemp, java_vanilla_1_13
+
+
+def benchmark_level_open(repeat: int, read_chunk: bool) -> None:
+    open_time = 0.0
+    chunk_time = 0.0
+    with WorldTemp(java_vanilla_1_13) as world_data:
+        for _ in range(repeat):
+            level = JavaLevel.load(world_data.path)
+            level.open()
+            try:
+                open_time += level.open_duration
+                if read_chunk:
+                    start = time.perf_counter()
+                    dimension = level.get_dimension("minecraft:overworld")
+                    dimension.get_chunk_handle(1, 2).get_chunk()
+                    chunk_time += time.perf_counter() - start
+            finally:
+                level.close()
+    print(f"Opened the level {repeat} times.")
+    print(f"open: {1000 * open_time / repeat:.3f}ms")
+    if read_chunk:
+        print(f"first chunk: {1000 * chunk_time / repeat:.3f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark opening levels.")
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--no-chunk", action="store_true")
+    args = parser.parse_args()
+    benchmark_level_open(args.repeat, not args.no_chunk)
+
+
+if __name__ == "__main__":
+    main()
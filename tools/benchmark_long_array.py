@@ -0,0 +1,67 @@
+"""Benchmark decoding and encoding long arrays.
+
+Each section of a chunk stores 4096 block indexes in a long array so this
+times arrays of that size for each bits per entry and layout. The padded
+layout is used from 1.16 and the dense layout before that.
+"""
+
+import argparse
+import time
+from typing import Callable
+
+import numpy
+
+from amulet.level.java.long_array import decode_long_array, encode_long_array
+
+
+def best_time(func: Callable[[], object], iterations: int, repeat: int) -> float:
+    """The fastest time of one call out of repeat runs of iterations calls."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        best = min(best, (time.perf_counter() - start) / iterations)
+    return best
+
+
+def benchmark_long_array(
+    bits_per_entry_list: list[int], size: int, iterations: int, repeat: int
+) -> None:
+    for dense in (False, True):
+        for bits_per_entry in bits_per_entry_list:
+            array = numpy.random.randint(0, 2**bits_per_entry, size, dtype=numpy.uint64)
+            long_array = encode_long_array(array, bits_per_entry, dense)
+            decode_time = best_time(
+                lambda: decode_long_array(long_array, size, bits_per_entry, dense),
+                iterations,
+                repeat,
+            )
+            encode_time = best_time(
+                lambda: encode_long_array(array, bits_per_entry, dense),
+                iterations,
+                repeat,
+            )
+            print(
+                f"{'dense' if dense else 'padded'} {bits_per_entry:2d} bits: "
+                f"decode {decode_time * 1e9 / size:.2f} ns/entry "
+                f"encode {encode_time * 1e9 / size:.2f} ns/entry"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark decoding and encoding long arrays."
+    )
+    parser.add_argument(
+        "--bits", type=int, nargs="+", default=[1, 2, 4, 5, 6, 8, 9, 12, 15, 32]
+    )
+    parser.add_argument("--size", type=int, default=4096)
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    benchmark_long_array(args.bits, args.size, args.iterations, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
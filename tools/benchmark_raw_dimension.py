@@ -0,0 +1,85 @@
+"""Benchmark reading and decoding raw chunks from many Python threads.
+
+The raw dimension bindings release the GIL so reads from different
+threads run in parallel. Decoding holds the GIL until it is thread safe
+so decodes are serialised. This reports the throughput for each thread
+count and the speedup relative to the first thread count.
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from amulet.level.java import JavaRawLevel, JavaRawDimension
+
+from amulet.minecraft_worlds import WorldTemp, java_vanilla_1_13
+
+
+def read_chunks(
+    dimension: JavaRawDimension, chunk_coords: list[tuple[int, int]], decode: bool
+) -> None:
+    for cx, cz in chunk_coords:
+        raw_chunk = dimension.get_raw_chunk(cx, cz)
+        if decode:
+            dimension.decode_chunk(raw_chunk, cx, cz)
+
+
+def benchmark_threads(
+    dimension: JavaRawDimension,
+    chunk_coords: list[tuple[int, int]],
+    thread_count: int,
+    decode: bool,
+) -> float:
+    # Give each thread an equal share of the chunks.
+    slices = [chunk_coords[i::thread_count] for i in range(thread_count)]
+    with ThreadPoolExecutor(thread_count) as executor:
+        start = time.perf_counter()
+        for future in [
+            executor.submit(read_chunks, dimension, chunk_slice, decode)
+            for chunk_slice in slices
+        ]:
+            future.result()
+        return time.perf_counter() - start
+
+
+def benchmark_raw_dimension(
+    thread_counts: list[int], repeat: int, decode: bool
+) -> None:
+    with WorldTemp(java_vanilla_1_13) as world_data:
+        raw_level = JavaRawLevel.load(world_data.path)
+        raw_level.open()
+        try:
+            dimension = raw_level.get_dimension("minecraft:overworld")
+            chunk_coords = list(dimension.all_chunk_coords) * repeat
+            # Warm up the file cache.
+            read_chunks(dimension, chunk_coords, False)
+
+            base_time = 0.0
+            for thread_count in thread_counts:
+                duration = benchmark_threads(
+                    dimension, chunk_coords, thread_count, decode
+                )
+                if not base_time:
+                    base_time = duration
+                print(
+                    f"{thread_count} threads: "
+                    f"{len(chunk_coords) / duration:.0f} chunks/s "
+                    f"speedup {base_time / duration:.2f}x"
+                )
+        finally:
+            raw_level.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark reading and decoding raw chunks from many threads."
+    )
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=4)
+    parser.add_argument("--no-decode", action="store_true")
+    args = parser.parse_args()
+    benchmark_raw_dimension(args.threads, args.repeat, not args.no_decode)
+
+
+if __name__ == "__main__":
+    main()
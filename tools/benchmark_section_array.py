@@ -0,0 +1,46 @@
+"""Benchmark validating and remapping decoded block sections.
+
+Compares the per cell loop chunk decoding used to run against
+find_index_out_of_range and remap_yzx_to_xyz for a range of palette sizes.
+
+The benchmarks are part of the compiled test module.
+Run tools/compile_tests.py before running this script.
+"""
+
+import argparse
+import os
+import sys
+
+RootDir = os.path.dirname(os.path.dirname(__file__))
+TestsDir = os.path.join(RootDir, "tests")
+
+sys.path.insert(0, TestsDir)
+
+from test_amulet_level.test_java.test_section_array_ import benchmark_remap_section
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark validating and remapping decoded block sections."
+    )
+    parser.add_argument(
+        "--palette-sizes", type=int, nargs="+", default=[2, 16, 256, 4096]
+    )
+    parser.add_argument("--iterations", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    for palette_size in args.palette_sizes:
+        times = [
+            benchmark_remap_section(palette_size, args.iterations)
+            for _ in range(args.repeat)
+        ]
+        reference_time = min(reference_time for reference_time, _ in times)
+        remap_time = min(remap_time for _, remap_time in times)
+        print(
+            f"palette {palette_size:4d}: reference {reference_time * 1e6:.2f}us "
+            f"bulk {remap_time * 1e6:.2f}us ({reference_time / remap_time:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()